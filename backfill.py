@@ -0,0 +1,147 @@
+import asyncio
+import re
+
+import discord
+
+import match_history
+import ratings
+from executor import executor
+from stats_db import connect, register_schema
+
+
+PAGE_SIZE = 100    # Discord's maximum per history request
+PAGE_DELAY = 1.0   # leave rate-limit headroom for live drafts while importing
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id   INTEGER NOT NULL,
+    before_id  INTEGER,
+    scanned    INTEGER NOT NULL DEFAULT 0,
+    imported   INTEGER NOT NULL DEFAULT 0,
+    done       INTEGER NOT NULL DEFAULT 0
+);
+""")
+
+MENTION = re.compile(r"<@!?(\d+)>")
+TIMESTAMP = re.compile(r"<t:(\d+)")
+NUMBERED_TEAM = re.compile(r"Team \d+$")
+
+running = set()  # channel ids with an import in progress
+
+
+def _parse_team(value):
+    captain_line, _, rest = value.partition("\n")
+    captain = MENTION.search(captain_line)
+    return {
+        "captain": int(captain.group(1)) if captain else None,
+        "members": [int(uid) for uid in MENTION.findall(rest)],
+    }
+
+
+def parse_result_embed(message):
+    """Turn a "📊 Draft Results" embed posted by /enddraft into a history record."""
+    for embed in message.embeds:
+        if embed.title != "📊 Draft Results":
+            continue
+
+        fmt, date, winner, teams = None, None, None, []
+        for field in embed.fields:
+            if field.name == "Team Size":
+                fmt = field.value
+            elif field.name == "📅 Date":
+                found = TIMESTAMP.search(field.value)
+                date = int(found.group(1)) if found else None
+            elif field.name == "🏆 Winning Team":
+                teams.insert(0, _parse_team(field.value))
+                winner = 1
+            elif field.name == "📍 Losing Team" or NUMBERED_TEAM.search(field.name):
+                teams.append(_parse_team(field.value))
+
+        if not teams:
+            return None
+        return {
+            "guild_id": message.guild.id,
+            "source_message_id": message.id,
+            "date": date or int(message.created_at.timestamp()),
+            "format": fmt or "v".join(str(len(t["members"]) + 1) for t in teams),
+            "winner": winner,
+            "teams": teams,
+        }
+    return None
+
+
+def load_checkpoint(channel_id):
+    row = connect().execute(
+        "SELECT before_id, scanned, imported, done FROM import_checkpoints WHERE channel_id = ?", (channel_id,)
+    ).fetchone()
+    return row or (None, 0, 0, 0)
+
+
+def reset_checkpoint(channel_id):
+    conn = connect()
+    with conn:
+        conn.execute("DELETE FROM import_checkpoints WHERE channel_id = ?", (channel_id,))
+
+
+def _store_page(channel_id, guild_id, matches, before_id, scanned, imported, finished):
+    """Insert one page of results and move the checkpoint past it in one transaction.
+
+    Returns how many of the matches were new.
+    """
+    conn = connect()
+    with conn:
+        added = sum(match_history.insert_match(conn, m) for m in matches)
+        conn.execute("""
+            INSERT INTO import_checkpoints (channel_id, guild_id, before_id, scanned, imported, done)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (channel_id) DO UPDATE SET
+                before_id = excluded.before_id,
+                scanned = excluded.scanned,
+                imported = excluded.imported,
+                done = excluded.done
+        """, (channel_id, guild_id, before_id, scanned, imported + added, int(finished)))
+    return added
+
+
+def _rebuild_ratings(guild_id):
+    ratings.rebuild(guild_id, match_history.decided_matches(guild_id))
+
+
+async def import_channel(channel, on_progress=None):
+    """Walk a log channel newest to oldest and import every result embed.
+
+    Each page of messages is inserted together with the checkpoint in one
+    transaction, so a crash or restart resumes right after the last page.
+    Returns (scanned, imported).
+    """
+    before_id, scanned, imported, done = load_checkpoint(channel.id)
+    if done:
+        return scanned, imported
+
+    running.add(channel.id)
+    try:
+        while True:
+            before = discord.Object(id=before_id) if before_id else None
+            page = [msg async for msg in channel.history(limit=PAGE_SIZE, before=before)]
+            finished = len(page) < PAGE_SIZE
+
+            matches = [m for m in map(parse_result_embed, page) if m]
+            if page:
+                before_id = page[-1].id
+            scanned += len(page)
+            imported += await executor.run(
+                "db", _store_page, channel.id, channel.guild.id, matches, before_id, scanned, imported, finished
+            )
+
+            if on_progress:
+                await on_progress(scanned, imported, finished)
+            if finished:
+                break
+            await asyncio.sleep(PAGE_DELAY)
+    finally:
+        running.discard(channel.id)
+
+    # Imported results arrive newest first, so replay all ratings in date order
+    await executor.run("db", _rebuild_ratings, channel.guild.id)
+    return scanned, imported
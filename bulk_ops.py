@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import discord
+
+
+BULK_CONCURRENCY = 5      # requests in flight at once; discord.py queues per-route beyond this
+PROGRESS_INTERVAL = 2.0   # seconds between progress embed edits
+
+
+class BatchPlan:
+    """Operations to run in ordered phases; everything inside a phase runs in parallel.
+
+    An op is (kind, label, factory) where factory() returns the coroutine to run,
+    so nothing touches the API until the batch executes.
+    """
+
+    def __init__(self, *phase_names):
+        self.phases = {name: [] for name in phase_names}
+
+    def add(self, phase, kind, label, factory):
+        self.phases[phase].append((kind, label, factory))
+
+    def total(self):
+        return sum(len(ops) for ops in self.phases.values())
+
+    def summary(self):
+        counts = {}
+        for ops in self.phases.values():
+            for kind, _, _ in ops:
+                counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+
+class BatchReport:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.ok = {}
+        self.failed = []  # (kind, label, error)
+        self.started = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+async def run_batch(plan, on_progress=None, concurrency=BULK_CONCURRENCY):
+    """Run a BatchPlan; `on_progress(report)` is called at most every PROGRESS_INTERVAL seconds."""
+    report = BatchReport(plan.total())
+    limit = asyncio.Semaphore(concurrency)
+    last_progress = 0.0
+
+    async def run(kind, label, factory):
+        nonlocal last_progress
+        async with limit:
+            try:
+                await factory()
+                report.ok[kind] = report.ok.get(kind, 0) + 1
+            except discord.NotFound:
+                report.ok[kind] = report.ok.get(kind, 0) + 1  # already gone
+            except Exception as e:
+                report.failed.append((kind, label, str(e)))
+        report.done += 1
+        now = time.monotonic()
+        if on_progress and now - last_progress >= PROGRESS_INTERVAL:
+            last_progress = now
+            try:
+                await on_progress(report)
+            except Exception as e:
+                print(f"Error updating bulk progress: {e}")
+
+    for ops in plan.phases.values():
+        await asyncio.gather(*(run(*op) for op in ops))
+
+    if on_progress:
+        await on_progress(report)
+    return report
@@ -0,0 +1,216 @@
+import asyncio
+import os
+
+import discord
+
+from draft_store import DRAFTS_DIR, read_json, write_json_later
+from guild_config import get_config, resolve
+from rate_budget import budget
+
+
+# Idle draft channels, team VCs and team roles are kept around hidden and
+# renamed/reset when a draft needs them, instead of being created and deleted
+# for every draft. Creating and deleting guild structure sits on the slowest,
+# most heavily rate-limited routes; an edit only touches the one channel/role.
+IDLE_TEXT_NAME = "draft-idle"
+IDLE_VOICE_NAME = "idle-vc"
+IDLE_ROLE_NAME = "Team (idle)"
+
+_pools = {}  # guild_id -> {"text": [...], "voice": [...], "roles": [...]}
+_refilling = set()
+_parking = {}  # (guild_id, kind) -> releases in flight that will land in the pool
+_refill_tasks = set()
+
+
+def _pool_file(guild_id):
+    return os.path.join(DRAFTS_DIR, f"{guild_id}.pool.json")
+
+
+def load_pool(guild_id):
+    pool = _pools.get(guild_id)
+    if pool is None:
+        pool = _pools[guild_id] = read_json(_pool_file(guild_id), lambda: {"text": [], "voice": [], "roles": []})
+    return pool
+
+
+def save_pool(guild_id, pool):
+    _pools[guild_id] = pool
+    write_json_later(_pool_file(guild_id), pool)
+
+
+def _targets(guild):
+    """How many idle resources to keep; a pool is off until its category is configured."""
+    config = get_config(guild.id)
+    resolved = resolve(guild)
+    return {
+        "text": config.pool_text_channels if resolved.draft_category else 0,
+        "voice": config.pool_voice_channels if resolved.voice_category else 0,
+        "roles": config.pool_roles if resolved.voice_category else 0,
+    }
+
+
+def _hidden(guild):
+    return {guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False)}
+
+
+def team_permissions():
+    permissions = discord.Permissions()
+    permissions.update(connect=True, view_channel=True, move_members=True)
+    return permissions
+
+
+def _pop(guild, kind, lookup):
+    """Take an idle resource that still exists out of the pool."""
+    pool = load_pool(guild.id)
+    found = None
+    while pool[kind] and found is None:
+        found = lookup(pool[kind].pop())
+    save_pool(guild.id, pool)
+    return found
+
+
+def _push(guild, kind, obj_id):
+    pool = load_pool(guild.id)
+    if obj_id not in pool[kind]:
+        pool[kind].append(obj_id)
+    save_pool(guild.id, pool)
+
+
+def _has_room(guild, kind):
+    parking = _parking.get((guild.id, kind), 0)
+    return len(load_pool(guild.id)[kind]) + parking < _targets(guild)[kind]
+
+
+def _reserve(guild, kind):
+    """Claim a pool slot before the first await, so concurrent releases (bulk
+    teardowns) can't all see the same free slot and overfill the pool."""
+    if not _has_room(guild, kind):
+        return False
+    key = (guild.id, kind)
+    _parking[key] = _parking.get(key, 0) + 1
+    return True
+
+
+def _unreserve(guild, kind):
+    key = (guild.id, kind)
+    _parking[key] -= 1
+    if not _parking[key]:
+        del _parking[key]
+
+
+def schedule_refill(guild):
+    # Warm-up can always wait for a quieter minute
+    if guild.id in _refilling or budget.skip(guild.id, "pool refill"):
+        return
+    task = asyncio.get_running_loop().create_task(refill(guild))
+    _refill_tasks.add(task)
+    task.add_done_callback(_refill_tasks.discard)
+
+
+async def refill(guild):
+    """Top every pool up to its target in the background."""
+    if guild.id in _refilling:
+        return
+    _refilling.add(guild.id)
+    try:
+        targets = _targets(guild)
+        resolved = resolve(guild)
+        while _has_room(guild, "text") and not budget.tight(guild.id):
+            channel = await guild.create_text_channel(IDLE_TEXT_NAME, category=resolved.draft_category, overwrites=_hidden(guild))
+            _push(guild, "text", channel.id)
+        while _has_room(guild, "voice") and not budget.tight(guild.id):
+            vc = await guild.create_voice_channel(IDLE_VOICE_NAME, category=resolved.voice_category, overwrites=_hidden(guild))
+            _push(guild, "voice", vc.id)
+        while _has_room(guild, "roles") and not budget.tight(guild.id):
+            role = await guild.create_role(name=IDLE_ROLE_NAME, permissions=team_permissions())
+            _push(guild, "roles", role.id)
+    except Exception as e:
+        print(f"Error refilling draft pool for {guild.id}: {e}")
+    finally:
+        _refilling.discard(guild.id)
+
+
+async def lease_text_channel(guild, name, overwrites):
+    category = resolve(guild).draft_category
+    channel = _pop(guild, "text", guild.get_channel)
+    if channel:
+        await channel.edit(name=name, category=category, overwrites=overwrites)
+    else:
+        channel = await guild.create_text_channel(name=name, category=category, overwrites=overwrites)
+    schedule_refill(guild)
+    return channel
+
+
+async def lease_voice_channel(guild, name, overwrites, user_limit):
+    category = resolve(guild).voice_category
+    vc = _pop(guild, "voice", guild.get_channel)
+    if vc:
+        await vc.edit(name=name, category=category, overwrites=overwrites, user_limit=user_limit)
+    else:
+        vc = await guild.create_voice_channel(name, category=category, overwrites=overwrites, user_limit=user_limit)
+    schedule_refill(guild)
+    return vc
+
+
+async def lease_role(guild, name):
+    role = _pop(guild, "roles", guild.get_role)
+    if role:
+        await role.edit(name=name)
+    else:
+        role = await guild.create_role(name=name, permissions=team_permissions())
+    schedule_refill(guild)
+    return role
+
+
+async def release_text_channel(channel):
+    parked = _reserve(channel.guild, "text")
+    try:
+        if not parked:
+            await channel.delete()
+            return True
+        await channel.purge(limit=None)
+        await channel.edit(name=IDLE_TEXT_NAME, overwrites=_hidden(channel.guild))
+        _push(channel.guild, "text", channel.id)
+        return True
+    except Exception as e:
+        print(f"Error releasing draft channel {channel.id}: {e}")
+        return False
+    finally:
+        if parked:
+            _unreserve(channel.guild, "text")
+
+
+async def release_voice_channel(vc):
+    parked = _reserve(vc.guild, "voice")
+    try:
+        if not parked:
+            await vc.delete()
+            return True
+        await vc.edit(name=IDLE_VOICE_NAME, overwrites=_hidden(vc.guild), user_limit=0)
+        _push(vc.guild, "voice", vc.id)
+        return True
+    except Exception as e:
+        print(f"Failed to release VC {vc.id}: {e}")
+        return False
+    finally:
+        if parked:
+            _unreserve(vc.guild, "voice")
+
+
+async def release_role(role):
+    parked = _reserve(role.guild, "roles")
+    try:
+        if not parked:
+            await role.delete()
+            return True
+        for member in role.members:
+            await member.remove_roles(role)
+        await role.edit(name=IDLE_ROLE_NAME)
+        _push(role.guild, "roles", role.id)
+        return True
+    except Exception as e:
+        print(f"Error releasing role {role.id}: {e}")
+        return False
+    finally:
+        if parked:
+            _unreserve(role.guild, "roles")
@@ -3,146 +3,154 @@ from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
 import json
+import hashlib
+import tempfile
 import os
 import datetime
 import random
 import asyncio
-from discord.ui import Modal, TextInput
-from discord import TextStyle
+import functools
+import time
+from draft_store import load_drafts, save_drafts, preload_drafts, flush_writes, migrate_legacy_drafts, stored_guild_ids
+from executor import executor
+from draft_model import Draft
+from pick_order import (
+    PICK_ORDERS, COMMON_FORMATS, MAX_TEAMS,
+    parse_format, format_name, team_keys, draft_team_keys, parse_pattern, build_schedule, draft_pick_order, ensure_schedule, record_pick,
+    replace_player
+)
+from pick_timers import TimerScheduler
+import ratings
+import match_history
+import backfill
+import export
+from matchmaking import MatchmakingPool
+import channel_pool
+import embeds
+import stats_db
+from lifecycle import Lifecycle
+from bulk_ops import BatchPlan, BatchReport, run_batch
+from voice_presence import VoicePresence
+from interactions import fast_ack, ack_metrics
+import rate_budget
+from rate_budget import budget, per_draft
+from substitutes import SubstitutePool
+from guild_config import CONFIG_KEYS, get_config, update_config, resolve, invalidate, reload_configs, format_config
 
 
 load_dotenv()
 EMAIL_ADDRESS = os.getenv("GMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
-tree = bot.tree
 
-MIDDLEMAN_ROLE_ID = 1374569721185173594
-DRAFT_CATEGORY_ID = 1383335152650027108
-LOG_CHANNEL_ID = 1377074782167761027
-DRAFTS_FILE = "drafts.json"
+# Sharding: set SHARD_COUNT (and SHARD_IDS="0,1" when this process only runs
+# some of them, see launcher.py) or AUTO_SHARD=1 to let Discord pick the count.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+WORKER_ID = int(os.getenv("WORKER_ID", "0"))
+DEV_GUILD_ID = int(os.getenv("DEV_GUILD_ID", "0")) or None  # sync commands to one guild instantly while developing
+COMMAND_HASH_FILE = os.getenv("COMMAND_HASH_FILE", ".command_hash")
+
+if SHARD_COUNT or SHARD_IDS or os.getenv("AUTO_SHARD"):
+    bot = commands.AutoShardedBot(command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
+tree = bot.tree
+rate_budget.install(bot, is_draft=lambda guild_id, channel_id: str(channel_id) in load_drafts(guild_id))
+lifecycle = Lifecycle()
+voice = VoicePresence()
+substitutes = SubstitutePool()
 
 # Track pending payments
 pending_payments = {}  # channel_id: {cash_tag: user_id}
 confirmed_payments = {}  # channel_id: set(user_ids)
+cash_tag_index = {}  # channel_id: {user_id: cash_tag}, mirrors draft["cash_tags"]
+DM_CONCURRENCY = 5  # DMs in flight at once when messaging a whole draft
+ROLE_CLEANUP_DELAY = 30  # seconds to hold team roles back when the guild is near its rate budget
+_role_cleanups = set()   # deferred role releases, referenced until they finish
 
 
-if not os.path.exists(DRAFTS_FILE):
-    with open(DRAFTS_FILE, "w") as f:
-        json.dump({}, f)
+# ✅ NOW OUTSIDE OF load_drafts
+def draft_participants(draft):
+    teams = draft_team_keys(draft)
+    return [uid for team in teams for uid in draft.get(team, [])] + list(draft["captains"].values())
 
-def load_drafts():
-    with open(DRAFTS_FILE, "r") as f:
-        return json.load(f)
 
-# ✅ NOW OUTSIDE OF load_drafts
-async def move_and_delete_voice_channels(guild, draft):
-    target_channel = guild.get_channel(1377124001519898634)
-    if not target_channel:
-        print("❌ Target voice channel not found")
-        return
+@lifecycle.critical
+@per_draft
+async def teardown_draft(guild, channel, draft, move_participants=False):
+    """Empty the team VCs and hand the draft's channels and roles back to the pool.
 
-    for key in ("vc1_id", "vc2_id"):
-        vc_id = draft.get(key)
-        if vc_id:
-            vc = guild.get_channel(vc_id)
-            if vc:
-                for member in vc.members:
-                    try:
-                        await member.move_to(target_channel)
-                    except Exception as e:
-                        print(f"Error moving {member.display_name}: {e}")
-                try:
-                    await vc.delete()
-                except Exception as e:
-                    print(f"Error deleting VC {vc.name}: {e}")
+    With move_participants, every player connected anywhere is also sent to the holding VC.
+    """
+    movers = {uid for vc_id in draft.get("voice_channels", {}).values() for uid in voice.members_in(vc_id)}
+    if move_participants:
+        movers.update(draft_participants(draft))
+    # One parallel move per member, only for members actually connected
+    await voice.move_members(guild, dict.fromkeys(movers, resolve(guild).holding_vc))
+    voice.unregister_draft(guild.id, draft)
+
+    for vc_id in draft.get("voice_channels", {}).values():
+        vc = guild.get_channel(vc_id)
+        if vc:
+            await channel_pool.release_voice_channel(vc)
+
+    roles = [role for role in map(guild.get_role, draft.get("team_roles", {}).values()) if role]
+    if roles and budget.skip(guild.id, "role cleanup"):
+        task = asyncio.create_task(release_roles_later(roles))
+        _role_cleanups.add(task)
+        task.add_done_callback(_role_cleanups.discard)
+    else:
+        for role in roles:
+            await channel_pool.release_role(role)
+
+    await channel_pool.release_text_channel(channel)
+    forget_draft(channel.id)
+
+
+def forget_draft(channel_id):
+    """Drop what a finished draft leaves in memory: payment tracking (so the
+    watcher stops polling for it) and its rate budget entry."""
+    for tracker in (pending_payments, confirmed_payments, cash_tag_index):
+        tracker.pop(str(channel_id), None)
+    calls = budget.close_draft(int(channel_id))
+    print(f"📉 Draft {channel_id} used {sum(calls.values())} API calls")
+
+
+@lifecycle.critical
+async def release_roles_later(roles):
+    # Nobody is waiting on idle team roles; hand them back once the guild has some headroom
+    await asyncio.sleep(ROLE_CLEANUP_DELAY)
+    for role in roles:
+        await channel_pool.release_role(role)
 
 
 async def update_live_queue(channel):
-    data = load_drafts()
+    data = load_drafts(channel.guild.id)
     draft = data.get(str(channel.id))
     if not draft:
         return
 
     live_msg_id = draft.get("live_queue_message_id")
-    if not live_msg_id:
-        return
+    if not live_msg_id or budget.skip(channel.guild.id, "live queue"):
+        return  # the main queue embed still carries the same list
 
+    # Partial message: no fetch, and no edit at all if the list didn't change
     try:
-        message = await channel.fetch_message(live_msg_id)
-    except:
+        await embeds.edit_embed(channel.get_partial_message(live_msg_id), embeds.render("live_queue", draft))
+    except discord.NotFound:
         return
 
-    queue_ids = draft["players"]
-    mentions = [f"<@{uid}>" for uid in queue_ids]
-    desc = "\n".join(mentions) if mentions else "No players yet."
 
-    embed = discord.Embed(
-        title="📋 Current Players in Queue",
-        description=desc,
-        color=discord.Color.blue()
-    )
-    await message.edit(embed=embed)
-
-
-async def update_queue_embed(channel, draft, queue_message_id):
+async def update_queue_embed(channel, draft, queue_message_id, max_players, view=None):
+    embed = embeds.render("queue", draft, info_link=get_config(channel.guild.id).draft_info_link, max_players=max_players)
     try:
-        queue_message = await channel.fetch_message(queue_message_id)
+        if view:
+            await embeds.edit_embed(channel.get_partial_message(queue_message_id), embed, view=view)
+        else:
+            await embeds.edit_embed(channel.get_partial_message(queue_message_id), embed)
     except discord.NotFound:
         print("Queue message not found.")
-        return
-
-    player_mentions = [f"<@{uid}>" for uid in draft["players"]]
-    description = "\n".join(player_mentions) if player_mentions else "No players in queue yet."
-
-    embed = discord.Embed(
-        title="🎯 Current Players in Queue",
-        description=description,
-        color=discord.Color.blurple()
-    )
-    embed.set_footer(text=f"Queue: {len(draft['players'])}/{len(draft['players']) + 2} • Made by blur.exe")
-
-    await queue_message.edit(embed=embed)
-
-def save_drafts(data):
-    with open(DRAFTS_FILE, "w") as f:
-        json.dump(data, f, indent=4)
-
-def disable_all_buttons(view: discord.ui.View):
-    for item in view.children:
-        if isinstance(item, discord.ui.Button):
-            item.disabled = True
-
-
-def generate_final_teams_embed(draft):
-    embed = discord.Embed(
-        title="📋 Final Teams",
-        description="All picks are complete. Here are the final teams:",
-        color=discord.Color.green()
-    )
-
-    c1_id = draft["captains"]["team1"]
-    c2_id = draft["captains"]["team2"]
-    t1 = draft["team1"]
-    t2 = draft["team2"]
-
-    team1_mentions = [f"<@{uid}>" for uid in t1]
-    team2_mentions = [f"<@{uid}>" for uid in t2]
-
-    embed.add_field(
-        name="🟦 Team 1",
-        value=f"**Captain:** <@{c1_id}>\n" + "\n".join(team1_mentions) if team1_mentions else "No picks.",
-        inline=True
-    )
-    embed.add_field(
-        name="🟥 Team 2",
-        value=f"**Captain:** <@{c2_id}>\n" + "\n".join(team2_mentions) if team2_mentions else "No picks.",
-        inline=True
-    )
-
-    embed.set_footer(text="Made by blur.exe")
-    return embed
 
 class ManualStartView(discord.ui.View):
     def __init__(self, channel_id):
@@ -150,49 +158,23 @@ class ManualStartView(discord.ui.View):
         self.channel_id = channel_id
 
     @discord.ui.button(label="Manual Start", style=discord.ButtonStyle.danger)
+    @fast_ack()
     async def manual_start(self, interaction: discord.Interaction, button: discord.ui.Button):
-        data = load_drafts()
+        data = load_drafts(interaction.guild.id)
         draft = data.get(str(self.channel_id))
 
         if not draft:
-            await interaction.response.send_message("Draft not found.", ephemeral=True)
+            await interaction.followup.send("Draft not found.", ephemeral=True)
             return
 
         # Only the middleman can click this
         if interaction.user.id != draft.get("middleman_id"):
-            await interaction.response.send_message("Only the selected middle man can use this.", ephemeral=True)
+            await interaction.followup.send("Only the selected middle man can use this.", ephemeral=True)
             return
 
-        await interaction.response.send_message("⏩ Manually starting the draft...", ephemeral=True)
-        await auto_start_draft(interaction.guild, interaction.channel)
-
-
-class SubmitCashTag(Modal, title="Submit Your Cash App Tag"):
-    def __init__(self, user_id: int, channel_id: int):
-        super().__init__()
-        self.user_id = user_id
-        self.channel_id = channel_id
-
-        self.cash_tag_input = TextInput(
-            label="Enter your exact $CashTag (without the $)",
-            placeholder="e.g. john123",
-            style=TextStyle.short,
-            required=True
-        )
-        self.add_item(self.cash_tag_input)
-
-    async def on_submit(self, interaction: discord.Interaction):
-        submitted_tag = self.cash_tag_input.value.strip()
-
-        data = load_drafts()
-        draft = data.get(str(self.channel_id))
-        if draft:
-            if "cash_tags" not in draft:
-                draft["cash_tags"] = {}
-            draft["cash_tags"][str(self.user_id)] = submitted_tag
-            save_drafts(data)
+        await interaction.followup.send("⏩ Manually starting the draft...", ephemeral=True)
+        await auto_start_draft(interaction.guild, interaction.channel, paid=True)
 
-        await interaction.response.send_message("✅ Your Cash App tag was submitted!", ephemeral=True)
 
 class MiddleManForm(discord.ui.Modal, title="Middle Man Setup"):
     cashapp = discord.ui.TextInput(label="Enter your Cash App tag", placeholder="$yourtag", required=True)
@@ -201,17 +183,16 @@ class MiddleManForm(discord.ui.Modal, title="Middle Man Setup"):
         super().__init__()
         self.channel_id = channel_id
 
+    @fast_ack()
     async def on_submit(self, interaction: discord.Interaction):
-        data = load_drafts()
-        draft = data.get(str(self.channel_id), {})
-
-        draft["middleman"] = {
-            "id": interaction.user.id,
-            "cashapp": self.cashapp.value
-        }
-        save_drafts(data)
+        data = load_drafts(interaction.guild.id)
+        draft = data.get(str(self.channel_id))
+        if draft:
+            draft["middleman_id"] = interaction.user.id
+            draft["middleman_cash_tag"] = self.cashapp.value
+            save_drafts(interaction.guild.id, data)
 
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"✅ You are now the Middle Man.\nYour Cash App: `{self.cashapp.value}`", ephemeral=True
         )
 
@@ -225,42 +206,73 @@ class MiddleManButton(discord.ui.View):
     @discord.ui.button(label="I'm the Middle Man", style=discord.ButtonStyle.primary)
     async def confirm_mm(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Optional: permission check
-        if MIDDLEMAN_ROLE_ID not in [role.id for role in interaction.user.roles]:
+        if not interaction.user.get_role(get_config(interaction.guild.id).middleman_role_id):
             await interaction.response.send_message("You don't have permission to be the Middle Man.", ephemeral=True)
             return
 
-        data = load_drafts()
+        data = load_drafts(interaction.guild.id)
         draft = data.get(str(self.channel_id))
         if draft is not None:
             draft["middleman_id"] = interaction.user.id
-            save_drafts(data)
+            save_drafts(interaction.guild.id, data)
 
         # ✅ Send the modal to collect the Cash App tag
         await interaction.response.send_modal(MiddlemanCashTagModal(self.channel_id))
 
 
 
-class CashAppSubmitView(discord.ui.View):
+class CashTagButton(discord.ui.DynamicItem[discord.ui.Button], template=r"cashtag:(?P<channel_id>[0-9]+)"):
+    """The one "Submit Cash App Tag" button; the draft comes from the custom_id.
+
+    Registered once with bot.add_dynamic_items, so copies in the draft channel
+    and in every player's DMs keep working across restarts.
+    """
+
     def __init__(self, channel_id):
-        super().__init__(timeout=None)
+        super().__init__(discord.ui.Button(
+            label="Submit Cash App Tag",
+            style=discord.ButtonStyle.green,
+            custom_id=f"cashtag:{channel_id}"
+        ))
         self.channel_id = channel_id
 
-@discord.ui.button(label="Submit Cash App Tag", style=discord.ButtonStyle.green)
-async def submit_tag(self, interaction: discord.Interaction, button: discord.ui.Button):
-    await interaction.response.send_modal(
-        SubmitCashTag(user_id=interaction.user.id, channel_id=self.channel_id)
-    )
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["channel_id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.response.send_modal(PlayerCashTagForm(self.channel_id))
+
+
+bot.add_dynamic_items(CashTagButton)
+
+
+def cash_tag_view(channel_id):
+    view = discord.ui.View(timeout=None)
+    view.add_item(CashTagButton(channel_id))
+    return view
 
-    # Store player cash tags for this draft channel
-    draft = load_drafts().get(str(self.channel_id))
-    if draft:
-        pending_payments[str(self.channel_id)] = {
-            tag: int(uid) for uid, tag in draft.get("cash_tags", {}).items()
-        }
-        confirmed_payments[str(self.channel_id)] = set()
 
+def cash_tag_index_for(draft, channel_id):
+    """{user_id: tag} submitted for a draft, built from the saved draft once and then kept current."""
+    index = cash_tag_index.get(channel_id)
+    if index is None:
+        index = cash_tag_index[channel_id] = {int(uid): tag for uid, tag in draft["cash_tags"].items()}
+        pending_payments[channel_id] = {tag: uid for uid, tag in index.items()}
+    return index
 
 
+def everyone_paid(draft, channel_id):
+    """Every player currently in the draft has a confirmed payment (leavers don't count, subs do)."""
+    return bool(draft["players"]) and set(draft["players"]) <= confirmed_payments.get(channel_id, set())
+
+
+def forget_cash_tag(channel_id, user_id):
+    tag = cash_tag_index.get(channel_id, {}).pop(user_id, None)
+    waiting = pending_payments.get(channel_id, {})
+    if waiting.get(tag) == user_id:
+        del waiting[tag]
+
 
 class PlayerCashTagForm(discord.ui.Modal, title="Enter Your Cash App Tag"):
     def __init__(self, channel_id):
@@ -269,29 +281,41 @@ class PlayerCashTagForm(discord.ui.Modal, title="Enter Your Cash App Tag"):
         self.cashapp = discord.ui.TextInput(label="Cash App Tag", placeholder="$example", required=True)
         self.add_item(self.cashapp)
 
+    @fast_ack()
     async def on_submit(self, interaction: discord.Interaction):
-        data = load_drafts()
-        draft = data.get(str(self.channel_id), {})
-
-        if "player_tags" not in draft:
-            draft["player_tags"] = {}
-
-        draft["player_tags"][str(interaction.user.id)] = self.cashapp.value
-        save_drafts(data)
-
-        await interaction.response.send_message("✅ Cash App tag submitted!", ephemeral=True)
-
+        # Often submitted from a DM, so the guild comes from the draft channel
         channel = interaction.client.get_channel(self.channel_id)
-        if channel:
-            await channel.send(f"📝 {interaction.user.mention} has submitted their Cash App tag.")
+        data = load_drafts(channel.guild.id) if channel else {}
+        draft = data.get(str(self.channel_id))
+        if not draft:
+            await interaction.followup.send("Draft not found.", ephemeral=True)
+            return
 
-        # ⬇️ MOVE THE CHECK HERE — inside the async function
-        if draft:
-            if len(draft.get("player_tags", {})) == len(draft.get("players", [])):
-                # All players submitted — show middleman's Cash App
-                await send_payment_instructions(channel)
-            else:
-                print(f"{len(draft['player_tags'])}/{len(draft['players'])} Cash Tags submitted")
+        uid = interaction.user.id
+        if uid not in draft["players"]:
+            await interaction.followup.send("❌ You're not in this draft.", ephemeral=True)
+            return
+
+        tag = self.cashapp.value.strip().lstrip("$")
+        cid = str(self.channel_id)
+        index = cash_tag_index_for(draft, cid)
+        first_time = uid not in index
+        forget_cash_tag(cid, uid)
+        index[uid] = tag
+        pending_payments.setdefault(cid, {})[tag] = uid
+        draft["cash_tags"][str(uid)] = tag
+        save_drafts(channel.guild.id, data)
+
+        await interaction.followup.send("✅ Cash App tag submitted!", ephemeral=True)
+        if not first_time:
+            return  # just a correction
+
+        await channel.send(f"📝 {interaction.user.mention} has submitted their Cash App tag.")
+        if set(draft["players"]) <= index.keys():
+            # All players submitted — show middleman's Cash App
+            await send_payment_instructions(channel)
+        else:
+            print(f"{len(index)}/{len(draft['players'])} Cash Tags submitted")
 
 
 
@@ -301,14 +325,16 @@ class PaymentControlView(discord.ui.View):
         self.channel_id = channel_id
 
     @discord.ui.button(label="Start Draft Manually", style=discord.ButtonStyle.red)
+    @fast_ack()
     async def manual_start(self, interaction: discord.Interaction, button: discord.ui.Button):
-        allowed = any(r.id == MIDDLEMAN_ROLE_ID or r.name == "Draft Admin" for r in interaction.user.roles)
+        middleman_role_id = get_config(interaction.guild.id).middleman_role_id
+        allowed = any(r.id == middleman_role_id or r.name == "Draft Admin" for r in interaction.user.roles)
         if not allowed:
-            await interaction.response.send_message("You don’t have permission to start the draft.", ephemeral=True)
+            await interaction.followup.send("You don’t have permission to start the draft.", ephemeral=True)
             return
 
-        await interaction.response.send_message("✅ Starting draft manually...", ephemeral=True)
-        await auto_start_draft(interaction.guild, interaction.channel)
+        await interaction.followup.send("✅ Starting draft manually...", ephemeral=True)
+        await auto_start_draft(interaction.guild, interaction.channel, paid=True)
 
 
 
@@ -318,38 +344,40 @@ class PickButton(discord.ui.Button):
         self.player = player
         self.channel_id = str(channel_id)
 
+    @lifecycle.critical
+    @fast_ack()
     async def callback(self, interaction: discord.Interaction):
-        data = load_drafts()
+        data = load_drafts(interaction.guild.id)
         draft = data.get(self.channel_id)
         if not draft:
-            await interaction.response.send_message("Draft not found for this channel.", ephemeral=True)
+            await interaction.followup.send("Draft not found for this channel.", ephemeral=True)
             return
 
+        ensure_schedule(draft)
         turn = draft["pick_turn"]
+        if turn is None:
+            await interaction.followup.send("❌ All picks have been made.", ephemeral=True)
+            return
+
         expected_id = draft["captains"][turn]
         if interaction.user.id != expected_id:
-            await interaction.response.send_message("❌ It's not your turn to pick.", ephemeral=True)
+            await interaction.followup.send("❌ It's not your turn to pick.", ephemeral=True)
             return
 
-        draft[turn].append(self.player.id)
-        draft["available"].remove(self.player.id)
+        if self.player.id not in draft["available"]:
+            await interaction.followup.send("❌ That player has already been picked.", ephemeral=True)
+            return
 
-        if draft["snake_draft"]:
-            total_picks = len(draft["team1"]) + len(draft["team2"])
-            total_slots = len(draft["players"]) - 2
-            pattern = []
-            while len(pattern) < total_slots:
-                pattern += ["team1", "team2", "team2", "team1"]
-            draft["pick_turn"] = pattern[total_picks] if total_picks < len(pattern) else "team1"
-        else:
-            draft["pick_turn"] = "team2" if turn == "team1" else "team1"
+        # Next turn is a lookup into the schedule built in auto_start_draft
+        record_pick(draft, self.player.id)
 
-        save_drafts(data)
-        await interaction.response.send_message(f"{self.player.mention} picked by {interaction.user.mention}!", ephemeral=False)
+        save_drafts(interaction.guild.id, data)
+        await interaction.followup.send(f"{self.player.mention} picked by {interaction.user.mention}!", ephemeral=False)
         await send_pick_options(interaction.channel)
 
+@per_draft
 async def begin_cashapp_collection(guild, channel):
-    data = load_drafts()
+    data = load_drafts(guild.id)
     draft = data.get(str(channel.id))
     if not draft:
         return
@@ -364,30 +392,38 @@ async def begin_cashapp_collection(guild, channel):
         color=discord.Color.green()
     )
     
-    view = CashAppSubmitView(channel_id=channel.id)
-    manual_view = ManualStartView(channel_id=channel.id)
+    await channel.send(embed=embed, view=cash_tag_view(channel.id))
+    await channel.send(view=ManualStartView(channel_id=channel.id))
 
-    await channel.send(embed=embed, view=view)
-    await channel.send(view=manual_view)
+    # Same persistent button in every DM, sent in parallel
+    for uid in await dm_members(guild, draft["players"], content="Please submit your Cash App tag:", view=cash_tag_view(channel.id)):
+        print(f"Could not DM user {uid}")
 
-    for uid in draft["players"]:
-        member = guild.get_member(uid)
-        if member:
-            try:
-                view = discord.ui.View()
-                button = discord.ui.Button(label="Submit Cash App Tag", style=discord.ButtonStyle.primary)
 
-                async def callback(interaction: discord.Interaction, user_id=uid, channel_id=channel.id):
-                    await interaction.response.send_modal(PlayerCashTagForm(user_id, channel_id))
+async def dm_members(guild, user_ids, **kwargs):
+    """DM everyone in user_ids concurrently; returns the ids that couldn't be reached.
 
-                button.callback = callback
-                view.add_item(button)
-                await member.send("Please submit your Cash App tag:", view=view)
-            except:
-                print(f"Could not DM user {uid}")
+    DMs are courtesy notices (the draft channel has the same information), so
+    they are dropped entirely while the guild is near its rate budget.
+    """
+    if budget.skip(guild.id, "dm"):
+        return []
+    limit = asyncio.Semaphore(DM_CONCURRENCY)
+    failed = []
+
+    async def dm(uid):
+        async with limit:
+            try:
+                member = guild.get_member(uid) or await guild.fetch_member(uid)
+                await member.send(**kwargs)
+            except Exception:
+                failed.append(uid)
+
+    await asyncio.gather(*(dm(uid) for uid in user_ids))
+    return failed
 
 async def send_middleman_selection(channel):
-    data = load_drafts()
+    data = load_drafts(channel.guild.id)
     draft = data.get(str(channel.id))
     if not draft:
         return
@@ -402,7 +438,7 @@ async def send_middleman_selection(channel):
 
 
 async def send_payment_instructions(channel):
-    data = load_drafts()
+    data = load_drafts(channel.guild.id)
     draft = data.get(str(channel.id))
     if not draft:
         return
@@ -426,24 +462,26 @@ async def send_payment_instructions(channel):
     await channel.send(embed=embed, view=view)
 
 
-async def send_pick_options(channel):
-    data = load_drafts()
+@lifecycle.critical
+@per_draft
+async def send_pick_options(channel, rearm=True):
+    data = load_drafts(channel.guild.id)
     draft = data.get(str(channel.id))
     if not draft:
         return
 
-    # Clear previous pick buttons
+    # Clear previous pick buttons (the queue stays up for leaves and waitlist joins)
     async for msg in channel.history(limit=10):
-        if msg.author == channel.guild.me and msg.components:
+        if msg.author == channel.guild.me and msg.components and msg.id != draft.get("queue_message_id"):
             try:
                 await msg.delete()
             except:
                 pass
 
-    total_picks = len(draft["team1"]) + len(draft["team2"])
-    expected_picks = len(draft["players"]) - 2
-
-    if total_picks >= expected_picks:
+    ensure_schedule(draft)
+    if draft["pick_index"] >= len(draft["pick_schedule"]):
+        if draft.pop("pick_deadline", None):
+            save_drafts(channel.guild.id, data)
         await finalize_draft_teams(channel)
         return
 
@@ -457,7 +495,238 @@ async def send_pick_options(channel):
         member = await channel.guild.fetch_member(uid)
         view.add_item(PickButton(member, channel.id))
 
-    await channel.send(f"{pick_captain.mention}, it's your turn to pick:", view=view)
+    # ⏰ Arm the pick timer; <t:...:R> renders as a live countdown in the client
+    timer_seconds = get_config(channel.guild.id).pick_timer_seconds
+    countdown = ""
+    if not rearm and draft.get("pick_deadline"):
+        # Redrawing the board (e.g. after a substitution) keeps the captain's clock running
+        countdown = f" (auto-pick <t:{draft['pick_deadline']}:R>)"
+    elif timer_seconds:
+        deadline = int(time.time()) + timer_seconds
+        draft["pick_deadline"] = deadline
+        save_drafts(channel.guild.id, data)
+        pick_timers.schedule(deadline, channel.guild.id, channel.id, draft["pick_index"])
+        countdown = f" (auto-pick <t:{deadline}:R>)"
+
+    await channel.send(f"{pick_captain.mention}, it's your turn to pick{countdown}:", view=view)
+
+
+@lifecycle.critical
+@per_draft
+async def auto_pick(guild_id, channel_id, pick_index):
+    """Called by the pick timer when a captain runs out of time."""
+    channel = bot.get_channel(channel_id)
+    if not channel:
+        return
+
+    data = load_drafts(guild_id)
+    draft = data.get(str(channel_id))
+    # Stale timer: the captain picked in time or the draft is gone
+    if not draft or draft.get("pick_index") != pick_index or not draft.get("available"):
+        return
+
+    captain_id = draft["captains"][draft["pick_turn"]]
+    if get_config(guild_id).auto_pick == "rating":
+        player_id = ratings.best_available(guild_id, draft["available"])
+    else:
+        player_id = random.choice(draft["available"])
+    record_pick(draft, player_id)
+    draft.pop("pick_deadline", None)
+    save_drafts(guild_id, data)
+
+    await channel.send(f"⏰ <@{captain_id}> ran out of time, so <@{player_id}> was auto-picked.")
+    await send_pick_options(channel)
+
+
+pick_timers = TimerScheduler(auto_pick)
+
+
+def resume_pick_timers(drafts_by_guild):
+    """Re-arm timers saved in drafts owned by this process after a restart."""
+    for guild_id, data in drafts_by_guild.items():
+        for cid, draft in data.items():
+            deadline = draft.get("pick_deadline")
+            if deadline and draft.get("pick_turn"):
+                pick_timers.schedule(deadline, guild_id, int(cid), draft["pick_index"])
+
+
+def restore_payment_tracking(drafts_by_guild):
+    """Rebuild the in-memory payment state for money drafts after a restart: the tags
+    the inbox watcher waits on (from the saved draft) and who already paid (from the ledger)."""
+    for guild_id, data in drafts_by_guild.items():
+        for cid, draft in data.items():
+            if not draft.get("is_money_draft"):
+                continue
+            cash_tag_index_for(draft, cid)
+            paid = match_history.paid_users(guild_id, int(cid)) & set(draft["players"])
+            if paid:
+                confirmed_payments[cid] = paid
+
+
+def draft_max_players(draft):
+    try:
+        team_count, players_per_team = parse_format(draft["team_size"])
+    except ValueError:
+        return None  # uneven sizes: teams were already finalized
+    return team_count * players_per_team
+
+
+def restore_team_voice(drafts_by_guild):
+    for guild_id, data in drafts_by_guild.items():
+        for draft in data.values():
+            if draft.get("voice_channels"):
+                voice.register_draft(guild_id, draft)
+
+
+def restore_queue_views(drafts_by_guild):
+    """Re-attach Join/Leave buttons to queue messages that are still open."""
+    for data in drafts_by_guild.values():
+        for cid, draft in data.items():
+            max_players = draft_max_players(draft)
+            if draft.get("queue_message_id") and max_players and not draft.get("voice_channels"):
+                bot.add_view(DraftQueueView(cid, max_players), message_id=draft["queue_message_id"])
+
+
+async def load_owned_drafts():
+    """Read every guild file this process owns in parallel: {guild_id: drafts}."""
+    return await preload_drafts([gid for gid in stored_guild_ids() if bot.get_guild(gid)])
+
+
+async def sync_commands():
+    """Upload the command tree only when it changed since the last sync."""
+    if DEV_GUILD_ID:
+        guild = discord.Object(id=DEV_GUILD_ID)
+        tree.copy_global_to(guild=guild)
+        await tree.sync(guild=guild)
+        return
+
+    payload = json.dumps([cmd.to_dict(tree) for cmd in tree.get_commands()], sort_keys=True)
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    try:
+        with open(COMMAND_HASH_FILE, "r") as f:
+            if f.read().strip() == digest:
+                return
+    except FileNotFoundError:
+        pass
+
+    await tree.sync()
+    with open(COMMAND_HASH_FILE, "w") as f:
+        f.write(digest)
+    print("🔄 Synced slash commands")
+
+BOARD_REFRESH_DELAY = 0.5  # seconds; changes inside this window share one redraw
+BOARD_REFRESH_TIGHT_DELAY = 3.0  # wider window while the guild is near its rate budget
+_board_refreshes = {}      # channel_id: pending refresh task
+
+
+def schedule_board_refresh(channel):
+    """Redraw the queue embed + buttons, live queue and pick board once for any burst of changes."""
+    if channel.id in _board_refreshes:
+        return
+
+    # Near the budget, let more joins/leaves pile up into each redraw
+    delay = BOARD_REFRESH_TIGHT_DELAY if budget.skip(channel.guild.id, "board redraw") else BOARD_REFRESH_DELAY
+
+    async def refresh():
+        await asyncio.sleep(delay)
+        _board_refreshes.pop(channel.id, None)
+        draft = load_drafts(channel.guild.id).get(str(channel.id))
+        if not draft:
+            return
+        max_players = draft_max_players(draft)
+        if draft.get("queue_message_id") and max_players:
+            view = DraftQueueView(channel.id, max_players)
+            view.status_button.label = f"{len(draft['players'])}/{max_players}"
+            await update_queue_embed(channel, draft, draft["queue_message_id"], max_players, view=view)
+        await update_live_queue(channel)
+        if draft["captains"] and draft.get("pick_turn") and not draft.get("voice_channels"):
+            await send_pick_options(channel, rearm=False)
+
+    _board_refreshes[channel.id] = asyncio.create_task(refresh())
+
+
+def draft_started(draft):
+    """True once captains are dealt, or a money draft's Middle Man has stepped in.
+
+    From then on joiners only go on the waitlist; slots open up through vacate_slot.
+    """
+    return bool(draft["captains"] or draft.get("middleman_id"))
+
+
+def drafting_players(guild_id):
+    return {uid for draft in load_drafts(guild_id).values() for uid in draft["players"]}
+
+
+@lifecycle.critical
+@per_draft
+async def vacate_slot(guild, channel, uid):
+    """Take uid out of a draft and backfill their exact slot from the draft's waitlist,
+    then the guild's substitute pool. Returns the replacement's id, or None."""
+    data = load_drafts(guild.id)
+    draft = data.get(str(channel.id))
+    if not draft:
+        raise ValueError("This draft is no longer running.")
+    if uid not in draft["players"]:
+        raise ValueError(f"<@{uid}> isn't in this draft.")
+    if draft.get("voice_channels"):
+        raise ValueError("Teams are already final.")
+
+    busy = drafting_players(guild.id)
+    had_tag = uid in cash_tag_index_for(draft, str(channel.id))
+
+    def usable(candidate):
+        member = guild.get_member(candidate)
+        return member is not None and candidate not in busy and not join_block_reason(member)
+
+    replacement = None
+    while draft["waitlist"] and replacement is None:
+        candidate = draft["waitlist"].pop(0)
+        if usable(candidate):
+            replacement = candidate
+    if replacement is None:
+        replacement = substitutes.take(guild.id, usable)
+
+    # Queue, captaincy, roster and pick board all change in one save
+    replace_player(draft, uid, replacement)
+    draft["cash_tags"].pop(str(uid), None)
+    forget_cash_tag(str(channel.id), uid)
+    confirmed_payments.get(str(channel.id), set()).discard(uid)
+    save_drafts(guild.id, data)
+
+    # Money draft still collecting: the sub has to submit a tag and pay like everyone else
+    collecting = draft.get("is_money_draft") and draft.get("middleman_cash_tag") and not draft["captains"]
+
+    leaver = guild.get_member(uid)
+    perms = [channel.set_permissions(leaver, overwrite=None)] if leaver else []
+    if replacement:
+        perms.append(channel.set_permissions(guild.get_member(replacement), send_messages=True))
+        if collecting:
+            await ask_sub_to_pay(guild, channel, replacement, f"🔁 <@{replacement}> is subbing in for <@{uid}>.")
+        else:
+            await channel.send(f"🔁 <@{replacement}> is subbing in for <@{uid}>.")
+    elif draft["captains"]:
+        await channel.send(f"🚪 <@{uid}> left the draft and no substitute was available.")
+    await asyncio.gather(*perms, return_exceptions=True)
+
+    schedule_board_refresh(channel)
+    # The leaver may have been the last player left to pick: nothing else will finalize the teams
+    if draft["captains"] and draft.get("pick_turn") is None:
+        await send_pick_options(channel, rearm=False)
+    # The leaver may have been the last tag or payment everyone was waiting on
+    if collecting and not replacement:
+        if not had_tag and set(draft["players"]) <= cash_tag_index_for(draft, str(channel.id)).keys():
+            await send_payment_instructions(channel)
+        if everyone_paid(draft, str(channel.id)):
+            await auto_start_draft(guild, channel, paid=True)
+    return replacement
+
+
+async def ask_sub_to_pay(guild, channel, sub_id, announcement):
+    """A sub joining a money draft that's still collecting submits a tag and pays like everyone else."""
+    await channel.send(f"{announcement} Submit your Cash App tag and pay to lock in your spot.", view=cash_tag_view(channel.id))
+    for failed in await dm_members(guild, [sub_id], content="You're subbing into a money draft. Please submit your Cash App tag:", view=cash_tag_view(channel.id)):
+        print(f"Could not DM user {failed}")
+
 
 class GoToDraftButton(discord.ui.View):
     def __init__(self, channel):
@@ -472,6 +741,22 @@ class GoToDraftButton(discord.ui.View):
 
 
     
+def join_block_reason(member):
+    """Why `member` can't join drafts, or None if they can."""
+    config = get_config(member.guild.id)
+
+    if config.token_player_role_id and not member.get_role(config.token_player_role_id):
+        return (
+            "❌ You need the **Token Player** role to join the draft.\n"
+            f"Grab it here: <{config.token_role_link}>"
+        )
+
+    if config.scammer_role_id and member.get_role(config.scammer_role_id):
+        return "❌ Scammers can't play drafts. Go pay off your debt!"
+
+    return None
+
+
 class DraftQueueView(discord.ui.View):
     def __init__(self, channel_id, max_players):
         super().__init__(timeout=None)
@@ -481,75 +766,94 @@ class DraftQueueView(discord.ui.View):
         self.add_item(self.status_button)
 
     @discord.ui.button(label="Join Queue", style=discord.ButtonStyle.blurple, custom_id="join_draft")
+    @fast_ack()
     async def join_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        scammer_role_id      = 1377442142061858916
-        token_player_role_id = 1374569702801670144
-
-        if not any(role.id == token_player_role_id for role in interaction.user.roles):
-            await interaction.response.send_message(
-                "❌ You need the **Token Player** role to join the draft.\n"
-                "Grab it here: <https://discordapp.com/channels/1374569504071221248/1377135618080899094>",
-                ephemeral=True
-            )
+        if lifecycle.draining:
+            await interaction.followup.send("🔄 The bot is restarting, try again in a minute.", ephemeral=True)
             return
 
-        if any(role.id == scammer_role_id for role in interaction.user.roles):
-            await interaction.response.send_message(
-                "❌ Scammers can't play drafts. Go pay off your debt!",
-                ephemeral=True
-            )
+        blocked = join_block_reason(interaction.user)
+        if blocked:
+            await interaction.followup.send(blocked, ephemeral=True)
             return
 
-        data = load_drafts()
+        data = load_drafts(interaction.guild.id)
         draft = data.get(self.channel_id)
         if not draft:
+            await interaction.followup.send("❌ This draft is no longer running.", ephemeral=True)
             return
 
         uid = interaction.user.id
-        if uid in draft["players"]:
-            await interaction.response.send_message("❌ You're already in the queue.", ephemeral=True)
+        if uid in draft["players"] or uid in draft["waitlist"]:
+            await interaction.followup.send("❌ You're already in the queue.", ephemeral=True)
+            return
+
+        if draft.get("voice_channels"):
+            await interaction.followup.send("❌ Teams are already final.", ephemeral=True)
+            return
+
+        # A money draft still collecting payments takes joiners into slots a dropout left open
+        collecting = draft.get("is_money_draft") and draft.get("middleman_cash_tag") and not draft["captains"]
+        if collecting and len(draft["players"]) < self.max_players:
+            draft["players"].append(uid)
+            save_drafts(interaction.guild.id, data)
+            await interaction.channel.set_permissions(interaction.user, send_messages=True)
+            await interaction.followup.send("✅ Joined the draft as a sub!", ephemeral=True)
+            await ask_sub_to_pay(interaction.guild, interaction.channel, uid, f"🔁 {interaction.user.mention} is subbing in.")
+            schedule_board_refresh(interaction.channel)
+            return
+
+        # Full or already picking: wait in line for the next slot that opens up
+        if len(draft["players"]) >= self.max_players or draft_started(draft):
+            draft["waitlist"].append(uid)
+            save_drafts(interaction.guild.id, data)
+            await interaction.followup.send(f"⏳ The draft is full, you're #{len(draft['waitlist'])} on the waitlist.", ephemeral=True)
             return
 
         draft["players"].append(uid)
-        save_drafts(data)
+        save_drafts(interaction.guild.id, data)
         await interaction.channel.set_permissions(interaction.user, send_messages=True)
 
-        await interaction.response.send_message("✅ Joined the queue!", ephemeral=True)
+        await interaction.followup.send("✅ Joined the queue!", ephemeral=True)
         await self.update_queue_count(interaction.message)
         await update_live_queue(interaction.channel)
 
         if len(draft["players"]) == self.max_players:
-            msg = await interaction.channel.fetch_message(draft["queue_message_id"])
-            view = DraftQueueView(self.channel_id, self.max_players)
-            disable_all_buttons(view)
-            await msg.edit(view=view)
             await auto_start_draft(interaction.guild, interaction.channel)
 
     @discord.ui.button(label="Leave Queue", style=discord.ButtonStyle.danger, custom_id="leave_draft")
+    @fast_ack()
     async def leave_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        data = load_drafts()
+        data = load_drafts(interaction.guild.id)
         draft = data.get(self.channel_id)
         if not draft:
+            await interaction.followup.send("❌ This draft is no longer running.", ephemeral=True)
             return
 
         uid = interaction.user.id
-        if uid not in draft["players"]:
-            await interaction.response.send_message("❌ You're not in the queue.", ephemeral=True)
+        if uid in draft["waitlist"]:
+            draft["waitlist"].remove(uid)
+            save_drafts(interaction.guild.id, data)
+            await interaction.followup.send("✅ Left the waitlist.", ephemeral=True)
             return
 
-        draft["players"].remove(uid)
-        save_drafts(data)
-        await interaction.channel.set_permissions(interaction.user, overwrite=None)
+        if uid not in draft["players"]:
+            await interaction.followup.send("❌ You're not in the queue.", ephemeral=True)
+            return
 
-        await interaction.response.send_message("✅ Left the queue.", ephemeral=True)
-        await self.update_queue_count(interaction.message)
-        await update_live_queue(interaction.channel)
+        try:
+            await vacate_slot(interaction.guild, interaction.channel, uid)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
+        await interaction.followup.send("✅ Left the draft.", ephemeral=True)
 
     async def update_queue_count(self, message):
-        data = load_drafts()
-        count = len(data[self.channel_id]["players"])
-        self.status_button.label = f"{count}/{self.max_players}"
-        await message.edit(view=self)
+        data = load_drafts(message.guild.id)
+        draft = data[self.channel_id]
+        self.status_button.label = f"{len(draft['players'])}/{self.max_players}"
+        # Footer count and button label go out in one edit
+        await update_queue_embed(message.channel, draft, message.id, self.max_players, view=self)
 
 
 class MiddlemanCashTagModal(discord.ui.Modal, title="Enter Your Cash App Tag"):
@@ -564,14 +868,16 @@ class MiddlemanCashTagModal(discord.ui.Modal, title="Enter Your Cash App Tag"):
         )
         self.add_item(self.cash_tag)
 
+    @fast_ack()
     async def on_submit(self, interaction: discord.Interaction):
         submitted_tag = self.cash_tag.value.strip()
-        data = load_drafts()
-        draft = data.get(str(self.channel_id), {})
-        draft["middleman_cash_tag"] = submitted_tag
-        save_drafts(data)
+        data = load_drafts(interaction.guild.id)
+        draft = data.get(str(self.channel_id))
+        if draft:
+            draft["middleman_cash_tag"] = submitted_tag
+            save_drafts(interaction.guild.id, data)
 
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"✅ Your Cash App tag `{submitted_tag}` has been saved.", ephemeral=True
         )
 
@@ -582,149 +888,179 @@ class MiddlemanCashTagModal(discord.ui.Modal, title="Enter Your Cash App Tag"):
 
 
 
-@tree.command(name="createdraft", description="Create a new draft")
-@app_commands.describe(
-    team_size="Choose 3v3 or 4v4",
-    is_money_draft="Require Cash App payment?",
-    snake_draft="Enable snake draft"
-)
-@app_commands.choices(team_size=[
-    app_commands.Choice(name="3v3", value="3v3"),
-    app_commands.Choice(name="4v4", value="4v4"),
-])
-@app_commands.checks.has_any_role("Drafter", "Draft Admin")
-@app_commands.default_permissions()
-async def createdraft(
-    interaction: discord.Interaction,
-    team_size: app_commands.Choice[str],
-    is_money_draft: bool = False,
-    snake_draft: bool = True,
-):
-    team_count = int(team_size.name[0])
-    max_players = team_count * 2
+@lifecycle.critical
+async def create_draft_channel(guild, host, team_count, players_per_team, order="snake", pattern=None, is_money_draft=False, players=(), entry_amount=None):
+    """Create the draft channel, its stored record and the queue/live queue messages."""
+    format_str = format_name(team_count, players_per_team)
+    max_players = team_count * players_per_team
     now_str = datetime.datetime.now().strftime("%H%M")  # For channel name (e.g., 2132 for 9:32 PM)
     now = int(datetime.datetime.now().timestamp())      # For Discord timestamp formatting
-    now = int(datetime.datetime.now().timestamp())
 
-    draft_data = {
-        "team_size": team_size.value,
-        "snake_draft": snake_draft,
-        "is_money_draft": is_money_draft,
-        "date": now,
-        "players": [],
-        "team1": [],
-        "team2": [],
-        "captains": {},
-        "voice_channels": {},
-        "team_roles": {},
-        "available": [],
-        "pick_turn": "team1"
-    }
-
-
-
-    guild = interaction.guild
-    category = discord.utils.get(guild.categories, id=DRAFT_CATEGORY_ID)
-    channel = await guild.create_text_channel(name=f"draft-{now_str}", category=category)
+    draft_data = Draft(
+        team_size=format_str,
+        team_count=team_count,
+        pick_order=order,
+        custom_pattern=pattern,
+        is_money_draft=is_money_draft,
+        entry_amount=entry_amount,
+        date=now,
+        host_id=host.id,
+        players=list(players),
+        teams={team: [] for team in team_keys(team_count)},
+        pick_turn="team1",
+    )
 
+    resolved = resolve(guild)
 
     # Allow @everyone to view and send messages in the draft channel
-    await channel.set_permissions(guild.default_role, view_channel=True, send_messages=False)
-
+    overwrites = {guild.default_role: discord.PermissionOverwrite(view_channel=True, send_messages=False)}
 
-# Allow role 1377074606220906686 to send messages
-    role1 = interaction.guild.get_role(1377074606220906686)
+# Allow staff to send messages
+    role1 = resolved.staff_role
     if role1:
-        await channel.set_permissions(role1, send_messages=True, view_channel=True)
+        overwrites[role1] = discord.PermissionOverwrite(send_messages=True, view_channel=True)
 
-# Allow role 1374569721185173594 to send messages
-    role2 = interaction.guild.get_role(1374569721185173594)
+# Allow middlemen to send messages
+    role2 = resolved.middleman_role
     if role2:
-        await channel.set_permissions(role2, send_messages=True, view_channel=True)
+        overwrites[role2] = discord.PermissionOverwrite(send_messages=True, view_channel=True)
 
-# NEW: Allow role 1374569702801670144 to view the channel
-    visible_role = guild.get_role(1374569702801670144)
+# NEW: Allow token players to view the channel
+    visible_role = resolved.token_player_role
     if visible_role:
-        await channel.set_permissions(visible_role, view_channel=True)
+        overwrites[visible_role] = discord.PermissionOverwrite(view_channel=True)
 
-    
+# Players placed by matchmaking can talk straight away
+    for uid in players:
+        member = guild.get_member(uid)
+        if member:
+            overwrites[member] = discord.PermissionOverwrite(send_messages=True)
+
+    # ✅ Take a warm channel from the pool (one edit) or create one with all overwrites at once
+    channel = await channel_pool.lease_text_channel(guild, f"draft-{now_str}", overwrites)
 
-    data = load_drafts()
+    data = load_drafts(guild.id)
     data[str(channel.id)] = draft_data
-    save_drafts(data)
+    save_drafts(guild.id, data)
 
 
-    embed = discord.Embed(
-        title=f"🎯 Fortnite Drafts {team_size.name}",
-        description="We're seeking participants for this draft. Click the button below to join. \n https://discord.com/channels/1374569504071221248/1386875846693748806 ",
-        color=discord.Color.blurple()
-    )
-    embed.add_field(name="👥 Team Size:", value=team_size.name, inline=False)
-    embed.add_field(name="📅 Date:", value=f"<t:{now}:F>", inline=False)
-    embed.add_field(name="🎙️ Host:", value=interaction.user.mention, inline=False)
-    embed.add_field(name="🐍 Snake Draft:", value="Yes" if snake_draft else "No", inline=False)
-    embed.set_footer(text=f"Queue: 0/{max_players} • Made by blur.exe")
+    embed = embeds.render("queue", draft_data, info_link=resolved.config.draft_info_link, max_players=max_players)
 
     view = DraftQueueView(channel.id, max_players)
-    await interaction.response.send_message(f"✅ Draft channel created: {channel.mention}", ephemeral=True)
-    queue_message = await channel.send("<@&1374569702801670144>", embed=embed, view=view)
+    view.status_button.label = f"{len(players)}/{max_players}"
+    queue_message = await embeds.send(channel, embed, content=visible_role.mention if visible_role and not players else None, view=view)
     data[str(channel.id)]["queue_message_id"] = queue_message.id
-    save_drafts(data)
+    save_drafts(guild.id, data)
 
     # Send second embed for live queue tracking
-    live_embed = discord.Embed(
-        title="📋 Current Players in Queue",
-        description="No players yet.",
-        color=discord.Color.blue()
-)
-    live_message = await channel.send(embed=live_embed)
+    live_message = await embeds.send(channel, embeds.render("live_queue", draft_data))
 
 # Save live embed message ID to drafts.json
     data[str(channel.id)]["live_queue_message_id"] = live_message.id
-    save_drafts(data)
+    save_drafts(guild.id, data)
+    return channel
+
+
+@tree.command(name="createdraft", description="Create a new draft")
+@app_commands.describe(
+    team_size="Format, e.g. 3v3, 4v4 or 3v3v3",
+    is_money_draft="Require Cash App payment?",
+    entry_amount="Entry fee in dollars each player pays (money drafts only)",
+    pick_order="Order captains pick in (default: snake)",
+    custom_order="Custom pick order as team numbers, e.g. 1,2,2,1"
+)
+@app_commands.choices(pick_order=[
+    app_commands.Choice(name=label, value=order) for order, label in PICK_ORDERS.items()
+])
+@app_commands.checks.has_any_role("Drafter", "Draft Admin")
+@app_commands.default_permissions()
+@fast_ack()
+async def createdraft(
+    interaction: discord.Interaction,
+    team_size: str,
+    is_money_draft: bool = False,
+    entry_amount: app_commands.Range[int, 1, 10000] = None,
+    pick_order: app_commands.Choice[str] = None,
+    custom_order: str = None,
+):
+    if lifecycle.draining:
+        await interaction.followup.send("🔄 The bot is restarting, try again in a minute.", ephemeral=True)
+        return
+
+    # The fee is what payments, match totals and the payment ledger are recorded against
+    if is_money_draft and entry_amount is None:
+        await interaction.followup.send("❌ Money drafts need an `entry_amount`.", ephemeral=True)
+        return
+    if entry_amount is not None and not is_money_draft:
+        await interaction.followup.send("❌ Only money drafts take an `entry_amount`.", ephemeral=True)
+        return
+
+    order = pick_order.value if pick_order else "snake"
+    try:
+        team_count, players_per_team = parse_format(team_size)
+        pattern = parse_pattern(custom_order or "", team_count) if order == "custom" else None
+    except ValueError as e:
+        await interaction.followup.send(f"❌ {e}", ephemeral=True)
+        return
+
+    guild = interaction.guild
+    channel = await create_draft_channel(guild, interaction.user, team_count, players_per_team, order, pattern, is_money_draft, entry_amount=entry_amount)
+    await interaction.followup.send(f"✅ Draft channel created: {channel.mention}", ephemeral=True)
 
     # Auto-delete channel if no players join within 10 minutes
     async def delete_if_empty():
         await asyncio.sleep(600)  # 600 seconds = 10 minutes
-        data = load_drafts()
+        data = load_drafts(guild.id)
         draft = data.get(str(channel.id))
 
         if draft and len(draft["players"]) == 0:
             try:
                 await channel.send("⏳ No one joined the draft in time. Closing channel...")
-                await channel.delete()
                 del data[str(channel.id)]
-                save_drafts(data)
+                save_drafts(guild.id, data)
+                await channel_pool.release_text_channel(channel)
+                forget_draft(channel.id)
             except Exception as e:
                 print(f"Error auto-deleting draft channel: {e}")
 
     bot.loop.create_task(delete_if_empty())
 
 
+@createdraft.autocomplete("team_size")
+async def team_size_autocomplete(interaction: discord.Interaction, current: str):
+    return [
+        app_commands.Choice(name=f, value=f)
+        for f in COMMON_FORMATS if f.startswith(current.lower().strip())
+    ][:25]
+
+
 
 
 @tree.command(name="forcestart", description="Force-start draft if queue is ready")
 @app_commands.checks.has_any_role("Draft Admin", "Drafter")
 @app_commands.default_permissions()
+@fast_ack()
 async def forcestart(interaction: discord.Interaction):
-    data  = load_drafts()
+    data  = load_drafts(interaction.guild.id)
     draft = data.get(str(interaction.channel.id))
     if not draft:
-        await interaction.response.send_message("❌ No draft found in this channel.", ephemeral=True)
+        await interaction.followup.send("❌ No draft found in this channel.", ephemeral=True)
+        return
+    if draft_started(draft):
+        await interaction.followup.send("❌ This draft has already started.", ephemeral=True)
         return
-
-    await interaction.response.defer(ephemeral=True)  # ✅ Prevent interaction timeout
 
     player_count = len(draft["players"])
+    team_count = len(draft_team_keys(draft))
 
-    if player_count < 4:
-        await interaction.followup.send("❌ You need at least 4 players to start.", ephemeral=True)
+    if player_count < team_count * 2:
+        await interaction.followup.send(f"❌ You need at least {team_count * 2} players to start.", ephemeral=True)
         return
 
-    if player_count % 2 != 0:
+    if player_count % team_count != 0:
         await interaction.followup.send(
-            f"❌ Cannot force-start with an **odd number** of players ({player_count}). "
-            "Wait for one more player or remove one.",
+            f"❌ Cannot force-start: {player_count} players can't be split evenly into {team_count} teams. "
+            "Wait for more players or remove one.",
             ephemeral=True
         )
         return
@@ -736,10 +1072,9 @@ async def forcestart(interaction: discord.Interaction):
 @tree.command(name="closedraft", description="Close draft and delete channel")
 @app_commands.checks.has_any_role("Draft Admin")
 @app_commands.default_permissions()
+@fast_ack(ephemeral=False)
 async def closedraft(interaction: discord.Interaction):
-    await interaction.response.defer()
-
-    data = load_drafts()
+    data = load_drafts(interaction.guild.id)
     cid = str(interaction.channel.id)
 
     if cid not in data:
@@ -749,223 +1084,673 @@ async def closedraft(interaction: discord.Interaction):
     draft = data[cid]
     guild = interaction.guild  # ✅ FIX: Define guild properly
 
-
-
-    # Delete any legacy VC keys
-    for key in ("vc1_id", "vc2_id"):
-        vc_id = draft.get(key)
-        if vc_id:
-            vc = guild.get_channel(vc_id)
-            if vc:
-                try:
-                    await vc.delete()
-                except Exception as e:
-                    print(f"Error deleting legacy VC {vc.name}: {e}")
-
-# Move members to holding VC and delete VCs first
-    await move_all_in_voice_channels(guild, draft.get("voice_channels", {}), 1377124001519898634)
-
-# Delete voice channels
-    for vc_id in draft.get("voice_channels", {}).values():
-        vc = guild.get_channel(vc_id)
-        if vc:
-            try:
-                await vc.delete()
-            except Exception as e:
-                print(f"Failed to delete VC {vc_id}: {e}")
-
-# Then clean up data and delete draft text channel
-# ✅ Delete team roles if they exist
-    for rid in draft.get("team_roles", {}).values():
-        role = guild.get_role(rid)
-        if role:
-            try:
-                await role.delete()
-            except Exception as e:
-                print(f"Error deleting role {rid}: {e}")
     del data[cid]
-    save_drafts(data)
-    await interaction.channel.delete()
+    save_drafts(guild.id, data)
+    await teardown_draft(guild, interaction.channel, draft)
 
 	
 
+async def log_draft_result(guild, cid, draft, log_channel, winner):
+    """Post the results embed and record ratings/history; `winner` is a team index or None."""
+    teams = draft_team_keys(draft)
+    sizes = [str(len(draft.get(team, [])) + 1) for team in teams]  # +1 for captain
+    draft["team_size"] = "v".join(sizes)
+
+    embed = embeds.render("results", draft, winner=winner)
+    log_message = await log_channel.send(embed=embed)
+
+    # 📈 Update player ratings
+    if winner is not None and draft["captains"]:
+        rosters = [[draft["captains"][team]] + draft.get(team, []) for team in teams]
+        ratings.record_result(guild.id, rosters, winner)
+
+    # 🗂️ Keep the result in the match history
+    if draft["captains"]:
+        match_history.record_match({
+            "guild_id": guild.id,
+            "channel_id": int(cid),
+            "source_message_id": log_message.id,  # so /importhistory skips it
+            "date": draft["date"],
+            "format": draft["team_size"],
+            "winner": winner + 1 if winner is not None else None,
+            "entry_amount": draft.get("entry_amount", 0),
+            "total_paid": draft.get("entry_amount", 0) * len(confirmed_payments.get(cid, ())),
+            "teams": [{"captain": draft["captains"][team], "members": draft.get(team, [])} for team in teams],
+        })
+    return log_message
+
+
 @tree.command(name="enddraft", description="End draft and log results")
 @app_commands.describe(winning_team="Who won?")
 @app_commands.choices(winning_team=[
-    app_commands.Choice(name="Team 1", value="team1"),
-    app_commands.Choice(name="Team 2", value="team2"),
-    app_commands.Choice(name="N/A", value="na"),
-])
+    app_commands.Choice(name=f"Team {i}", value=f"team{i}") for i in range(1, MAX_TEAMS + 1)
+] + [app_commands.Choice(name="N/A", value="na")])
 @app_commands.checks.has_any_role("Draft Admin")
 @app_commands.default_permissions() 
+@fast_ack()
 async def enddraft(interaction: discord.Interaction, winning_team: app_commands.Choice[str]):
-    data = load_drafts()
+    data = load_drafts(interaction.guild.id)
     cid = str(interaction.channel.id)
     draft = data.get(cid)
     if not draft:
-        await interaction.response.send_message("❌ No active draft found.", ephemeral=True)
+        await interaction.followup.send("❌ No active draft found.", ephemeral=True)
         return
 
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
+    resolved = resolve(interaction.guild)
+    log_channel = resolved.log_channel
     if not log_channel:
-        await interaction.response.send_message("❌ Log channel not found.", ephemeral=True)
+        await interaction.followup.send("❌ Log channel not found.", ephemeral=True)
+        return
+
+    guild = interaction.guild
+    teams = draft_team_keys(draft)
+    if winning_team.value != "na" and winning_team.value not in teams:
+        await interaction.followup.send(f"❌ This draft only has {len(teams)} teams.", ephemeral=True)
+        return
+
+    winner = teams.index(winning_team.value) if winning_team.value != "na" else None
+    await log_draft_result(guild, cid, draft, log_channel, winner)
+    await interaction.followup.send("✅ Result posted.", ephemeral=True)
+
+    del data[cid]
+    save_drafts(guild.id, data)
+    # Everyone goes back to the holding VC
+    await teardown_draft(guild, interaction.channel, draft, move_participants=True)
+
+
+# 🔁 Substitutes
+sub_group = app_commands.Group(name="sub", description="Fill in for players who drop out of drafts", guild_only=True)
+
+
+@sub_group.command(name="join", description="Be on call to fill any draft slot that opens up")
+async def sub_join(interaction: discord.Interaction):
+    if lifecycle.draining:
+        await interaction.response.send_message("🔄 The bot is restarting, try again in a minute.", ephemeral=True)
+        return
+
+    blocked = join_block_reason(interaction.user)
+    if blocked:
+        await interaction.response.send_message(blocked, ephemeral=True)
+        return
+    if not substitutes.join(interaction.guild.id, interaction.user.id):
+        await interaction.response.send_message("❌ You're already on the substitute list.", ephemeral=True)
+        return
+    await interaction.response.send_message("✅ You're on the substitute list. You'll be pinged when a slot opens.", ephemeral=True)
+
+
+@sub_group.command(name="leave", description="Stop being on call as a substitute")
+async def sub_leave(interaction: discord.Interaction):
+    if not substitutes.leave(interaction.guild.id, interaction.user.id):
+        await interaction.response.send_message("❌ You're not on the substitute list.", ephemeral=True)
+        return
+    await interaction.response.send_message("✅ Removed from the substitute list.", ephemeral=True)
+
+
+@sub_group.command(name="list", description="Show who is on call, in the order they'll be picked")
+async def sub_list(interaction: discord.Interaction):
+    ranked = substitutes.ranked(interaction.guild.id)
+    embed = discord.Embed(
+        title="🔁 Substitutes",
+        description="\n".join(f"**{i}.** <@{uid}>" for i, uid in enumerate(ranked[:20], start=1)) or "Nobody is on call.",
+        color=discord.Color.blurple()
+    )
+    embed.set_footer(text="Made by blur.exe")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@sub_group.command(name="replace", description="Swap a player out of this draft (e.g. they didn't pay)")
+@app_commands.describe(member="Player to replace")
+@app_commands.checks.has_any_role("Draft Admin")
+@fast_ack()
+async def sub_replace(interaction: discord.Interaction, member: discord.Member):
+    try:
+        replacement = await vacate_slot(interaction.guild, interaction.channel, member.id)
+    except ValueError as e:
+        await interaction.followup.send(f"❌ {e}", ephemeral=True)
+        return
+    if replacement:
+        await interaction.followup.send(f"✅ Replaced {member.mention} with <@{replacement}>.", ephemeral=True)
+    else:
+        await interaction.followup.send(f"✅ Removed {member.mention}; nobody was waiting to take the slot.", ephemeral=True)
+
+
+tree.add_command(sub_group)
+
+
+# 🧹 Bulk cleanup after events
+bulk_group = app_commands.Group(
+    name="bulk", description="Close or end many drafts at once",
+    guild_only=True, default_permissions=discord.Permissions(administrator=True)
+)
+
+
+def select_drafts(guild, data, older_than=None, only_empty=False, category=None):
+    """{cid: (draft, channel or None)} for drafts matching every given filter."""
+    cutoff = time.time() - older_than * 60 if older_than else None
+    chosen = {}
+    for cid, draft in data.items():
+        channel = guild.get_channel(int(cid))
+        if cutoff and draft["date"] > cutoff:
+            continue
+        if only_empty and draft["players"]:
+            continue
+        if category and (not channel or channel.category_id != category.id):
+            continue
+        chosen[cid] = (draft, channel)
+    return chosen
+
+
+def plan_teardown(guild, chosen, log_channel=None):
+    """Every API call needed to end/close the chosen drafts, grouped so each phase can run in parallel."""
+    plan = BatchPlan("log", "move", "release", "channels")
+    holding = resolve(guild).holding_vc
+
+    async def checked(release, obj):
+        if not await release(obj):
+            raise RuntimeError("release failed, see log")
+
+    for cid, (draft, channel) in chosen.items():
+        voice.unregister_draft(guild.id, draft)
+        if log_channel and draft["captains"]:
+            plan.add("log", "result", f"#{channel.name if channel else cid}",
+                     functools.partial(log_draft_result, guild, cid, draft, log_channel, None))
+
+        for vc_id in draft["voice_channels"].values():
+            vc = guild.get_channel(vc_id)
+            if not vc:
+                continue
+            if holding:
+                for uid in voice.members_in(vc.id):
+                    member = guild.get_member(uid)
+                    if member:
+                        plan.add("move", "move", member.display_name, functools.partial(member.move_to, holding))
+            plan.add("release", "voice", vc.name, functools.partial(checked, channel_pool.release_voice_channel, vc))
+
+        for rid in draft["team_roles"].values():
+            role = guild.get_role(rid)
+            if role:
+                plan.add("release", "role", role.name, functools.partial(checked, channel_pool.release_role, role))
+
+        if channel:
+            plan.add("channels", "text", channel.name, functools.partial(checked, channel_pool.release_text_channel, channel))
+    return plan
+
+
+def bulk_progress_embed(title, report, summary=None):
+    embed = discord.Embed(title=title, color=discord.Color.orange() if report.done < report.total else discord.Color.green())
+    embed.add_field(name="Progress", value=f"{report.done}/{report.total} operations", inline=False)
+    if summary:
+        embed.add_field(name="Planned", value=", ".join(f"{n} {kind}" for kind, n in summary.items()), inline=False)
+    if report.done >= report.total:
+        done = ", ".join(f"{n} {kind}" for kind, n in report.ok.items()) or "nothing"
+        embed.add_field(name="✅ Done", value=done, inline=False)
+        if report.failed:
+            lines = [f"{kind} {label}: {error}" for kind, label, error in report.failed[:10]]
+            embed.add_field(name=f"❌ Failed ({len(report.failed)})", value="\n".join(lines)[:1024], inline=False)
+        embed.add_field(name="⏱️ Took", value=f"{report.elapsed():.1f}s", inline=False)
+    embed.set_footer(text="Made by blur.exe")
+    return embed
+
+
+@lifecycle.critical
+async def run_bulk(interaction, title, older_than, only_empty, category, log_results):
+    if not (older_than or only_empty or category):
+        await interaction.followup.send("❌ Pick at least one filter.", ephemeral=True)
         return
 
     guild = interaction.guild
-    team1_ids = draft.get("team1", [])
-    team2_ids = draft.get("team2", [])
-    c1_id = draft["captains"]["team1"]
-    c2_id = draft["captains"]["team2"]
+    log_channel = None
+    if log_results:
+        log_channel = resolve(guild).log_channel
+        if not log_channel:
+            await interaction.followup.send("❌ Log channel not found.", ephemeral=True)
+            return
+
+    data = load_drafts(guild.id)
+    chosen = select_drafts(guild, data, older_than, only_empty, category)
+    if not chosen:
+        await interaction.followup.send("Nothing matched those filters.", ephemeral=True)
+        return
 
-    c1 = await guild.fetch_member(c1_id) if c1_id else None
-    c2 = await guild.fetch_member(c2_id) if c2_id else None
+    # Drop the records first so nothing else touches these drafts mid-teardown
+    plan = plan_teardown(guild, chosen, log_channel)
+    for cid in chosen:
+        del data[cid]
+        forget_draft(cid)
+    save_drafts(guild.id, data)
 
-    m1 = []
-    for uid in team1_ids:
-        member = await guild.fetch_member(uid)
-        m1.append(member)
+    title = f"{title}: {len(chosen)} drafts"
+    summary = plan.summary()
+    progress = await interaction.followup.send(embed=bulk_progress_embed(title, BatchReport(plan.total()), summary), ephemeral=True, wait=True)
 
-    m2 = []
-    for uid in team2_ids:
-        member = await guild.fetch_member(uid)
-        m2.append(member)
+    async def on_progress(report):
+        await progress.edit(embed=bulk_progress_embed(title, report, summary))
 
-    draft["team_size"] = f"{len(draft['team1']) + 1}v{len(draft['team2']) + 1}"
+    await run_batch(plan, on_progress)
 
 
-    embed = discord.Embed(title="📊 Draft Results", description=f"**Fortnite Drafts {draft['team_size']}**", color=discord.Color.blue())
-    embed.add_field(name="Team Size", value=draft["team_size"], inline=True)
-    embed.add_field(name="📅 Date", value=f"<t:{draft['date']}:F>", inline=True)
+@bulk_group.command(name="close", description="Close every draft matching the filters")
+@app_commands.describe(
+    older_than="Only drafts created more than this many minutes ago",
+    only_empty="Only drafts nobody joined",
+    category="Only drafts in this category"
+)
+@fast_ack()
+async def bulk_close(interaction: discord.Interaction, older_than: int = None, only_empty: bool = False, category: discord.CategoryChannel = None):
+    await run_bulk(interaction, "🧹 Closing drafts", older_than, only_empty, category, log_results=False)
+
+
+@bulk_group.command(name="end", description="End every draft matching the filters, logging them with no winner")
+@app_commands.describe(
+    older_than="Only drafts created more than this many minutes ago",
+    only_empty="Only drafts nobody joined",
+    category="Only drafts in this category"
+)
+@fast_ack()
+async def bulk_end(interaction: discord.Interaction, older_than: int = None, only_empty: bool = False, category: discord.CategoryChannel = None):
+    await run_bulk(interaction, "🏁 Ending drafts", older_than, only_empty, category, log_results=True)
+
+
+tree.add_command(bulk_group)
+
+
+@tree.command(name="stats", description="Show draft stats for a player")
+@app_commands.describe(member="Player to look up (defaults to you)")
+async def stats(interaction: discord.Interaction, member: discord.Member = None):
+    member = member or interaction.user
+    row = match_history.player_stats(interaction.guild.id, member.id)
+    if not row:
+        await interaction.response.send_message(f"❌ {member.mention} hasn't played any drafts yet.", ephemeral=True)
+        return
+
+    rating = ratings.get_ratings(interaction.guild.id, [member.id])[member.id]
+    decided = row["wins"] + row["losses"]
+    win_rate = f"{row['wins'] / decided:.0%}" if decided else "N/A"
+
+    embed = discord.Embed(title=f"📈 Stats for {member.display_name}", color=discord.Color.blurple())
+    embed.add_field(name="🎮 Drafts", value=str(row["games"]), inline=True)
+    embed.add_field(name="🏆 Record", value=f"{row['wins']}W - {row['losses']}L", inline=True)
+    embed.add_field(name="📊 Win Rate", value=win_rate, inline=True)
+    embed.add_field(name="👑 As Captain", value=f"{row['captain_wins']}W in {row['captain_games']} drafts", inline=True)
+    embed.add_field(name="⭐ Rating", value=f"{rating:.0f}", inline=True)
+    embed.add_field(name="📅 Last Played", value=f"<t:{row['last_played']}:R>", inline=True)
+    embed.set_footer(text="Made by blur.exe")
+    await interaction.response.send_message(embed=embed)
+
+
+@tree.command(name="leaderboard", description="Show the top draft players")
+@app_commands.describe(sort_by="What to rank players by")
+@app_commands.choices(sort_by=[
+    app_commands.Choice(name="Wins", value="wins"),
+    app_commands.Choice(name="Win Rate", value="winrate"),
+    app_commands.Choice(name="Rating", value="rating"),
+    app_commands.Choice(name="Drafts Played", value="games"),
+])
+async def leaderboard(interaction: discord.Interaction, sort_by: app_commands.Choice[str] = None):
+    sort = sort_by.value if sort_by else "wins"
+    rows = match_history.leaderboard(interaction.guild.id, sort)
 
-    if winning_team.value == "team1":
-        embed.add_field(name="🏆 Winning Team", value=f"**Captain:** {c1.mention}\n**Members:**\n" + "\n".join(m.mention for m in m1), inline=True)
-        embed.add_field(name="📍 Losing Team", value=f"**Captain:** {c2.mention}\n**Members:**\n" + "\n".join(m.mention for m in m2), inline=True)
-    elif winning_team.value == "team2":
-        embed.add_field(name="🏆 Winning Team", value=f"**Captain:** {c2.mention}\n**Members:**\n" + "\n".join(m.mention for m in m2), inline=True)
-        embed.add_field(name="📍 Losing Team", value=f"**Captain:** {c1.mention}\n**Members:**\n" + "\n".join(m.mention for m in m1), inline=True)
+    lines = []
+    for rank, (uid, games, wins, rating) in enumerate(rows, start=1):
+        lines.append(f"**{rank}.** <@{uid}> — {wins}W / {games} drafts • ⭐ {rating:.0f}")
 
+    embed = discord.Embed(
+        title=f"🏆 Leaderboard — {sort_by.name if sort_by else 'Wins'}",
+        description="\n".join(lines) if lines else "No drafts recorded yet.",
+        color=discord.Color.gold()
+    )
+    if sort == "winrate":
+        embed.set_footer(text=f"Minimum {match_history.MIN_WINRATE_GAMES} drafts • Made by blur.exe")
     else:
-        embed.add_field(name="⚠️ No Winner", value="This draft ended without a declared winner, but here were the teams at the time:", inline=False)
-        embed.add_field(
-            name="🟦 Team 1",
-            value=f"**Captain:** {c1.mention if c1 else 'N/A'}\n" + ("\n".join(m.mention for m in m1) if m1 else "No members."),
-            inline=True
+        embed.set_footer(text="Made by blur.exe")
+    await interaction.response.send_message(embed=embed)
+
+
+@tree.command(name="history", description="Show recent drafts")
+@app_commands.describe(member="Only show drafts this player was in")
+async def history(interaction: discord.Interaction, member: discord.Member = None):
+    rows = match_history.recent_matches(interaction.guild.id, member.id if member else None)
+
+    lines = []
+    for date, fmt, winner, team, result in rows:
+        if member:
+            outcome = {1: "🏆 Won", 0: "📍 Lost"}.get(result, "⚠️ No result")
+            lines.append(f"<t:{date}:d> • {fmt} • Team {team} • {outcome}")
+        else:
+            outcome = f"Team {winner} won" if winner else "No winner"
+            lines.append(f"<t:{date}:d> • {fmt} • {outcome}")
+
+    embed = discord.Embed(
+        title=f"🗂️ Recent Drafts{f' for {member.display_name}' if member else ''}",
+        description="\n".join(lines) if lines else "No drafts recorded yet.",
+        color=discord.Color.blue()
     )
-        embed.add_field(
-            name="🟥 Team 2",
-            value=f"**Captain:** {c2.mention if c2 else 'N/A'}\n" + ("\n".join(m.mention for m in m2) if m2 else "No members."),
-            inline=True
+    embed.set_footer(text="Made by blur.exe")
+    await interaction.response.send_message(embed=embed)
+
+
+@tree.command(name="export", description="Export draft history or the payment ledger as a file")
+@app_commands.describe(kind="What to export", file_format="File type", days="Only the last N days (default: everything)")
+@app_commands.choices(
+    kind=[
+        app_commands.Choice(name="Players per match", value="players"),
+        app_commands.Choice(name="Matches", value="matches"),
+        app_commands.Choice(name="Payments", value="payments"),
+    ],
+    file_format=[app_commands.Choice(name=fmt.upper(), value=fmt) for fmt in export.FORMATS],
+)
+@app_commands.checks.has_any_role("Draft Admin")
+@app_commands.default_permissions()
+@fast_ack()
+async def export_command(interaction: discord.Interaction, kind: app_commands.Choice[str], file_format: app_commands.Choice[str] = None, days: int = None):
+    fmt = file_format.value if file_format else "csv"
+    since = int(time.time()) - days * 86400 if days else 0
+
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        # Streams from its own DB connection off the event loop, so the bot keeps responding
+        count = await executor.run("export", export.export, kind.value, fmt, interaction.guild.id, path, since)
+        if os.path.getsize(path) > interaction.guild.filesize_limit:
+            await interaction.followup.send(f"❌ The export is too big to upload ({count} rows). Use `python export.py` on the host instead.", ephemeral=True)
+            return
+        filename = f"{kind.value}-{datetime.date.today().isoformat()}.{fmt}"
+        await interaction.followup.send(f"📦 {count} rows", file=discord.File(path, filename=filename), ephemeral=True)
+    except Exception as e:
+        await interaction.followup.send(f"❌ Export failed: {e}", ephemeral=True)
+    finally:
+        os.remove(path)
+
+
+_imports = set()  # running history imports, referenced until they finish
+
+
+@tree.command(name="importhistory", description="Import old draft results from the log channel")
+@app_commands.describe(restart="Start over from the newest message instead of resuming")
+@app_commands.checks.has_any_role("Draft Admin")
+@app_commands.default_permissions()
+async def importhistory(interaction: discord.Interaction, restart: bool = False):
+    log_channel = resolve(interaction.guild).log_channel
+    if not log_channel:
+        await interaction.response.send_message("❌ Log channel not found.", ephemeral=True)
+        return
+    if log_channel.id in backfill.running:
+        await interaction.response.send_message("⏳ An import is already running.", ephemeral=True)
+        return
+
+    if restart:
+        backfill.reset_checkpoint(log_channel.id)
+    await interaction.response.send_message(f"📥 Importing results from {log_channel.mention}...", ephemeral=True)
+
+    # Progress goes to a normal message: imports can outlive the 15 minute interaction token
+    progress = await interaction.channel.send("📥 Import starting...")
+
+    async def on_progress(scanned, imported, finished):
+        status = "✅ Import finished" if finished else "📥 Importing"
+        try:
+            await progress.edit(content=f"{status}: scanned {scanned} messages, imported {imported} drafts.")
+        except discord.HTTPException:
+            pass
+
+    async def run():
+        try:
+            scanned, imported = await backfill.import_channel(log_channel, on_progress)
+            await progress.edit(content=f"✅ Import finished: scanned {scanned} messages, imported {imported} drafts. Ratings rebuilt.")
+        except Exception as e:
+            print(f"Error importing history: {e}")
+            await progress.edit(content=f"❌ Import stopped: {e}. Run the command again to resume.")
+
+    task = bot.loop.create_task(run())
+    _imports.add(task)
+    task.add_done_callback(_imports.discard)
+
+
+def matchmaking_group_size(fmt):
+    team_count, players_per_team = parse_format(fmt)
+    return team_count * players_per_team
+
+
+def matchmaking_order(guild_id, players):
+    # Grouping by rating puts players of similar skill in the same draft
+    if get_config(guild_id).matchmaking == "rating":
+        player_ratings = ratings.get_ratings(guild_id, players)
+        return sorted(players, key=player_ratings.get, reverse=True)
+    return players
+
+
+async def start_matched_draft(guild_id, fmt, players):
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        return
+
+    team_count, players_per_team = parse_format(fmt)
+    channel = await create_draft_channel(guild, bot.user, team_count, players_per_team, players=players)
+    await channel.send("🤝 Matchmaking found a full lobby: " + " ".join(f"<@{uid}>" for uid in players))
+    await auto_start_draft(guild, channel)
+
+
+matchmaking = MatchmakingPool(matchmaking_group_size, matchmaking_order, start_matched_draft, drafting_players)
+
+queue_group = app_commands.Group(name="queue", description="Matchmaking: get put into a draft automatically", guild_only=True)
+
+
+@queue_group.command(name="join", description="Join the matchmaking queue for a format")
+@app_commands.describe(team_size="Format, e.g. 3v3 or 4v4")
+async def queue_join(interaction: discord.Interaction, team_size: str):
+    if lifecycle.draining:
+        await interaction.response.send_message("🔄 The bot is restarting, try again in a minute.", ephemeral=True)
+        return
+
+    blocked = join_block_reason(interaction.user)
+    if blocked:
+        await interaction.response.send_message(blocked, ephemeral=True)
+        return
+
+    try:
+        fmt = format_name(*parse_format(team_size))
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    if interaction.user.id in drafting_players(interaction.guild.id):
+        await interaction.response.send_message("❌ You're already in a draft. Queue again once it's over.", ephemeral=True)
+        return
+
+    if not matchmaking.join(interaction.guild.id, fmt, interaction.user.id):
+        await interaction.response.send_message(f"❌ You're already queued for {fmt}.", ephemeral=True)
+        return
+
+    waiting = matchmaking.sizes(interaction.guild.id).get(fmt, 0)
+    await interaction.response.send_message(
+        f"✅ Queued for **{fmt}** ({waiting}/{matchmaking_group_size(fmt)}). You'll be pinged when your draft is ready.",
+        ephemeral=True
     )
 
+
+@queue_join.autocomplete("team_size")
+async def queue_join_autocomplete(interaction: discord.Interaction, current: str):
+    return await team_size_autocomplete(interaction, current)
+
+
+@queue_group.command(name="leave", description="Leave the matchmaking queue")
+@app_commands.describe(team_size="Only leave this format's queue")
+async def queue_leave(interaction: discord.Interaction, team_size: str = None):
+    try:
+        fmt = format_name(*parse_format(team_size)) if team_size else None
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    left = matchmaking.leave(interaction.guild.id, interaction.user.id, fmt)
+    if not left:
+        await interaction.response.send_message("❌ You're not in the matchmaking queue.", ephemeral=True)
+        return
+    await interaction.response.send_message(f"✅ Left the queue for {', '.join(left)}.", ephemeral=True)
+
+
+@queue_group.command(name="status", description="Show how many players are waiting per format")
+async def queue_status(interaction: discord.Interaction):
+    sizes = matchmaking.sizes(interaction.guild.id)
+    lines = [f"**{fmt}**: {count}/{matchmaking_group_size(fmt)} waiting" for fmt, count in sorted(sizes.items())]
+    mine = matchmaking.formats_for(interaction.guild.id, interaction.user.id)
+
+    embed = discord.Embed(
+        title="🤝 Matchmaking Queue",
+        description="\n".join(lines) if lines else "Nobody is queued right now.",
+        color=discord.Color.blurple()
+    )
+    if mine:
+        embed.add_field(name="You're queued for", value=", ".join(mine), inline=False)
     embed.set_footer(text="Made by blur.exe")
-    await log_channel.send(embed=embed)
-    await interaction.response.send_message("✅ Result posted.", ephemeral=True)
-
-    await move_all_in_voice_channels(guild, draft.get("voice_channels", {}), 1377124001519898634)
-# Delete voice channels if they exist
-    vc_info = draft.get("voice_channels", {})
-    for vc_id in vc_info.values():
-        vc = interaction.guild.get_channel(vc_id)
-        if vc:
-            try:
-                await vc.delete()
-            except Exception as e:
-                print(f"Failed to delete voice channel {vc_id}: {e}")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    save_drafts(data)
 
+tree.add_command(queue_group)
 
-# Move all users to the holding voice channel
-    holding_channel = guild.get_channel(1377124001519898634)  # Your holding VC
 
-    for uid in draft["team1"] + draft["team2"] + [draft["captains"]["team1"], draft["captains"]["team2"]]:
-        member = guild.get_member(uid)
-        if member and member.voice:
-            try:
-                await member.move_to(holding_channel)
-            except:
-                pass  # Fail silently if user can't be moved
-
-# Now delete team voice channels
-    voice_ids = draft.get("voice_channels", {})
-    vc1 = guild.get_channel(voice_ids.get("team1"))
-    vc2 = guild.get_channel(voice_ids.get("team2"))
-
-    if vc1:
-        await vc1.delete()
-    if vc2:
-        await vc2.delete()
-
-# Finally delete the draft channel
-# Delete created voice channels
-    vc1 = interaction.guild.get_channel(draft.get("vc1_id", 0))
-    vc2 = interaction.guild.get_channel(draft.get("vc2_id", 0))
-    if vc1:
-        await vc1.delete()
-    if vc2:
-        await vc2.delete()
-
-# Auto-delete voice channels if they exist
-    vc1_id = draft.get("vc1_id")
-    vc2_id = draft.get("vc2_id")
-    if vc1_id:
-        vc1 = guild.get_channel(vc1_id)
-        if vc1:
-            await vc1.delete()
-    if vc2_id:
-        vc2 = guild.get_channel(vc2_id)
-        if vc2:
-            await vc2.delete()
-
-    await move_and_delete_voice_channels(interaction.guild, draft)
-    # ✅ Delete team roles if they exist
-    for rid in draft.get("team_roles", {}).values():
-        role = guild.get_role(rid)
-        if role:
-            try:
-                await role.delete()
-            except Exception as e:
-                print(f"Error deleting role {rid}: {e}")
-    del data[cid]
-    save_drafts(data)
-    await interaction.channel.delete()
+config_group = app_commands.Group(
+    name="config",
+    description="View or change this server's draft settings",
+    guild_only=True,
+    default_permissions=discord.Permissions()
+)
 
 
-async def auto_start_draft(guild, channel):
-    data = load_drafts()
-    draft = data[str(channel.id)]
+@config_group.command(name="show", description="Show this server's draft settings")
+@app_commands.checks.has_any_role("Draft Admin")
+async def config_show(interaction: discord.Interaction):
+    embed = discord.Embed(
+        title="⚙️ Draft Settings",
+        description=format_config(get_config(interaction.guild.id)),
+        color=discord.Color.blurple()
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@config_group.command(name="set", description="Change one of this server's draft settings")
+@app_commands.describe(key="Setting to change", value="New value (ID, mention or link, 0 to unset)")
+@app_commands.choices(key=[app_commands.Choice(name=k, value=k) for k in CONFIG_KEYS])
+@app_commands.checks.has_any_role("Draft Admin")
+async def config_set(interaction: discord.Interaction, key: app_commands.Choice[str], value: str):
+    try:
+        update_config(interaction.guild.id, key.value, value)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    await interaction.response.send_message(f"✅ `{key.value}` updated.", ephemeral=True)
+
+
+@config_group.command(name="reload", description="Reload draft settings from disk")
+@app_commands.checks.has_any_role("Draft Admin")
+async def config_reload(interaction: discord.Interaction):
+    reload_configs(force=True)
+    await interaction.response.send_message("✅ Settings reloaded.", ephemeral=True)
+
+
+tree.add_command(config_group)
+
+
+@tree.command(name="metrics", description="Show the bot's internal queue and latency metrics")
+@app_commands.checks.has_any_role("Draft Admin")
+@app_commands.default_permissions()
+async def metrics(interaction: discord.Interaction):
+    embed = discord.Embed(title="📊 Bot Metrics", color=discord.Color.blurple())
+    for name, m in executor.metrics().items():
+        embed.add_field(
+            name=f"⚙️ {name} queue",
+            value=(
+                f"Depth: {m['depth']} ({m['waiting']} waiting, {m['running']} running)\n"
+                f"Done: {m['completed']} • Failed: {m['failed']}\n"
+                f"Wait: {m['avg_wait_ms']:.1f}ms • Run: {m['avg_run_ms']:.1f}ms • Max: {m['max_latency_ms']:.0f}ms"
+            ),
+            inline=False
+        )
+
+    # Slowest handlers first; anything near 3s is about to show "interaction failed"
+    acks = sorted(ack_metrics().items(), key=lambda item: item[1]["max_ms"], reverse=True)[:10]
+    embed.add_field(
+        name="⏱️ Interaction acks",
+        value="\n".join(
+            f"`{name}` {m['count']}× • avg {m['avg_ms']:.0f}ms • max {m['max_ms']:.0f}ms"
+            + (f" • {m['slow']} slow" if m["slow"] else "")
+            + (f" • {m['failed']} failed" if m["failed"] else "")
+            for name, m in acks
+        ) or "No interactions yet.",
+        inline=False
+    )
+
+    # REST calls in the last window; guild-wide routes are the ones that 429 first
+    rb = budget.snapshot(interaction.guild.id, [int(cid) for cid in load_drafts(interaction.guild.id)])
+    lines = [f"{rb['used']}/{rb['budget']} calls in the last {rb['window']}s • " + ("⚠️ tight, shedding extras" if rb["tight"] else "✅ ok")]
+    lines += [f"`{bucket}` {used}/{limit}" for bucket, (used, limit) in rb["route_budgets"].items()]
+    lines += [f"`{bucket}` {used}" for bucket, used in rb["buckets"][:5] if bucket not in rb["route_budgets"]]
+    top_drafts = sorted(rb["drafts"].items(), key=lambda item: item[1], reverse=True)[:5]
+    lines += [f"<#{cid}> {used} calls" for cid, used in top_drafts]
+    if rb["degraded"]:
+        lines.append("Shed: " + ", ".join(f"{kind} ×{n}" for kind, n in sorted(rb["degraded"].items())))
+    embed.add_field(name="📉 Rate budget", value="\n".join(lines)[:1024], inline=False)
+    embed.set_footer(text="Made by blur.exe")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@lifecycle.critical
+@per_draft
+async def auto_start_draft(guild, channel, paid=False):
+    """Pick captains and open picking; money drafts first go through the Middle Man
+    and only start once `paid` (every payment confirmed, or a manual start)."""
+    data = load_drafts(guild.id)
+    draft = data.get(str(channel.id))
+    if not draft or draft["captains"]:
+        return  # gone, or already picking: never re-deal captains mid-draft
+
+    if draft.get("is_money_draft") and not paid:
+        await send_middleman_selection(channel)
+        return
 
     ids = draft["players"]
-    captains = random.sample(ids, 2)
-    players_per_team = (len(ids) - 2) // 2
+    teams = draft_team_keys(draft)
+    # A dropout nobody could sub for can leave a count that won't split into even teams
+    if len(ids) < len(teams) * 2 or len(ids) % len(teams):
+        await channel.send(
+            f"⏳ {len(ids)} players can't be split evenly into {len(teams)} teams. "
+            "The draft will start once a sub joins and pays."
+        )
+        return
+    if get_config(guild.id).captain_selection == "rating":
+        captains = ratings.pick_captains(guild.id, ids, len(teams))
+    else:
+        captains = random.sample(ids, len(teams))
+    players_per_team = len(ids) // len(teams)
 
-    draft["team_size"] = f"{players_per_team}v{players_per_team}"
-    draft["captains"]["team1"] = captains[0]
-    draft["captains"]["team2"] = captains[1]
+    draft["team_size"] = format_name(len(teams), players_per_team)
+    draft["captains"] = dict(zip(teams, captains))
     draft["available"] = [uid for uid in ids if uid not in captains]
-    draft["team1"] = []
-    draft["team2"] = []
-    draft["pick_turn"] = "team1"
-    save_drafts(data)
-
-    c1 = await guild.fetch_member(captains[0])
-    c2 = await guild.fetch_member(captains[1])
-    snake = draft["snake_draft"]
+    for team in teams:
+        draft[team] = []
+
+    # ✅ Build the whole pick order once; every pick is then just an index lookup
+    draft["pick_schedule"] = build_schedule(
+        draft_pick_order(draft),
+        len(teams),
+        len(draft["available"]),
+        draft.get("custom_pattern")
+    )
+    draft["pick_index"] = 0
+    draft["pick_turn"] = draft["pick_schedule"][0] if draft["pick_schedule"] else None
+    save_drafts(guild.id, data)
 
-    if not draft.get("is_money_draft"):
-        await send_actual_draft_start(channel)
-        await assign_team_roles(guild, channel, draft)
-        await send_pick_options(channel)
-        await dm_players_draft_started(channel)
-    else:
-        await send_middleman_selection(channel)
+    await send_actual_draft_start(channel)
+    await send_pick_options(channel)
+    await dm_players_draft_started(channel)
 
 
 
 
+@per_draft
 async def dm_players_draft_started(channel):
     """Send every queued player a DM that the draft room is open and waiting on the Middle Man."""
-    data  = load_drafts()
+    data  = load_drafts(channel.guild.id)
     draft = data[str(channel.id)]
 
     dm_embed = discord.Embed(
@@ -977,31 +1762,14 @@ async def dm_players_draft_started(channel):
     dm_embed.set_footer(text="Made by blur.exe")
     view = GoToDraftButton(channel)
 
-    for uid in draft["players"]:
-        try:
-            member = await channel.guild.fetch_member(uid)
-            await member.send(embed=dm_embed, view=view)
-        except Exception as e:
-            print(f"❌ Couldn't DM {uid}: {e}")
+    for uid in await dm_members(channel.guild, draft["players"], embed=dm_embed, view=view):
+        print(f"❌ Couldn't DM {uid}")
 
+@per_draft
 async def send_actual_draft_start(channel):
-    data = load_drafts()
+    data = load_drafts(channel.guild.id)
     draft = data[str(channel.id)]
-    c1 = await channel.guild.fetch_member(draft["captains"]["team1"])
-    c2 = await channel.guild.fetch_member(draft["captains"]["team2"])
-    snake = draft["snake_draft"]
-
-    embed = discord.Embed(
-        title="🏁 Draft Started!",
-        description="The draft has begun. Captains and pick order are listed below.",
-        color=discord.Color.green()
-    )
-    embed.add_field(name="🟦 Team 1 Captain", value=f"{c1.mention} (picks first)", inline=False)
-    embed.add_field(name="🟥 Team 2 Captain", value=f"{c2.mention}", inline=False)
-    embed.add_field(name="Pick Order", value="🐍 Snake Draft Enabled" if snake else "➡️ Normal Draft Order", inline=False)
-    embed.set_footer(text="Made by blur.exe")
-
-    await channel.send(embed=embed)
+    await embeds.send(channel, embeds.render("draft_started", draft))
 
     # ✅ DM players with an embed and a "Go to Draft" button
     dm_embed = discord.Embed(
@@ -1012,209 +1780,263 @@ async def send_actual_draft_start(channel):
     dm_embed.set_footer(text="Made by blur.exe")
     view = GoToDraftButton(channel)
 
-    for uid in draft["players"]:
-        try:
-            member = await channel.guild.fetch_member(uid)
-            await member.send(embed=dm_embed, view=view)
-        except Exception as e:
-            print(f"❌ Couldn't DM {uid}: {e}")
+    for uid in await dm_members(channel.guild, draft["players"], embed=dm_embed, view=view):
+        print(f"❌ Couldn't DM {uid}")
 
 
+@lifecycle.critical
+@per_draft
 async def finalize_draft_teams(channel):
-    data = load_drafts()
+    data = load_drafts(channel.guild.id)
     draft = data.get(str(channel.id))
     if not draft:
         return
 
-    c1 = await channel.guild.fetch_member(draft["captains"]["team1"])
-    c2 = await channel.guild.fetch_member(draft["captains"]["team2"])
-    m1 = [await channel.guild.fetch_member(uid) for uid in draft["team1"]]
-    m2 = [await channel.guild.fetch_member(uid) for uid in draft["team2"]]
+    teams = draft_team_keys(draft)
 
     # ✅ Dynamically update team size based on players
-    players_per_team = len(draft["team1"])  # excludes captain
-    draft["team_size"] = f"{players_per_team + 1}v{players_per_team + 1}"  # +1 for captain
+    draft["team_size"] = "v".join(str(len(draft[team]) + 1) for team in teams)  # +1 for captain
 
     # ✅ Final Teams Embed
-    embed = discord.Embed(
-        title="🎯 Final Teams",
-        description="Teams have been finalized!",
-        color=discord.Color.green()
-    )
-    embed.add_field(name="🟦 Team 1", value=f"**Captain:** {c1.mention}\n" + "\n".join(m.mention for m in m1), inline=True)
-    embed.add_field(name="🟥 Team 2", value=f"**Captain:** {c2.mention}\n" + "\n".join(m.mention for m in m2), inline=True)
-    embed.set_footer(text="Made by blur.exe")
-    await channel.send(embed=embed)
+    rosters = [[draft["captains"][team]] + draft[team] for team in teams]
+    balance = ratings.balance_score(channel.guild.id, rosters)
+    await embeds.send(channel, embeds.render("teams_finalized", draft, balance=balance))
 
-    # ✅ Create Team Roles
-    permissions = discord.Permissions()
-    permissions.update(connect=True, view_channel=True, move_members=True)
     channel_number = channel.name.split("-")[-1]  # e.g., "1955"
-    team1_role = await channel.guild.create_role(name=f"Team 1 ({draft['team_size']} #{channel_number})", permissions=permissions)
-    team2_role = await channel.guild.create_role(name=f"Team 2 ({draft['team_size']} #{channel_number})", permissions=permissions)
-
+    everyone_role  = channel.guild.default_role
 
+    team_roles = {}
+    team_vcs = {}
+    for i, team in enumerate(teams):
+        # ✅ Lease Team Role from the pool
+        role = await channel_pool.lease_role(channel.guild, f"Team {i + 1} ({draft['team_size']} #{channel_number})")
+        team_roles[team] = role
 
-# ✅ Assign Roles to Players
-    for uid in draft["team1"] + [draft["captains"]["team1"]]:
-        member = await channel.guild.fetch_member(uid)
-        await member.add_roles(team1_role)
+        # ✅ Assign Role to Players
+        for uid in draft[team] + [draft["captains"][team]]:
+            member = await channel.guild.fetch_member(uid)
+            await member.add_roles(role)
 
-    for uid in draft["team2"] + [draft["captains"]["team2"]]:
-        member = await channel.guild.fetch_member(uid)
-        await member.add_roles(team2_role)
+        # ✅ Lease Voice Channel With Role Permissions
+        overwrites = {
+            everyone_role: discord.PermissionOverwrite(view_channel=True, connect=False),
+            role:          discord.PermissionOverwrite(view_channel=True, connect=True)
+        }
+        team_vcs[team] = await channel_pool.lease_voice_channel(
+            channel.guild,
+            f"Team {i + 1} ({draft['team_size']})",
+            overwrites,
+            len(draft[team]) + 1
+        )
 
-# ✅ Create Voice Channels With Role Permissions
-    voice_category = channel.guild.get_channel(1377123860108804177)
-    everyone_role  = channel.guild.default_role
+# ✅ Save VC and Role IDs
+    draft["voice_channels"] = {team: vc.id for team, vc in team_vcs.items()}
+    draft["team_roles"] = {team: role.id for team, role in team_roles.items()}
+    save_drafts(channel.guild.id, data)
+
+
+    # ✅ Move connected members into their team VCs, all at once
+    voice.register_draft(channel.guild.id, draft)
+    await voice.move_members(channel.guild, {
+        uid: team_vcs[team] for team in teams for uid in draft[team] + [draft["captains"][team]]
+    })
+
+# With several workers polling one inbox, each one only knows its own drafts.
+# Peek instead of fetching so an email stays unread for the other workers, and
+# only flag it as seen once it matched one of our pending payments.
+SHARED_INBOX = SHARD_IDS is not None
+seen_email_uids = set()
+PAYMENT_POLL_SECONDS = 15
+
+def fetch_cashapp_payments(waiting):
+    """One blocking pass over the inbox (runs on the "imap" executor queue).
+
+    `waiting` is {channel_id: {cash_tag: user_id}} for payments not confirmed
+    yet; returns [(channel_id, user_id, cash_tag)] for every match.
+    """
+    # Only paid for once the watcher actually starts
+    import imaplib
+    import email
+    from email.header import decode_header
+
+    matches = []
+    # Connect to Gmail
+    mail = imaplib.IMAP4_SSL("imap.gmail.com")
+    mail.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+    try:
+        mail.select("inbox")
+
+        # Search for recent Cash App emails
+        result, data = mail.uid("search", None, '(UNSEEN FROM "cash@square.com")')
+        if result != "OK":
+            return matches
+
+        for num in data[0].split():
+            if num in seen_email_uids:
+                continue
+            seen_email_uids.add(num)
+
+            result, msg_data = mail.uid("fetch", num, "(BODY.PEEK[])" if SHARED_INBOX else "(RFC822)")
+            if result != "OK":
+                continue
+
+            msg = email.message_from_bytes(msg_data[0][1])
+            raw_subject = msg.get("Subject")
+            if raw_subject is None:
+                continue  # skip if subject is missing
+
+            subject, encoding = decode_header(raw_subject)[0]
+            if isinstance(subject, bytes):
+                subject = subject.decode(encoding if encoding else "utf-8")
+
+            print(f"📩 New email: {subject}")
+
+            # Check each pending payment for matching cash tag
+            for channel_id, tag_map in waiting.items():
+                for tag, user_id in tag_map.items():
+                    if tag.lower() in subject.lower():
+                        matches.append((channel_id, user_id, tag))
+                        if SHARED_INBOX:
+                            mail.uid("store", num, "+FLAGS", "\\Seen")
+    finally:
+        mail.logout()
+    return matches
+
+
+async def confirm_payment(channel_id, user_id, cash_tag):
+    confirmed = confirmed_payments.setdefault(channel_id, set())
+    if user_id in confirmed:
+        return
+    confirmed.add(user_id)
 
-    overwrites_team1 = {
-        everyone_role: discord.PermissionOverwrite(view_channel=True, connect=False),
-        team1_role:    discord.PermissionOverwrite(view_channel=True, connect=True)
-}
+    channel = bot.get_channel(int(channel_id))
+    if not channel:
+        return
+    record_confirmed_payment(channel, user_id, cash_tag)
+    await channel.send(f"✅ <@{user_id}> sent payment!")
+    draft = load_drafts(channel.guild.id).get(channel_id)
+    if draft and everyone_paid(draft, channel_id):
+        await auto_start_draft(channel.guild, channel, paid=True)
+
+
+async def watch_cashapp_payments():
+    while not lifecycle.draining:
+        waiting = {
+            cid: {tag: uid for tag, uid in tags.items() if uid not in confirmed_payments.get(cid, ())}
+            for cid, tags in pending_payments.items()
+        }
+        try:
+            for match in await executor.run("imap", fetch_cashapp_payments, waiting):
+                await confirm_payment(*match)
+        except Exception as e:
+            print(f"[EMAIL ERROR] {e}")
+        await asyncio.sleep(PAYMENT_POLL_SECONDS)
 
-    overwrites_team2 = {
-        everyone_role: discord.PermissionOverwrite(view_channel=True, connect=False),
-        team2_role:    discord.PermissionOverwrite(view_channel=True, connect=True)
-}
 
-    team1_vc = await channel.guild.create_voice_channel(
-        f"Team 1 ({draft['team_size']})",
-        category=voice_category,
-        overwrites=overwrites_team1
-)
+def record_confirmed_payment(channel, user_id, cash_tag):
+    draft = load_drafts(channel.guild.id).get(str(channel.id))
+    amount = draft.get("entry_amount", 0) if draft else 0
+    match_history.record_payment(channel.guild.id, channel.id, user_id, cash_tag, amount, int(time.time()))
 
-    team2_vc = await channel.guild.create_voice_channel(
-        f"Team 2 ({draft['team_size']})",
-        category=voice_category,
-        overwrites=overwrites_team2
-)
 
-    await team1_vc.edit(user_limit=len(draft["team1"]) + 1)
-    await team2_vc.edit(user_limit=len(draft["team2"]) + 1)
+payment_watcher = None
 
-# ✅ Save VC and Role IDs
-    draft["voice_channels"] = {
-        "team1": team1_vc.id,
-        "team2": team2_vc.id
-}
-    draft["team_roles"] = {
-        "team1": team1_role.id,
-        "team2": team2_role.id
-}
-    save_drafts(data)
-
-
-    # ✅ Move Members
-    async def move_members(member_ids, vc):
-        for uid in member_ids:
-            member = channel.guild.get_member(uid)
-            if member and member.voice:
-                try:
-                    await member.move_to(vc)
-                except Exception as e:
-                    print(f"Error moving {member.display_name}: {e}")
-
-    await move_members(draft["team1"] + [draft["captains"]["team1"]], team1_vc)
-    await move_members(draft["team2"] + [draft["captains"]["team2"]], team2_vc)
-
-async def move_all_in_voice_channels(guild, vc_ids, target_channel_id):
-    target_channel = guild.get_channel(target_channel_id)
-    if not target_channel:
-        print("❌ Holding VC not found")
+def start_payment_watcher():
+    global payment_watcher
+    if payment_watcher or not (EMAIL_ADDRESS and EMAIL_PASSWORD):
         return
+    payment_watcher = asyncio.create_task(watch_cashapp_payments())
 
-    for vc_id in vc_ids.values():
-        vc = guild.get_channel(vc_id)
-        if vc:
-            for member in vc.members:
-                try:
-                    await member.move_to(target_channel)
-                except Exception as e:
-                    print(f"Error moving {member.display_name}: {e}")
 
+@lifecycle.on_drain
+def stop_accepting_work():
+    # Nobody new gets matched while we drain; running drafts finish normally
+    matchmaking.stop()
+    if payment_watcher:
+        payment_watcher.cancel()
 
-import imaplib
-import email
-from email.header import decode_header
-import time
-import threading
 
-# Global payment trackers
-pending_payments = {}  # {channel_id: {cash_tag: user_id}}
-confirmed_payments = {}  # {channel_id: set(user_ids)}
+async def shutdown():
+    pick_timers.stop()  # deadlines are saved in the drafts and re-armed on the next start
+    await flush_writes()
+    # Waits for an in-progress IMAP pass to finish and log out
+    await asyncio.to_thread(executor.shutdown)
+    stats_db.close()
+    print("👋 Drained, shutting down")
+    await bot.close()
 
-def check_cashapp_emails():
-    while True:
-        try:
-            # Connect to Gmail
-            mail = imaplib.IMAP4_SSL("imap.gmail.com")
-            mail.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            mail.select("inbox")
-
-            # Search for recent Cash App emails
-            result, data = mail.search(None, '(UNSEEN FROM "cash@square.com")')
-            if result == "OK":
-                for num in data[0].split():
-                    result, msg_data = mail.fetch(num, "(RFC822)")
-                    if result == "OK":
-                        msg = email.message_from_bytes(msg_data[0][1])
-                        subject_raw = msg["Subject"]
-                        if subject_raw is None:
-                            continue  # Skip this email, no subject
-
-                        subject_header = msg.get("Subject")
-                        if subject_header is None:
-                            continue  # Skip if there's no subject
-
-                        raw_subject = msg.get("Subject")
-                        if raw_subject is None:
-                            continue  # skip if subject is missing
-
-                        subject, encoding = decode_header(raw_subject)[0]
-                        if isinstance(subject, bytes):
-                            subject = subject.decode(encoding if encoding else "utf-8")
-
-                        if isinstance(subject, bytes):
-                            subject = subject.decode(encoding if encoding else "utf-8")
-
-                        print(f"📩 New email: {subject}")
-
-                        # Check each pending payment for matching cash tag
-                        for channel_id, tag_map in pending_payments.items():
-                            for tag, user_id in tag_map.items():
-                                if tag.lower() in subject.lower():
-                                    confirmed = confirmed_payments.setdefault(channel_id, set())
-                                    if user_id in confirmed:
-                                        continue
-
-                                    confirmed.add(user_id)
-
-                                    channel = bot.get_channel(int(channel_id))
-                                    if channel:
-                                        awaitable = channel.send(f"✅ <@{user_id}> sent payment!")
-                                        asyncio.run_coroutine_threadsafe(awaitable, bot.loop)
-
-                                    if len(confirmed) == len(tag_map):
-                                        if channel:
-                                            awaitable = auto_start_draft(channel.guild, channel)
-                                            asyncio.run_coroutine_threadsafe(awaitable, bot.loop)
-
-            mail.logout()
 
-        except Exception as e:
-            print(f"[EMAIL ERROR] {e}")
 
-        time.sleep(15)
+@bot.event
+async def on_voice_state_update(member, before, after):
+    voice.update(member, before, after)
+
+    # Late joiner: connected to the holding VC while their draft is already in team VCs
+    if after.channel and after.channel != before.channel:
+        config = get_config(member.guild.id)
+        if config.late_join_move == "on" and after.channel.id == config.holding_vc_id:
+            vc = member.guild.get_channel(voice.team_vc_of(member.guild.id, member.id) or 0)
+            if vc:
+                await voice.move_members(member.guild, {member.id: vc})
+
+
+# Keep the cached config roles/channels in sync with the guild
+@bot.event
+async def on_guild_role_create(role):
+    invalidate(role.guild.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    invalidate(role.guild.id)
 
-# Start thread
-threading.Thread(target=check_cashapp_emails, daemon=True).start()
+@bot.event
+async def on_guild_channel_create(channel):
+    invalidate(channel.guild.id)
 
+@bot.event
+async def on_guild_channel_delete(channel):
+    invalidate(channel.guild.id)
 
 
 @bot.event
 async def on_ready():
-    await tree.sync()
+    # Commands are global, so only the worker running shard 0 uploads them
+    shard_ids = getattr(bot, "shard_ids", None)
+    if shard_ids is None or 0 in shard_ids:
+        sync_task = asyncio.create_task(sync_commands())
+    else:
+        sync_task = None
+
+    def guild_id_for_channel(channel_id):
+        channel = bot.get_channel(channel_id)
+        return channel.guild.id if channel else None
+
+    moved = migrate_legacy_drafts(guild_id_for_channel)
+    if moved:
+        print(f"📦 Migrated {moved} drafts from drafts.json")
+
+    # on_ready also fires after reconnects; only rehydrate once
+    if pick_timers.start():
+        drafts_by_guild = await load_owned_drafts()
+        resume_pick_timers(drafts_by_guild)
+        restore_payment_tracking(drafts_by_guild)
+        restore_queue_views(drafts_by_guild)
+        restore_team_voice(drafts_by_guild)
+    if not lifecycle.draining:
+        matchmaking.start()
+        start_payment_watcher()
+    lifecycle.install(shutdown)
+
+    # 🔥 Warm up idle draft channels, VCs and roles
+    for guild in bot.guilds:
+        voice.seed(guild)
+        channel_pool.schedule_refill(guild)
+
+    if sync_task:
+        try:
+            await sync_task
+        except Exception as e:
+            print(f"Error syncing commands: {e}")
     print(f"✅ Logged in as {bot.user.name}")
 
 bot.run("MTM3NzA3MjE4Njk2MzAwNTQ0MA.GCPWMK.pSCzixxkoDWig9VoGq4pVkZTyZYF0oCoSJ1mRQ")
\ No newline at end of file
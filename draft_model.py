@@ -0,0 +1,147 @@
+SCHEMA_VERSION = 1
+
+_LISTS = ("players", "available", "waitlist")
+_DICTS = ("teams", "captains", "voice_channels", "team_roles", "cash_tags")
+
+
+def _is_team_key(key):
+    return key.startswith("team") and key[4:].isdigit()
+
+
+class Draft:
+    """One draft's stored state.
+
+    Handlers keep using draft["key"] / draft.get("key"): unset fields are None
+    and count as missing, so `"pick_deadline" in draft` still works. Team
+    rosters live in `teams` but stay reachable as draft["team1"], draft["team2"], ...
+    """
+
+    __slots__ = (
+        "team_size", "team_count", "pick_order", "custom_pattern", "is_money_draft",
+        "date", "host_id", "entry_amount",
+        "players", "teams", "captains", "available", "waitlist",
+        "pick_turn", "pick_schedule", "pick_index", "pick_deadline",
+        "queue_message_id", "live_queue_message_id",
+        "voice_channels", "team_roles",
+        "middleman_id", "middleman_cash_tag", "cash_tags",  # cash_tags: {user_id: tag}
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        for name in _LISTS:
+            setattr(self, name, [])
+        for name in _DICTS:
+            setattr(self, name, {})
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if _is_team_key(key):
+            return self.teams[key]
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if _is_team_key(key):
+            self.teams[key] = value
+        elif key in self.__slots__:
+            setattr(self, key, value)
+        else:
+            raise KeyError(f"Unknown draft field {key!r}")
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        if _is_team_key(key):
+            return self.teams.get(key, default)
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        if _is_team_key(key):
+            self.teams.pop(key, None)
+        else:
+            self[key] = [] if key in _LISTS else {} if key in _DICTS else None
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def to_dict(self):
+        """Compact form: unset fields and empty containers are left out."""
+        out = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None and value != [] and value != {}:
+                out[name] = value
+        return out
+
+    @classmethod
+    def from_dict(cls, raw):
+        return cls(**{k: v for k, v in raw.items() if k in cls.__slots__})
+
+
+# Each step upgrades a raw record from version N to N + 1.
+def _v0_to_v1(raw):
+    """Free-form dicts from before the schema existed."""
+    raw = dict(raw)
+    raw.setdefault("team_count", 2)
+
+    # Only a snake on/off flag
+    snake = raw.pop("snake_draft", None)
+    if not raw.get("pick_order"):
+        raw["pick_order"] = "snake" if snake else "linear"
+
+    # Team rosters were top-level team1/team2/... keys
+    teams = raw.setdefault("teams", {})
+    for key in [k for k in raw if _is_team_key(k)]:
+        teams[key] = raw.pop(key)
+
+    # Two-team drafts stored their VCs as vc1_id/vc2_id
+    voice = raw.setdefault("voice_channels", {})
+    for n, key in enumerate(("vc1_id", "vc2_id"), start=1):
+        vc_id = raw.pop(key, None)
+        if vc_id:
+            voice.setdefault(f"team{n}", vc_id)
+
+    # Tags came in through three different forms
+    tags = dict(raw.pop("player_tags", None) or {})
+    tags.update(raw.get("cash_tags") or {})
+    raw["cash_tags"] = tags
+
+    middleman = raw.pop("middleman", None) or {}
+    raw.setdefault("middleman_id", middleman.get("id"))
+    if not raw.get("middleman_cash_tag"):
+        raw["middleman_cash_tag"] = middleman.get("cashapp")
+    return raw
+
+
+MIGRATIONS = [_v0_to_v1]
+
+
+def upgrade(raw, version):
+    """Bring a raw record from `version` up to SCHEMA_VERSION."""
+    for step in MIGRATIONS[version:]:
+        raw = step(raw)
+    return raw
+
+
+def load_file(payload):
+    """Parse a stored guild file into {channel_id: Draft}; returns (drafts, upgraded)."""
+    if "v" in payload and "drafts" in payload:
+        version, records = payload["v"], payload["drafts"]
+    else:
+        version, records = 0, payload  # plain {channel_id: dict} files
+    drafts = {cid: Draft.from_dict(upgrade(raw, version)) for cid, raw in records.items()}
+    return drafts, version != SCHEMA_VERSION
+
+
+def dump_file(drafts):
+    return {"v": SCHEMA_VERSION, "drafts": {cid: draft.to_dict() for cid, draft in drafts.items()}}
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from draft_model import Draft, dump_file, load_file, upgrade
+from executor import executor
+
+
+# Drafts are partitioned into one file per guild so every worker process only
+# ever writes the files of the guilds its shards own.
+DRAFTS_DIR = os.getenv("DRAFTS_DIR", "drafts")
+LEGACY_DRAFTS_FILE = "drafts.json"
+
+BACKUP_COUNT = 3        # keeps <file>.1 (newest) .. <file>.3
+BACKUP_INTERVAL = 60    # seconds; at most one backup rotation per file per minute
+
+
+def guild_file(guild_id):
+    return os.path.join(DRAFTS_DIR, f"{guild_id}.json")
+
+
+def _fsync_dir(path):
+    if os.name != "posix":
+        return  # directories can't be opened for fsync on Windows
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _rotate_backups(path):
+    newest = f"{path}.1"
+    if os.path.exists(newest) and time.time() - os.path.getmtime(newest) < BACKUP_INTERVAL:
+        return
+    for n in range(BACKUP_COUNT - 1, 0, -1):
+        if os.path.exists(f"{path}.{n}"):
+            os.replace(f"{path}.{n}", f"{path}.{n + 1}")
+    shutil.copy2(path, newest)
+
+
+def write_text(path, text):
+    """Crash-safe write: temp file + fsync + rename, so `path` is always either
+    the old or the new version, never a truncated mix of both."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        _rotate_backups(path)
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def write_json(path, data, **dump_kwargs):
+    write_text(path, json.dumps(data, **dump_kwargs))
+
+
+# Write-behind: callers on the event loop hand over a serialized snapshot and
+# return immediately; one task per file writes the latest snapshot on the "io"
+# executor queue. Saves that land while a write is running are coalesced.
+_pending_writes = {}   # path -> text
+_write_tasks = {}      # path -> task
+
+
+def write_json_later(path, data, **dump_kwargs):
+    # Serialize now, on the caller's thread, so later mutations can't race the writer
+    text = json.dumps(data, **dump_kwargs)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        write_text(path, text)  # no loop (CLI, startup threads): write directly
+        return
+    _pending_writes[path] = text
+    if path not in _write_tasks:
+        _write_tasks[path] = asyncio.get_running_loop().create_task(_drain_writes(path))
+
+
+async def _drain_writes(path):
+    try:
+        while path in _pending_writes:
+            text = _pending_writes.pop(path)
+            await executor.run("io", write_text, path, text)
+    except Exception as e:
+        print(f"Error writing {path}: {e}")
+    finally:
+        _write_tasks.pop(path, None)
+
+
+async def flush_writes():
+    """Wait for every queued write to land (shutdown)."""
+    while _write_tasks:
+        await asyncio.gather(*_write_tasks.values(), return_exceptions=True)
+    for path in list(_pending_writes):
+        write_text(path, _pending_writes.pop(path))
+
+
+def read_json(path, default):
+    """Load `path`; if it's corrupt, recover from the newest readable backup."""
+    if not os.path.exists(path):
+        return default()
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError as e:
+        print(f"⚠️ {path} is corrupt ({e}), recovering from backup")
+
+    # Keep the broken file around for inspection
+    os.replace(path, f"{path}.corrupt-{int(time.time())}")
+    for n in range(1, BACKUP_COUNT + 1):
+        backup = f"{path}.{n}"
+        try:
+            with open(backup, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        write_json(path, data)
+        print(f"♻️ Restored {path} from {backup}")
+        return data
+
+    print(f"❌ No readable backup for {path}, starting empty")
+    return default()
+
+
+# Each worker owns its guilds' files, so it can keep them in memory and only
+# ever read a file once.
+_cache = {}  # guild_id -> {channel_id: Draft}
+
+
+def _read_drafts(guild_id):
+    """Read a guild file from disk; older files are upgraded in place."""
+    drafts, upgraded = load_file(read_json(guild_file(guild_id), dict))
+    if upgraded and drafts:
+        write_json(guild_file(guild_id), dump_file(drafts), separators=(",", ":"))
+    return drafts
+
+
+def load_drafts(guild_id):
+    """{channel_id: Draft} for a guild, from memory after the first read."""
+    data = _cache.get(guild_id)
+    if data is None:
+        data = _cache[guild_id] = _read_drafts(guild_id)
+    return data
+
+
+async def preload_drafts(guild_ids):
+    """Read many guild files in parallel on the io queue (startup)."""
+    missing = [gid for gid in guild_ids if gid not in _cache]
+    loaded = await asyncio.gather(*(executor.run("io", _read_drafts, gid) for gid in missing))
+    for gid, data in zip(missing, loaded):
+        _cache.setdefault(gid, data)
+    return {gid: _cache[gid] for gid in guild_ids}
+
+
+def save_drafts(guild_id, data):
+    _cache[guild_id] = data
+    write_json_later(guild_file(guild_id), dump_file(data), separators=(",", ":"))
+
+
+def stored_guild_ids():
+    if not os.path.isdir(DRAFTS_DIR):
+        return []
+    return [int(name[:-5]) for name in os.listdir(DRAFTS_DIR) if name.endswith(".json") and name[:-5].isdigit()]
+
+
+@contextmanager
+def file_lock(path, timeout=10):
+    """Cross-process lock using an O_EXCL lock file (works on every platform)."""
+    lock_path = path + ".lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                # Stale lock left by a killed process
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                deadline = time.monotonic() + timeout
+                continue
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def migrate_legacy_drafts(guild_id_for_channel):
+    """Move drafts from the old single drafts.json into per-guild files.
+
+    `guild_id_for_channel` returns the guild id for channels this process can
+    see, or None; unresolved entries are left for the worker that owns them.
+    """
+    if not os.path.exists(LEGACY_DRAFTS_FILE):
+        return 0
+
+    with file_lock(LEGACY_DRAFTS_FILE):
+        legacy = read_json(LEGACY_DRAFTS_FILE, dict)
+
+        moved = {}
+        for cid in list(legacy):
+            guild_id = guild_id_for_channel(int(cid))
+            if guild_id is not None:
+                moved.setdefault(guild_id, {})[cid] = legacy.pop(cid)
+
+        for guild_id, drafts in moved.items():
+            data = load_drafts(guild_id)
+            for cid, draft in drafts.items():
+                data.setdefault(cid, Draft.from_dict(upgrade(draft, 0)))
+            save_drafts(guild_id, data)
+
+        if moved:
+            write_json(LEGACY_DRAFTS_FILE, legacy, indent=4)
+
+    return sum(len(d) for d in moved.values())
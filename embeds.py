@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+import discord
+
+from pick_order import PICK_ORDERS, TEAM_EMOJIS, describe_order, draft_team_keys
+
+
+FOOTER = "Made by blur.exe"
+
+# Every embed the draft flow posts, described as data. A template's `state`
+# picks the slice of the draft it depends on; that tuple is the render's
+# version, so the same state is only ever rendered once and an edit with an
+# unchanged embed never leaves the process.
+#   title/description: format strings filled from the state
+#   fields: (state) -> [(name, value, inline)]
+#   footer: format string, defaults to FOOTER
+
+
+def _mentions(ids, empty):
+    return "\n".join(f"<@{uid}>" for uid in ids) if ids else empty
+
+
+def _teams(draft):
+    return tuple(
+        (i, draft["captains"].get(team), tuple(draft.get(team, ())))
+        for i, team in enumerate(draft_team_keys(draft))
+    )
+
+
+def _team_fields(teams):
+    return [
+        (f"{TEAM_EMOJIS[i]} Team {i + 1}", f"**Captain:** <@{captain}>\n" + _mentions(members, ""), True)
+        for i, captain, members in teams
+    ]
+
+
+TEMPLATES = {
+    "queue": {
+        "state": lambda draft, **extra: {
+            "format": draft["team_size"],
+            "date": draft["date"],
+            "host": draft.get("host_id"),
+            "order": PICK_ORDERS[draft.get("pick_order", "snake")],
+            "link": extra["info_link"],
+            "count": len(draft["players"]),
+            "max": extra["max_players"],
+        },
+        "title": "🎯 Fortnite Drafts {format}",
+        "description": "We're seeking participants for this draft. Click the button below to join. \n {link} ",
+        "color": discord.Color.blurple,
+        "fields": lambda s: [
+            ("👥 Team Size:", s["format"], False),
+            ("📅 Date:", f"<t:{s['date']}:F>", False),
+            ("🎙️ Host:", f"<@{s['host']}>" if s["host"] else "N/A", False),
+            ("🔀 Pick Order:", s["order"], False),
+        ],
+        "footer": "Queue: {count}/{max} • " + FOOTER,
+    },
+    "live_queue": {
+        "state": lambda draft, **extra: {"players": tuple(draft["players"])},
+        "title": "📋 Current Players in Queue",
+        "description": lambda s: _mentions(s["players"], "No players yet."),
+        "color": discord.Color.blue,
+        "footer": None,
+    },
+    "draft_started": {
+        "state": lambda draft, **extra: {
+            "teams": _teams(draft),
+            "first": draft_team_keys(draft).index(draft["pick_turn"]),
+            "order": describe_order(draft),
+        },
+        "title": "🏁 Draft Started!",
+        "description": "The draft has begun. Captains and pick order are listed below.",
+        "color": discord.Color.green,
+        "fields": lambda s: [
+            (f"{TEAM_EMOJIS[i]} Team {i + 1} Captain", f"<@{captain}>" + (" (picks first)" if i == s["first"] else ""), False)
+            for i, captain, _ in s["teams"]
+        ] + [("Pick Order", s["order"], False)],
+    },
+    "teams_finalized": {
+        "state": lambda draft, **extra: {"teams": _teams(draft), "balance": extra["balance"]},
+        "title": "🎯 Final Teams",
+        "description": "Teams have been finalized!",
+        "color": discord.Color.green,
+        "fields": lambda s: _team_fields(s["teams"]) + [("⚖️ Balance", f"{s['balance']}%", False)],
+    },
+    "results": {
+        "state": lambda draft, **extra: {
+            "format": draft["team_size"],
+            "date": draft["date"],
+            "teams": _teams(draft),
+            "winner": extra["winner"],  # team index or None
+        },
+        "title": "📊 Draft Results",
+        "description": "**Fortnite Drafts {format}**",
+        "color": discord.Color.blue,
+        "fields": lambda s: _result_fields(s),
+    },
+}
+
+
+def _result_team(captain, members, members_header):
+    captain = f"<@{captain}>" if captain else "N/A"
+    if members_header:
+        return f"**Captain:** {captain}\n**Members:**\n" + _mentions(members, "")
+    return f"**Captain:** {captain}\n" + _mentions(members, "No members.")
+
+
+def _result_fields(s):
+    fields = [("Team Size", s["format"], True), ("📅 Date", f"<t:{s['date']}:F>", True)]
+    if s["winner"] is not None:
+        # Field names are what /importhistory parses, keep them stable
+        _, captain, members = s["teams"][s["winner"]]
+        fields.append(("🏆 Winning Team", _result_team(captain, members, True), True))
+        fields += [("📍 Losing Team", _result_team(c, m, True), True) for i, c, m in s["teams"] if i != s["winner"]]
+    else:
+        fields.append(("⚠️ No Winner", "This draft ended without a declared winner, but here were the teams at the time:", False))
+        fields += [(f"{TEAM_EMOJIS[i]} Team {i + 1}", _result_team(c, m, False), True) for i, c, m in s["teams"]]
+    return fields
+
+
+def _fill(spec, state):
+    return spec(state) if callable(spec) else spec.format(**state)
+
+
+@lru_cache(maxsize=512)
+def _render(name, version):
+    template = TEMPLATES[name]
+    state = dict(version)
+    embed = discord.Embed(
+        title=_fill(template["title"], state),
+        description=_fill(template["description"], state),
+        color=template["color"](),
+    )
+    for field_name, value, inline in template.get("fields", lambda s: [])(state):
+        embed.add_field(name=field_name, value=value, inline=inline)
+    footer = template.get("footer", FOOTER)
+    if footer:
+        embed.set_footer(text=_fill(footer, state))
+    return embed
+
+
+def render(name, draft, **extra):
+    """Build (or reuse) the `name` embed for a draft."""
+    version = tuple(TEMPLATES[name]["state"](draft, **extra).items())
+    # Embeds are mutable; hand out a copy so callers can't poison the cache
+    return _render(name, version).copy()
+
+
+# message id -> last embed we sent/edited into it
+_last_sent = OrderedDict()
+MAX_TRACKED = 2048
+
+
+def remember(message, embed):
+    _last_sent[message.id] = embed.to_dict()
+    _last_sent.move_to_end(message.id)
+    while len(_last_sent) > MAX_TRACKED:
+        _last_sent.popitem(last=False)
+
+
+async def edit_embed(message, embed, **kwargs):
+    """Edit `message` unless it already shows exactly this embed. Returns True if an edit was sent."""
+    if not kwargs and _last_sent.get(message.id) == embed.to_dict():
+        return False
+    await message.edit(embed=embed, **kwargs)
+    remember(message, embed)
+    return True
+
+
+async def send(channel, embed, **kwargs):
+    message = await channel.send(embed=embed, **kwargs)
+    remember(message, embed)
+    return message
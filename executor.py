@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# Every blocking call the bot makes goes through a named queue here instead of
+# running on the gateway event loop. Each queue has its own workers and a cap on
+# how many calls may be queued or running; callers past the cap wait (that's
+# the backpressure), so a slow inbox can't pile up threads or starve file writes.
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", "0"))
+
+QUEUES = {
+    # name: (workers, max_pending, use_processes)
+    "io": (4, 256, False),      # draft/config/pool file reads and writes
+    "imap": (1, 2, False),      # Cash App inbox polling, one connection at a time
+    "db": (1, 64, False),       # stats SQLite writes, one at a time on the shared connection
+    # CPU-heavy work (large exports); set EXPORT_PROCESSES to run it in processes
+    "export": (EXPORT_PROCESSES or 1, 4, EXPORT_PROCESSES > 0),
+}
+
+
+class QueueStats:
+    __slots__ = ("submitted", "completed", "failed", "waiting", "running", "total_wait", "total_run", "max_latency")
+
+    def __init__(self):
+        self.submitted = self.completed = self.failed = self.waiting = self.running = 0
+        self.total_wait = self.total_run = self.max_latency = 0.0
+
+    def snapshot(self):
+        finished = self.completed + self.failed
+        return {
+            "depth": self.waiting + self.running,
+            "waiting": self.waiting,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": 1000 * self.total_wait / finished if finished else 0.0,
+            "avg_run_ms": 1000 * self.total_run / finished if finished else 0.0,
+            "max_latency_ms": 1000 * self.max_latency,
+        }
+
+
+class _Queue:
+    def __init__(self, name, workers, max_pending, use_processes):
+        self.name = name
+        self.workers = workers
+        self.use_processes = use_processes
+        self.max_pending = max_pending
+        self.pool = None
+        self.slots = None
+        self.stats = QueueStats()
+
+    def _pool(self):
+        if self.pool is None:
+            cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            kwargs = {} if self.use_processes else {"thread_name_prefix": f"exec-{self.name}"}
+            self.pool = cls(max_workers=self.workers, **kwargs)
+        return self.pool
+
+    def _slots(self):
+        # Created lazily so it binds to the running loop
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_pending)
+        return self.slots
+
+
+class Executor:
+    def __init__(self, queues=QUEUES):
+        self.queues = {name: _Queue(name, *spec) for name, spec in queues.items()}
+        self.closed = False
+
+    async def run(self, queue, func, *args):
+        """Run func(*args) on the named queue and await the result."""
+        q = self.queues[queue]
+        stats = q.stats
+        stats.submitted += 1
+        stats.waiting += 1
+        queued = time.perf_counter()
+        slots = q._slots()
+        try:
+            await slots.acquire()
+        except BaseException:
+            stats.waiting -= 1
+            raise
+
+        started = time.perf_counter()
+        stats.waiting -= 1
+        stats.running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(q._pool(), func, *args)
+            stats.completed += 1
+            return result
+        except BaseException:
+            stats.failed += 1
+            raise
+        finally:
+            slots.release()
+            finished = time.perf_counter()
+            stats.running -= 1
+            stats.total_wait += started - queued
+            stats.total_run += finished - started
+            stats.max_latency = max(stats.max_latency, finished - queued)
+
+    def metrics(self):
+        return {name: q.stats.snapshot() for name, q in self.queues.items()}
+
+    def shutdown(self, wait=True):
+        self.closed = True
+        for q in self.queues.values():
+            if q.pool is not None:
+                q.pool.shutdown(wait=wait)
+                q.pool = None
+
+
+executor = Executor()
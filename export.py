@@ -0,0 +1,129 @@
+import argparse
+import csv
+import os
+import time
+
+import match_history  # registers the history tables, so a fresh stats.db exports empty files
+from stats_db import open_reader
+
+
+# Audit exports for payment disputes and season reports. Rows are pulled from
+# stats.db CHUNK_SIZE at a time and written out as they arrive, so an export
+# never holds the whole history in memory.
+#   python export.py players --guild 123 --format csv -o players.csv
+CHUNK_SIZE = 5000
+
+# Each export is ([(column, arrow type name)], sql). Parquet types are fixed up
+# front: a column can be all NULL in one chunk (winner, result, source_message_id)
+# and filled in the next, so they can't be inferred per chunk.
+EXPORTS = {
+    # One row per player per match
+    "players": (
+        [("match_id", "int64"), ("date", "int64"), ("format", "string"), ("winner", "int64"), ("team", "int64"),
+         ("is_captain", "int64"), ("result", "int64"), ("user_id", "int64"), ("entry_amount", "int64"), ("channel_id", "int64")],
+        """
+        SELECT m.id, m.date, m.format, m.winner, p.team, p.is_captain, p.result, p.user_id, m.entry_amount, m.channel_id
+        FROM matches m JOIN match_players p ON p.match_id = m.id
+        WHERE m.guild_id = ? AND m.date >= ?
+        ORDER BY m.date, m.id, p.team, p.is_captain DESC
+        """,
+    ),
+    # One row per match
+    "matches": (
+        [("match_id", "int64"), ("date", "int64"), ("format", "string"), ("winner", "int64"), ("entry_amount", "int64"),
+         ("total_paid", "int64"), ("channel_id", "int64"), ("source_message_id", "int64")],
+        """
+        SELECT id, date, format, winner, entry_amount, total_paid, channel_id, source_message_id
+        FROM matches
+        WHERE guild_id = ? AND date >= ?
+        ORDER BY date, id
+        """,
+    ),
+    # Confirmed Cash App payments
+    "payments": (
+        [("confirmed_at", "int64"), ("channel_id", "int64"), ("user_id", "int64"), ("cash_tag", "string"), ("amount", "int64")],
+        """
+        SELECT confirmed_at, channel_id, user_id, cash_tag, amount
+        FROM payments
+        WHERE guild_id = ? AND confirmed_at >= ?
+        ORDER BY confirmed_at, id
+        """,
+    ),
+}
+FORMATS = ("csv", "parquet")
+
+
+def iter_chunks(kind, guild_id, since=0):
+    """Yield lists of up to CHUNK_SIZE rows for an export."""
+    _, sql = EXPORTS[kind]
+    conn = open_reader()
+    try:
+        cursor = conn.execute(sql, (guild_id, since))
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def write_csv(path, kind, guild_id, since=0):
+    columns, _ = EXPORTS[kind]
+    count = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        for rows in iter_chunks(kind, guild_id, since):
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def write_parquet(path, kind, guild_id, since=0):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+
+    columns, _ = EXPORTS[kind]
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        # One row group per chunk, every chunk cast to the same schema
+        for rows in iter_chunks(kind, guild_id, since):
+            arrays = [pa.array(col, type=field.type) for col, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+
+def export(kind, fmt, guild_id, path, since=0):
+    """Write an export to `path`; returns the number of rows written."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export `{kind}`")
+    if fmt == "csv":
+        return write_csv(path, kind, guild_id, since)
+    if fmt == "parquet":
+        return write_parquet(path, kind, guild_id, since)
+    raise ValueError(f"Unknown format `{fmt}`")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export draft history and payments from stats.db")
+    parser.add_argument("kind", choices=sorted(EXPORTS))
+    parser.add_argument("--guild", type=int, required=True)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--days", type=int, default=0, help="only the last N days (default: everything)")
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    since = int(time.time()) - args.days * 86400 if args.days else 0
+    path = args.output or f"{args.kind}-{args.guild}.{args.format}"
+    count = export(args.kind, args.format, args.guild, path, since)
+    print(f"✅ Wrote {count} rows to {os.path.abspath(path)}")
+
+
+if __name__ == "__main__":
+    main()
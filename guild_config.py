@@ -0,0 +1,140 @@
+import os
+import time
+from dataclasses import dataclass, fields, asdict
+
+from draft_store import file_lock, read_json, write_json
+
+
+CONFIG_FILE = os.getenv("GUILD_CONFIG_FILE", "guild_config.json")
+RELOAD_CHECK_SECONDS = 5
+
+# 0 / "" means "not set" for a guild; handlers skip the matching step.
+@dataclass
+class GuildConfig:
+    middleman_role_id: int = 1374569721185173594
+    token_player_role_id: int = 1374569702801670144
+    scammer_role_id: int = 1377442142061858916
+    staff_role_id: int = 1377074606220906686
+    draft_category_id: int = 1383335152650027108
+    voice_category_id: int = 1377123860108804177
+    holding_vc_id: int = 1377124001519898634
+    log_channel_id: int = 1377074782167761027
+    token_role_link: str = "https://discordapp.com/channels/1374569504071221248/1377135618080899094"
+    draft_info_link: str = "https://discord.com/channels/1374569504071221248/1386875846693748806"
+    pick_timer_seconds: int = 90
+    captain_selection: str = "random"
+    auto_pick: str = "random"
+    matchmaking: str = "fifo"
+    late_join_move: str = "off"   # move players who join the holding VC late into their team VC
+    pool_text_channels: int = 2
+    pool_voice_channels: int = 4
+    pool_roles: int = 4
+
+
+CONFIG_KEYS = [f.name for f in fields(GuildConfig)]
+CONFIG_CHOICES = {
+    "captain_selection": ("random", "rating"),
+    "auto_pick": ("random", "rating"),
+    "matchmaking": ("fifo", "rating"),
+    "late_join_move": ("off", "on"),
+}
+
+_configs = {}    # guild_id: GuildConfig
+_resolved = {}   # guild_id: ResolvedGuild
+_file_mtime = None
+_last_check = 0.0
+
+
+def _parse_value(key, raw):
+    field_type = GuildConfig.__dataclass_fields__[key].type
+    if field_type is int:
+        # Accept raw ids as well as pasted mentions like <@&123> or <#123>
+        digits = "".join(ch for ch in str(raw) if ch.isdigit())
+        if not digits:
+            raise ValueError(f"`{key}` needs a number, ID or mention, got `{raw}`")
+        return int(digits)
+    if key in CONFIG_CHOICES and raw not in CONFIG_CHOICES[key]:
+        raise ValueError(f"`{key}` must be one of: {', '.join(CONFIG_CHOICES[key])}")
+    return str(raw)
+
+
+def _read_file():
+    return read_json(CONFIG_FILE, dict)
+
+
+def _build(raw):
+    known = {k: _parse_value(k, v) for k, v in raw.items() if k in CONFIG_KEYS}
+    return GuildConfig(**known)
+
+
+def reload_configs(force=False):
+    """Re-read the config file if it changed on disk (edited by hand or by another worker)."""
+    global _file_mtime, _last_check
+    now = time.monotonic()
+    if not force and now - _last_check < RELOAD_CHECK_SECONDS:
+        return
+    _last_check = now
+
+    mtime = os.path.getmtime(CONFIG_FILE) if os.path.exists(CONFIG_FILE) else None
+    if not force and mtime == _file_mtime:
+        return
+    _file_mtime = mtime
+
+    _configs.clear()
+    _resolved.clear()
+    for guild_id, raw in _read_file().items():
+        _configs[int(guild_id)] = _build(raw)
+
+
+def get_config(guild_id):
+    reload_configs()
+    config = _configs.get(guild_id)
+    if config is None:
+        config = _configs[guild_id] = GuildConfig()
+    return config
+
+
+def update_config(guild_id, key, raw_value):
+    if key not in CONFIG_KEYS:
+        raise ValueError(f"Unknown setting `{key}`")
+    value = _parse_value(key, raw_value)
+
+    with file_lock(CONFIG_FILE):
+        data = _read_file()
+        data.setdefault(str(guild_id), {})[key] = value
+        write_json(CONFIG_FILE, data, indent=4)
+
+    reload_configs(force=True)
+    return get_config(guild_id)
+
+
+class ResolvedGuild:
+    """Role and channel objects for one guild's config, looked up once."""
+
+    def __init__(self, guild, config):
+        self.config = config
+        self.middleman_role = guild.get_role(config.middleman_role_id)
+        self.token_player_role = guild.get_role(config.token_player_role_id)
+        self.scammer_role = guild.get_role(config.scammer_role_id)
+        self.staff_role = guild.get_role(config.staff_role_id)
+        self.draft_category = guild.get_channel(config.draft_category_id)
+        self.voice_category = guild.get_channel(config.voice_category_id)
+        self.holding_vc = guild.get_channel(config.holding_vc_id)
+        self.log_channel = guild.get_channel(config.log_channel_id)
+
+
+def resolve(guild):
+    config = get_config(guild.id)
+    resolved = _resolved.get(guild.id)
+    if resolved is None or resolved.config is not config:
+        resolved = _resolved[guild.id] = ResolvedGuild(guild, config)
+    return resolved
+
+
+def invalidate(guild_id):
+    """Drop cached objects after roles or channels were created or deleted."""
+    _resolved.pop(guild_id, None)
+
+
+def format_config(config):
+    return "\n".join(f"`{key}`: {value or 'not set'}" for key, value in asdict(config).items())
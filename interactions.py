@@ -0,0 +1,83 @@
+import functools
+
+import discord
+
+
+# Discord fails an interaction that isn't acknowledged within 3 seconds.
+# Handlers that touch disk or make REST calls run under `fast_ack`, which
+# defers first and leaves the handler to report back with interaction.followup.
+ACK_DEADLINE = 3.0
+ACK_SLOW = 2.0  # acks later than this are counted as close calls
+
+
+class AckStats:
+    __slots__ = ("count", "slow", "failed", "total", "max")
+
+    def __init__(self):
+        self.count = self.slow = self.failed = 0
+        self.total = self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if seconds >= ACK_SLOW:
+            self.slow += 1
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "slow": self.slow,
+            "failed": self.failed,
+            "avg_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "max_ms": 1000 * self.max,
+        }
+
+
+ack_stats = {}  # handler name: AckStats
+
+
+def interaction_age(interaction):
+    """Seconds since Discord created the interaction (from its snowflake)."""
+    return max(0.0, (discord.utils.utcnow() - interaction.created_at).total_seconds())
+
+
+def fast_ack(ephemeral=True, thinking=False):
+    """Defer the interaction before the handler runs, and time the ack.
+
+    Works for slash commands, button callbacks and modal submits. Component
+    defers are silent unless `thinking` is set; slash commands always show
+    the "thinking" state, public or ephemeral per `ephemeral`. If the handler
+    raises, the user gets an ephemeral error followup instead of silence.
+    """
+    def decorator(func):
+        name = func.__qualname__
+        stats = ack_stats.setdefault(name, AckStats())
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = next(arg for arg in args if isinstance(arg, discord.Interaction))
+            if not interaction.response.is_done():
+                try:
+                    await interaction.response.defer(ephemeral=ephemeral, thinking=thinking)
+                except discord.NotFound:
+                    stats.failed += 1  # already expired, nothing to report back to
+                    raise
+            stats.record(interaction_age(interaction))
+
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                stats.failed += 1
+                try:
+                    await interaction.followup.send("❌ Something went wrong, please try again.", ephemeral=True)
+                except discord.HTTPException:
+                    pass
+                raise
+
+        return wrapper
+    return decorator
+
+
+def ack_metrics():
+    return {name: stats.snapshot() for name, stats in sorted(ack_stats.items()) if stats.count or stats.failed}
@@ -0,0 +1,77 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from lifecycle import DRAIN_TIMEOUT
+
+# Runs the bot as several worker processes, each owning a slice of the shards:
+#   SHARD_COUNT=4 WORKER_COUNT=2 python launcher.py
+# Every guild lives on exactly one shard, so each worker reads and writes only
+# its own guilds' draft files (see draft_store.py).
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "2"))
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "2"))
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "draft bot.py")
+STOP_GRACE = DRAIN_TIMEOUT + 15  # seconds a worker gets to drain before it's killed
+
+
+class Shutdown(Exception):
+    """Raised from the SIGTERM handler (systemd/docker stop)."""
+
+
+def shard_slices(shard_count, worker_count):
+    return [list(range(i, shard_count, worker_count)) for i in range(worker_count)]
+
+
+def spawn(worker_id, shard_ids):
+    env = dict(os.environ)
+    env["SHARD_COUNT"] = str(SHARD_COUNT)
+    env["SHARD_IDS"] = ",".join(str(s) for s in shard_ids)
+    env["WORKER_ID"] = str(worker_id)
+    print(f"🚀 Starting worker {worker_id} with shards {shard_ids}")
+    return subprocess.Popen([sys.executable, BOT_SCRIPT], env=env)
+
+
+def stop_workers(workers):
+    """SIGTERM every worker (each drains its in-flight drafts), then wait for them."""
+    for proc in workers.values():
+        if proc.poll() is None:
+            proc.terminate()
+    deadline = time.monotonic() + STOP_GRACE
+    for i, proc in workers.items():
+        try:
+            proc.wait(max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            print(f"⚠️ Worker {i} didn't stop in {STOP_GRACE}s, killing it")
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    def on_sigterm(signum, frame):
+        raise Shutdown()
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    slices = [s for s in shard_slices(SHARD_COUNT, WORKER_COUNT) if s]
+    workers = {}
+
+    try:
+        for i, shard_ids in enumerate(slices):
+            workers[i] = spawn(i, shard_ids)
+        while True:
+            time.sleep(5)
+            # Restart any worker that died
+            for i, proc in workers.items():
+                if proc.poll() is not None:
+                    print(f"⚠️ Worker {i} exited with code {proc.returncode}, restarting")
+                    workers[i] = spawn(i, slices[i])
+    except (KeyboardInterrupt, Shutdown):
+        # Nothing is respawned from here on, and a repeated stop signal can't cut the wait short
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        print("🛑 Stopping workers")
+        stop_workers(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import signal
+
+
+DRAIN_TIMEOUT = 60  # seconds to wait for in-flight work before closing anyway
+
+
+class Lifecycle:
+    """Drain mode for rolling restarts.
+
+    Work that must not be cut in half (creating a draft, a pick, building or
+    tearing down teams) runs under `critical`. Once `drain()` starts, new
+    drafts and queue joins are refused, and shutdown waits until nothing
+    critical is running before the bot closes.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._on_drain = []
+        self._task = None
+
+    def on_drain(self, callback):
+        """Register a (sync or async) callback run once draining begins, before waiting."""
+        self._on_drain.append(callback)
+        return callback
+
+    def critical(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            self._in_flight += 1
+            self._idle.clear()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self._in_flight -= 1
+                if not self._in_flight:
+                    self._idle.set()
+        return wrapper
+
+    def in_flight(self):
+        return self._in_flight
+
+    def install(self, shutdown):
+        """Call `shutdown()` after draining on SIGTERM/SIGINT. Returns False where signals aren't supported."""
+        loop = asyncio.get_running_loop()
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, self._begin, shutdown)
+        except (NotImplementedError, RuntimeError):
+            return False  # Windows
+        return True
+
+    def _begin(self, shutdown):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.drain(shutdown))
+
+    async def drain(self, shutdown):
+        self.draining = True
+        print(f"🛑 Draining: {self._in_flight} operations in flight")
+        for callback in self._on_drain:
+            try:
+                result = callback()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"Error while draining: {e}")
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Gave up waiting on {self._in_flight} operations")
+        await shutdown()
@@ -0,0 +1,226 @@
+from stats_db import connect, register_schema
+from ratings import DEFAULT_RATING
+
+
+# `matches` + `match_players` are the raw history. `player_stats` is a
+# materialized view of it that is updated in the same transaction as every
+# insert, so /stats and /leaderboard never have to scan the history.
+register_schema("""
+CREATE TABLE IF NOT EXISTS matches (
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id          INTEGER NOT NULL,
+    channel_id        INTEGER,
+    source_message_id INTEGER UNIQUE,
+    date              INTEGER NOT NULL,
+    format            TEXT    NOT NULL,
+    winner            INTEGER,
+    entry_amount      INTEGER NOT NULL DEFAULT 0,
+    total_paid        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS matches_by_guild_date ON matches (guild_id, date DESC);
+
+CREATE TABLE IF NOT EXISTS match_players (
+    match_id   INTEGER NOT NULL REFERENCES matches (id),
+    guild_id   INTEGER NOT NULL,
+    user_id    INTEGER NOT NULL,
+    team       INTEGER NOT NULL,
+    is_captain INTEGER NOT NULL,
+    result     INTEGER,
+    PRIMARY KEY (match_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS match_players_by_user ON match_players (guild_id, user_id, match_id DESC);
+
+CREATE TABLE IF NOT EXISTS player_stats (
+    guild_id      INTEGER NOT NULL,
+    user_id       INTEGER NOT NULL,
+    games         INTEGER NOT NULL DEFAULT 0,
+    wins          INTEGER NOT NULL DEFAULT 0,
+    losses        INTEGER NOT NULL DEFAULT 0,
+    captain_games INTEGER NOT NULL DEFAULT 0,
+    captain_wins  INTEGER NOT NULL DEFAULT 0,
+    last_played   INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS player_stats_by_wins ON player_stats (guild_id, wins DESC);
+CREATE INDEX IF NOT EXISTS player_stats_by_games ON player_stats (guild_id, games DESC);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id     INTEGER NOT NULL,
+    channel_id   INTEGER NOT NULL,
+    user_id      INTEGER NOT NULL,
+    cash_tag     TEXT    NOT NULL,
+    amount       INTEGER NOT NULL DEFAULT 0,
+    confirmed_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_by_guild_date ON payments (guild_id, confirmed_at);
+CREATE INDEX IF NOT EXISTS payments_by_channel ON payments (channel_id);
+""")
+
+LEADERBOARD_SORTS = {
+    "wins": "s.wins DESC, s.games ASC",
+    "winrate": "CAST(s.wins AS REAL) / s.games DESC, s.wins DESC",
+    "games": "s.games DESC, s.wins DESC",
+}
+MIN_WINRATE_GAMES = 5
+
+
+def insert_match(conn, match):
+    """match: {guild_id, channel_id, source_message_id, date, format, winner,
+    entry_amount, total_paid, teams: [{"captain": id, "members": [ids]}]}"""
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO matches (guild_id, channel_id, source_message_id, date, format, winner, entry_amount, total_paid) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (match["guild_id"], match.get("channel_id"), match.get("source_message_id"), match["date"],
+         match["format"], match.get("winner"), match.get("entry_amount", 0), match.get("total_paid", 0))
+    )
+    if cur.rowcount == 0:
+        return False  # already imported
+
+    match_id = cur.lastrowid
+    guild_id = match["guild_id"]
+    winner = match.get("winner")
+    players = []
+    for number, team in enumerate(match["teams"], start=1):
+        result = None if winner is None else int(number == winner)
+        if team.get("captain"):
+            players.append((match_id, guild_id, team["captain"], number, 1, result))
+        players += [(match_id, guild_id, uid, number, 0, result) for uid in team["members"]]
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO match_players (match_id, guild_id, user_id, team, is_captain, result) VALUES (?, ?, ?, ?, ?, ?)",
+        players
+    )
+    conn.executemany("""
+        INSERT INTO player_stats (guild_id, user_id, games, wins, losses, captain_games, captain_wins, last_played)
+        VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET
+            games = games + 1,
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses,
+            captain_games = captain_games + excluded.captain_games,
+            captain_wins = captain_wins + excluded.captain_wins,
+            last_played = MAX(last_played, excluded.last_played)
+    """, [
+        (guild_id, uid, int(result == 1), int(result == 0), is_captain, int(is_captain and result == 1), match["date"])
+        for _, _, uid, _, is_captain, result in players
+    ])
+    return True
+
+
+def record_matches(matches):
+    """Insert many matches in one transaction; returns how many were new."""
+    conn = connect()
+    with conn:
+        return sum(insert_match(conn, match) for match in matches)
+
+
+def record_match(match):
+    return record_matches([match]) == 1
+
+
+def record_payment(guild_id, channel_id, user_id, cash_tag, amount, confirmed_at):
+    """Append a confirmed Cash App payment to the ledger."""
+    conn = connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO payments (guild_id, channel_id, user_id, cash_tag, amount, confirmed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, channel_id, user_id, cash_tag, amount, confirmed_at)
+        )
+
+
+def paid_users(guild_id, channel_id):
+    """Ids of everyone with a confirmed payment recorded for a draft channel."""
+    rows = connect().execute(
+        "SELECT DISTINCT user_id FROM payments WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id)
+    )
+    return {user_id for (user_id,) in rows}
+
+
+def player_stats(guild_id, user_id):
+    row = connect().execute(
+        "SELECT games, wins, losses, captain_games, captain_wins, last_played FROM player_stats WHERE guild_id = ? AND user_id = ?",
+        (guild_id, user_id)
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ("games", "wins", "losses", "captain_games", "captain_wins", "last_played")
+    return dict(zip(keys, row))
+
+
+def last_played(guild_id, user_ids):
+    """{user_id: last_played} for the given users that have played before."""
+    if not user_ids:
+        return {}
+    marks = ",".join("?" * len(user_ids))
+    return dict(connect().execute(
+        f"SELECT user_id, last_played FROM player_stats WHERE guild_id = ? AND user_id IN ({marks})",
+        (guild_id, *user_ids)
+    ).fetchall())
+
+
+def leaderboard(guild_id, sort="wins", limit=10):
+    """[(user_id, games, wins, rating)] ordered by `sort`."""
+    if sort == "rating":
+        # Walks the ratings_by_rating index
+        return connect().execute("""
+            SELECT r.user_id, COALESCE(s.games, 0), COALESCE(s.wins, 0), r.rating
+            FROM ratings r
+            LEFT JOIN player_stats s ON s.guild_id = r.guild_id AND s.user_id = r.user_id
+            WHERE r.guild_id = ?
+            ORDER BY r.rating DESC
+            LIMIT ?
+        """, (guild_id, limit)).fetchall()
+
+    where = "s.guild_id = ?"
+    if sort == "winrate":
+        where += f" AND s.games >= {MIN_WINRATE_GAMES}"
+    return connect().execute(f"""
+        SELECT s.user_id, s.games, s.wins, COALESCE(r.rating, ?) AS rating
+        FROM player_stats s
+        LEFT JOIN ratings r ON r.guild_id = s.guild_id AND r.user_id = s.user_id
+        WHERE {where}
+        ORDER BY {LEADERBOARD_SORTS[sort]}
+        LIMIT ?
+    """, (DEFAULT_RATING, guild_id, limit)).fetchall()
+
+
+def recent_matches(guild_id, user_id=None, limit=10):
+    """[(date, format, winner, team, result)] newest first; team/result are None without a user."""
+    if user_id is None:
+        return connect().execute(
+            "SELECT date, format, winner, NULL, NULL FROM matches WHERE guild_id = ? ORDER BY date DESC LIMIT ?",
+            (guild_id, limit)
+        ).fetchall()
+    return connect().execute("""
+        SELECT m.date, m.format, m.winner, p.team, p.result
+        FROM match_players p JOIN matches m ON m.id = p.match_id
+        WHERE p.guild_id = ? AND p.user_id = ?
+        ORDER BY m.date DESC
+        LIMIT ?
+    """, (guild_id, user_id, limit)).fetchall()
+
+
+def decided_matches(guild_id):
+    """Yield (teams, winner_index) for every match with a winner, oldest first."""
+    rows = connect().execute("""
+        SELECT m.id, m.winner, p.team, p.user_id
+        FROM matches m JOIN match_players p ON p.match_id = m.id
+        WHERE m.guild_id = ? AND m.winner IS NOT NULL
+        ORDER BY m.date, m.id, p.team
+    """, (guild_id,))
+
+    current_id, winner, teams = None, None, {}
+    for match_id, match_winner, team, user_id in rows:
+        if match_id != current_id:
+            if winner in teams:
+                yield _ordered(teams, winner)
+            current_id, winner, teams = match_id, match_winner, {}
+        teams.setdefault(team, []).append(user_id)
+    if winner in teams:
+        yield _ordered(teams, winner)
+
+
+def _ordered(teams, winner):
+    numbers = sorted(teams)
+    return [teams[n] for n in numbers], numbers.index(winner)
@@ -0,0 +1,103 @@
+import asyncio
+from itertools import islice
+
+
+MATCH_INTERVAL = 10  # seconds between matcher passes
+
+
+class MatchmakingPool:
+    """Per-guild, per-format queues of players waiting to be put into a draft.
+
+    Joining and leaving are O(1). Matching happens in one pass over all
+    queues every MATCH_INTERVAL seconds rather than on every click.
+    """
+
+    def __init__(self, group_size, order_players, start_draft, busy_players):
+        self.group_size = group_size        # fmt -> players needed
+        self.order_players = order_players  # (guild_id, [ids]) -> ids in grouping order
+        self.start_draft = start_draft      # async (guild_id, fmt, [ids])
+        self.busy_players = busy_players    # guild_id -> {ids already in a live draft}
+        self.queues = {}                    # (guild_id, fmt): {user_id: None}, oldest first
+        self.joined = {}                    # (guild_id, user_id): {fmt}
+        self._task = None
+        self._starting = set()
+
+    def join(self, guild_id, fmt, user_id):
+        queue = self.queues.setdefault((guild_id, fmt), {})
+        if user_id in queue:
+            return False
+        queue[user_id] = None
+        self.joined.setdefault((guild_id, user_id), set()).add(fmt)
+        return True
+
+    def leave(self, guild_id, user_id, fmt=None):
+        """Leave one format's queue, or all of them; returns the formats left."""
+        formats = self.joined.get((guild_id, user_id), set())
+        left = [f for f in formats if fmt is None or f == fmt]
+        for f in left:
+            self.queues[(guild_id, f)].pop(user_id, None)
+            formats.discard(f)
+        if not formats:
+            self.joined.pop((guild_id, user_id), None)
+        return left
+
+    def formats_for(self, guild_id, user_id):
+        return sorted(self.joined.get((guild_id, user_id), ()))
+
+    def sizes(self, guild_id):
+        return {fmt: len(queue) for (gid, fmt), queue in self.queues.items() if gid == guild_id and queue}
+
+    def take_groups(self):
+        """Pull every full group out of the queues: [(guild_id, fmt, [ids])]."""
+        groups = []
+        busy = {}
+        for (guild_id, fmt), queue in list(self.queues.items()):
+            # Anyone who got into a draft some other way since queueing drops out
+            if guild_id not in busy:
+                busy[guild_id] = self.busy_players(guild_id)
+            for uid in [uid for uid in queue if uid in busy[guild_id]]:
+                self.leave(guild_id, uid)
+
+            size = self.group_size(fmt)
+            count = len(queue) // size
+            if not count:
+                continue
+
+            chosen = list(islice(queue, count * size))
+            for uid in chosen:
+                # A matched player leaves every other queue they were in too
+                self.leave(guild_id, uid)
+
+            chosen = self.order_players(guild_id, chosen)
+            groups += [(guild_id, fmt, chosen[i:i + size]) for i in range(0, len(chosen), size)]
+        return groups
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(MATCH_INTERVAL)
+            for guild_id, fmt, players in self.take_groups():
+                task = asyncio.create_task(self._start(guild_id, fmt, players))
+                self._starting.add(task)
+                task.add_done_callback(self._starting.discard)
+
+    async def _start(self, guild_id, fmt, players):
+        try:
+            await self.start_draft(guild_id, fmt, players)
+        except Exception as e:
+            print(f"Error starting matched {fmt} draft: {e}")
+            # Put the players back at the front of the queue
+            queue = self.queues.setdefault((guild_id, fmt), {})
+            self.queues[(guild_id, fmt)] = {**dict.fromkeys(players), **queue}
+            for uid in players:
+                self.joined.setdefault((guild_id, uid), set()).add(fmt)
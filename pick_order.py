@@ -0,0 +1,156 @@
+PICK_ORDERS = {
+    "snake": "🐍 Snake Draft",
+    "linear": "➡️ Normal Draft Order",
+    "1-2-2": "1️⃣ 1-2-2 Draft Order",
+    "custom": "✏️ Custom Draft Order",
+}
+COMMON_FORMATS = ["2v2", "3v3", "4v4", "5v5", "2v2v2", "3v3v3", "4v4v4", "2v2v2v2", "3v3v3v3"]
+MAX_TEAMS = 4
+MAX_TEAM_SIZE = 8
+TEAM_EMOJIS = ["🟦", "🟥", "🟩", "🟨"]
+
+
+def parse_format(text):
+    """'4v4' -> (2, 4), '3v3v3' -> (3, 3)"""
+    sizes = text.lower().replace(" ", "").split("v")
+    if len(sizes) < 2 or not all(s.isdigit() for s in sizes):
+        raise ValueError(f"`{text}` isn't a format like 3v3 or 3v3v3.")
+    sizes = [int(s) for s in sizes]
+    if len(set(sizes)) != 1:
+        raise ValueError("All teams need to be the same size.")
+    if len(sizes) > MAX_TEAMS:
+        raise ValueError(f"Drafts support at most {MAX_TEAMS} teams.")
+    if not 2 <= sizes[0] <= MAX_TEAM_SIZE:
+        raise ValueError(f"Teams need between 2 and {MAX_TEAM_SIZE} players.")
+    return len(sizes), sizes[0]
+
+
+def format_name(team_count, team_size):
+    return "v".join([str(team_size)] * team_count)
+
+
+def team_keys(team_count):
+    return [f"team{i}" for i in range(1, team_count + 1)]
+
+
+def draft_team_keys(draft):
+    # Drafts created before multi-team support have no team_count
+    return team_keys(draft.get("team_count", 2))
+
+
+def parse_pattern(text, team_count):
+    """'1,2,2,1' -> [0, 1, 1, 0]; every team has to appear at least once."""
+    parts = [p for p in text.replace(" ", "").replace("-", ",").split(",") if p]
+    if not parts or not all(p.isdigit() and 1 <= int(p) <= team_count for p in parts):
+        raise ValueError(f"Custom order needs team numbers from 1 to {team_count}, e.g. `1,2,2,1`.")
+    pattern = [int(p) - 1 for p in parts]
+    if len(set(pattern)) != team_count:
+        raise ValueError("Every team needs at least one pick in the custom order.")
+    return pattern
+
+
+def _turns(order, team_count, pattern):
+    forward = list(range(team_count))
+    if order == "linear":
+        while True:
+            yield from forward
+    elif order == "snake":
+        while True:
+            yield from forward
+            yield from reversed(forward)
+    elif order == "1-2-2":
+        # First captain picks once, then every turn after is a double pick
+        yield 0
+        rotation = forward[1:] + forward[:1]
+        while True:
+            for team in rotation:
+                yield team
+                yield team
+    elif order == "custom":
+        while True:
+            yield from pattern
+    else:
+        raise ValueError(f"Unknown pick order `{order}`.")
+
+
+def build_schedule(order, team_count, picks, pattern=None):
+    """Precompute who picks at every step; teams that are already full get skipped."""
+    capacity = picks // team_count
+    taken = [0] * team_count
+    schedule = []
+    for team in _turns(order, team_count, pattern):
+        if len(schedule) == capacity * team_count:
+            break
+        if taken[team] < capacity:
+            taken[team] += 1
+            schedule.append(f"team{team + 1}")
+    return schedule
+
+
+def draft_pick_order(draft):
+    # Drafts from before pick orders get one when their file is migrated (see draft_model.py)
+    return draft.get("pick_order", "snake")
+
+
+def describe_order(draft):
+    order = draft_pick_order(draft)
+    return PICK_ORDERS.get(order, order)
+
+
+def ensure_schedule(draft):
+    """Give drafts that were mid-pick before schedules existed one built from their picks so far."""
+    if "pick_schedule" in draft:
+        return
+    keys = draft_team_keys(draft)
+    made = sum(len(draft[k]) for k in keys)
+    draft["pick_schedule"] = build_schedule(draft_pick_order(draft), len(keys), made + len(draft.get("available", [])))
+    draft["pick_index"] = made
+
+
+def record_pick(draft, player_id):
+    """Give player_id to the team whose turn it is and advance to the next turn."""
+    team = draft["pick_turn"]
+    draft[team].append(player_id)
+    draft["available"].remove(player_id)
+    draft["pick_index"] += 1
+    schedule = draft["pick_schedule"]
+    draft["pick_turn"] = schedule[draft["pick_index"]] if draft["pick_index"] < len(schedule) else None
+    return team
+
+
+def replace_player(draft, old, new=None):
+    """Give `new` every slot `old` holds (queue, captaincy, roster, pick board).
+
+    With no replacement `old` is just removed: a vacated captaincy goes to the
+    team's first pick (or the next available player) and the remaining pick
+    schedule shrinks to match the players left to pick.
+    """
+    def swap(ids):
+        if old in ids:
+            if new is None:
+                ids.remove(old)
+            else:
+                ids[ids.index(old)] = new
+
+    swap(draft["players"])
+    swap(draft["available"])
+    teams = draft_team_keys(draft)
+    for team in teams:
+        swap(draft.get(team, []))
+
+    for team, captain in list(draft["captains"].items()):
+        if captain != old:
+            continue
+        if new is not None:
+            draft["captains"][team] = new
+        elif draft.get(team):
+            draft["captains"][team] = draft[team].pop(0)
+        elif draft["available"]:
+            draft["captains"][team] = draft["available"].pop(0)
+        else:
+            del draft["captains"][team]
+
+    if new is None and draft.get("pick_schedule") is not None:
+        end = draft["pick_index"] + len(draft["available"])
+        draft["pick_schedule"] = draft["pick_schedule"][:end]
+        draft["pick_turn"] = draft["pick_schedule"][draft["pick_index"]] if draft["pick_index"] < end else None
@@ -0,0 +1,63 @@
+import asyncio
+import heapq
+import time
+
+
+class TimerScheduler:
+    """Runs every pick timer from one task and one heap instead of a sleeping task per draft.
+
+    Entries are (deadline, guild_id, channel_id, pick_index). Deadlines are unix
+    timestamps so they can be stored in the draft and rescheduled after a restart.
+    Nothing is ever removed from the heap: the callback gets the pick_index the
+    timer was armed for and ignores it if the draft has moved on.
+    """
+
+    def __init__(self, on_expire):
+        self.on_expire = on_expire
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._firing = set()  # keep references so fired callbacks aren't garbage collected
+
+    def start(self):
+        """Start the runner; returns False if it was already running (e.g. on reconnect)."""
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, deadline, guild_id, channel_id, pick_index):
+        heapq.heappush(self._heap, (deadline, guild_id, channel_id, pick_index))
+        # Only wake the runner if this timer is now the next one due
+        if self._heap[0][0] == deadline:
+            self._wakeup.set()
+
+    def pending(self):
+        return len(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, guild_id, channel_id, pick_index = heapq.heappop(self._heap)
+                task = asyncio.create_task(self._fire(guild_id, channel_id, pick_index))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, guild_id, channel_id, pick_index):
+        try:
+            await self.on_expire(guild_id, channel_id, pick_index)
+        except Exception as e:
+            print(f"Error in pick timer for {channel_id}: {e}")
@@ -0,0 +1,146 @@
+import collections
+import contextvars
+import functools
+import inspect
+import time
+
+
+# Every REST call the bot makes is counted here by route bucket
+# ("POST /guilds/{guild_id}/roles"), per guild over a sliding window and per
+# draft for its whole life. When a guild is close to its soft budget the bot
+# drops work nobody is waiting on: DMs, the live queue mirror, pool warm-up
+# and role cleanup (which is pushed back instead).
+RATE_WINDOW = 60          # seconds
+GUILD_SOFT_BUDGET = 150   # calls per guild per window
+TIGHT_RATIO = 0.8         # "tight" from this share of the budget
+
+# Guild-wide routes share one small bucket per guild; these are the ones
+# that 429 first at peak, so each gets its own soft cap per window.
+ROUTE_BUDGETS = {
+    "POST /guilds/{guild_id}/channels": 10,
+    "DELETE /channels/{channel_id}": 10,
+    "POST /guilds/{guild_id}/roles": 10,
+    "PATCH /guilds/{guild_id}/roles/{role_id}": 10,
+    "DELETE /guilds/{guild_id}/roles/{role_id}": 10,
+}
+
+current_draft = contextvars.ContextVar("current_draft", default=None)
+
+
+class RateBudget:
+    def __init__(self, window=RATE_WINDOW, soft_budget=GUILD_SOFT_BUDGET):
+        self.window = window
+        self.soft_budget = soft_budget
+        self._recent = {}    # guild_id: deque[(timestamp, bucket)]
+        self.drafts = {}     # draft channel_id: {bucket: calls}
+        self.degraded = {}   # guild_id: {kind: times skipped or deferred}
+
+    def charge(self, guild_id, draft_id, bucket):
+        if guild_id is not None:
+            calls = self._recent.setdefault(guild_id, collections.deque())
+            calls.append((time.monotonic(), bucket))
+            self._prune(calls)  # busy guilds may not ask for recent() between calls
+        if draft_id is not None:
+            calls = self.drafts.setdefault(draft_id, {})
+            calls[bucket] = calls.get(bucket, 0) + 1
+
+    def _prune(self, calls):
+        cutoff = time.monotonic() - self.window
+        while calls and calls[0][0] < cutoff:
+            calls.popleft()
+
+    def recent(self, guild_id):
+        """{bucket: calls} inside the current window."""
+        calls = self._recent.get(guild_id)
+        if not calls:
+            return {}
+        self._prune(calls)
+        return dict(collections.Counter(bucket for _, bucket in calls))
+
+    def tight(self, guild_id):
+        recent = self.recent(guild_id)
+        if sum(recent.values()) >= self.soft_budget * TIGHT_RATIO:
+            return True
+        return any(recent.get(bucket, 0) >= limit * TIGHT_RATIO for bucket, limit in ROUTE_BUDGETS.items())
+
+    def skip(self, guild_id, kind):
+        """True if non-essential work of this kind should be dropped (or deferred) right now."""
+        if not self.tight(guild_id):
+            return False
+        counts = self.degraded.setdefault(guild_id, {})
+        counts[kind] = counts.get(kind, 0) + 1
+        return True
+
+    def close_draft(self, draft_id):
+        """Forget a finished draft; returns its {bucket: calls}."""
+        return self.drafts.pop(draft_id, {})
+
+    def snapshot(self, guild_id, draft_ids=()):
+        recent = self.recent(guild_id)
+        return {
+            "used": sum(recent.values()),
+            "budget": self.soft_budget,
+            "window": self.window,
+            "tight": self.tight(guild_id),
+            "buckets": sorted(recent.items(), key=lambda item: item[1], reverse=True),
+            "route_budgets": {bucket: (recent.get(bucket, 0), limit) for bucket, limit in ROUTE_BUDGETS.items() if recent.get(bucket)},
+            "drafts": {did: sum(self.drafts[did].values()) for did in draft_ids if did in self.drafts},
+            "degraded": dict(self.degraded.get(guild_id, {})),
+        }
+
+
+budget = RateBudget()
+
+
+def install(client, is_draft):
+    """Count every REST call `client` makes. Interaction responses go through
+    webhooks, which have their own limits, so they aren't counted.
+
+    `is_draft(guild_id, channel_id)` says whether a channel is a live draft;
+    calls are only charged to drafts that pass it, so log/lobby/DM channels and
+    drafts already closed don't pile up entries in `budget.drafts`. The one
+    exception is teardown: its record is already gone, but calls made under
+    per_draft still count while the draft's entry is open.
+    """
+    http = client.http
+    request = http.request
+
+    def guild_of(route):
+        if route.guild_id is not None:
+            return int(route.guild_id)
+        channel = client.get_channel(int(route.channel_id)) if route.channel_id is not None else None
+        return getattr(getattr(channel, "guild", None), "id", None)
+
+    @functools.wraps(request)
+    async def counted(route, **kwargs):
+        guild_id = guild_of(route)
+        draft_id = current_draft.get()
+        # Teardown runs after the record is deleted; its entry is still open until close_draft
+        tracked = draft_id is not None and int(draft_id) in budget.drafts
+        if draft_id is None:
+            draft_id = route.channel_id  # sends and edits in the draft's own channel
+        if draft_id is not None:
+            draft_id = int(draft_id)
+            if guild_id is None or not (tracked or is_draft(guild_id, draft_id)):
+                draft_id = None
+        budget.charge(guild_id, draft_id, route.key)
+        return await request(route, **kwargs)
+
+    http.request = counted
+
+
+def per_draft(func):
+    """Charge the calls made inside `func` (and tasks it starts) to the draft
+    whose `channel` or `channel_id` argument it was given."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+        channel = arguments.get("channel", arguments.get("channel_id"))
+        token = current_draft.set(getattr(channel, "id", channel))
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_draft.reset(token)
+    return wrapper
@@ -0,0 +1,124 @@
+import random
+
+from stats_db import connect, register_schema
+
+
+DEFAULT_RATING = 1000.0
+K_FACTOR = 32
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS ratings (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    rating   REAL    NOT NULL DEFAULT 1000,
+    games    INTEGER NOT NULL DEFAULT 0,
+    wins     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS ratings_by_rating ON ratings (guild_id, rating DESC);
+""")
+
+
+def get_ratings(guild_id, user_ids):
+    """{user_id: rating} for the given players; unrated players get DEFAULT_RATING."""
+    user_ids = list(user_ids)
+    found = {}
+    if user_ids:
+        marks = ",".join("?" * len(user_ids))
+        rows = connect().execute(
+            f"SELECT user_id, rating FROM ratings WHERE guild_id = ? AND user_id IN ({marks})",
+            [guild_id, *user_ids]
+        )
+        found = dict(rows.fetchall())
+    return {uid: found.get(uid, DEFAULT_RATING) for uid in user_ids}
+
+
+def expected_score(rating, opponent):
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def team_rating(ratings, team):
+    return sum(ratings[uid] for uid in team) / len(team) if team else DEFAULT_RATING
+
+
+def _rating_changes(ratings, teams, winner_index):
+    """[(user_id, new_rating, won)] for one result.
+
+    The winning team is scored as beating every other team; losing teams are
+    only compared with the winner, since the result says nothing about how
+    they rank among themselves.
+    """
+    averages = [team_rating(ratings, team) for team in teams]
+    winner_avg = averages[winner_index]
+
+    changes = []
+    for i, team in enumerate(teams):
+        if i == winner_index:
+            delta = sum(1 - expected_score(winner_avg, averages[j]) for j in range(len(teams)) if j != i)
+        else:
+            delta = 0 - expected_score(averages[i], winner_avg)
+        changes += [(uid, ratings[uid] + K_FACTOR * delta, int(i == winner_index)) for uid in team]
+    return changes
+
+
+def record_result(guild_id, teams, winner_index):
+    """Elo update for one finished draft; `teams` are player-id lists, captains included."""
+    ratings = get_ratings(guild_id, [uid for team in teams for uid in team])
+    rows = [(guild_id, uid, rating, won) for uid, rating, won in _rating_changes(ratings, teams, winner_index)]
+
+    conn = connect()
+    with conn:
+        conn.executemany("""
+            INSERT INTO ratings (guild_id, user_id, rating, games, wins) VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT (guild_id, user_id) DO UPDATE SET
+                rating = excluded.rating,
+                games = games + 1,
+                wins = wins + excluded.wins
+        """, rows)
+
+
+def rebuild(guild_id, results):
+    """Recompute a guild's ratings by replaying (teams, winner_index) results, oldest first.
+
+    Used after importing old results, which arrive out of order.
+    """
+    table = {}  # user_id: [rating, games, wins]
+    for teams, winner_index in results:
+        current = {uid: table.get(uid, [DEFAULT_RATING])[0] for team in teams for uid in team}
+        for uid, rating, won in _rating_changes(current, teams, winner_index):
+            entry = table.setdefault(uid, [DEFAULT_RATING, 0, 0])
+            entry[0] = rating
+            entry[1] += 1
+            entry[2] += won
+
+    conn = connect()
+    with conn:
+        conn.execute("DELETE FROM ratings WHERE guild_id = ?", (guild_id,))
+        conn.executemany(
+            "INSERT INTO ratings (guild_id, user_id, rating, games, wins) VALUES (?, ?, ?, ?, ?)",
+            [(guild_id, uid, rating, games, wins) for uid, (rating, games, wins) in table.items()]
+        )
+    return len(table)
+
+
+def pick_captains(guild_id, player_ids, count):
+    """Highest-rated players captain; the weakest of them gets the first pick."""
+    ratings = get_ratings(guild_id, player_ids)
+    shuffled = random.sample(list(player_ids), len(player_ids))  # random order among equal ratings
+    captains = sorted(shuffled, key=ratings.get, reverse=True)[:count]
+    return sorted(captains, key=ratings.get)
+
+
+def best_available(guild_id, player_ids):
+    ratings = get_ratings(guild_id, player_ids)
+    best = max(ratings.values())
+    return random.choice([uid for uid, r in ratings.items() if r == best])
+
+
+def balance_score(guild_id, teams):
+    """0-100: 100 means every team has the same average rating."""
+    ratings = get_ratings(guild_id, [uid for team in teams for uid in team])
+    averages = [team_rating(ratings, team) for team in teams]
+    # Win chance of the strongest team over the weakest, mapped so 50% -> 100
+    favourite = expected_score(max(averages), min(averages))
+    return round((1 - (favourite - 0.5) * 2) * 100)
@@ -0,0 +1,734 @@
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import re
+import runpy
+import selectors
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import discord
+from discord.ext import commands
+
+
+# Replays scripted drafts (scenarios/*.json) against the real bot code with a
+# fake Discord behind discord.py's HTTP layer and a virtual clock, then checks
+# the final state and the exact sequence of Discord API calls. A refactor that
+# breaks the flow or spends more requests per draft fails the replay.
+#   python replay.py scenarios/*.json            # check every scenario
+#   python replay.py scenarios/picks.json -v     # also show the bot's output
+#   python replay.py scenarios/picks.json --record   # accept the current behaviour
+# Each scenario runs in its own interpreter with PYTHONHASHSEED=0, seeded
+# `random` and inline executor queues, so a replay is fully deterministic.
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOT_FILE = os.path.join(HERE, "draft bot.py")
+
+EPOCH = 1_750_000_000        # virtual unix time when every scenario starts
+STEP_SECONDS = 1.0           # virtual time each step gets to settle
+DISCORD_EPOCH_MS = 1420070400000
+APPLICATION_ID = 900000000000000001
+
+ROLES = ("Drafter", "Draft Admin", "Middle Man", "Token Player", "Scammer", "Staff")
+CHANNELS = (
+    # name, type, config key
+    ("Drafts", 4, "draft_category_id"),
+    ("Voice", 4, "voice_category_id"),
+    ("lobby", 0, None),
+    ("draft-logs", 0, "log_channel_id"),
+    ("Waiting Room", 2, "holding_vc_id"),
+)
+ROLE_CONFIG = {
+    "Middle Man": "middleman_role_id",
+    "Token Player": "token_player_role_id",
+    "Scammer": "scammer_role_id",
+    "Staff": "staff_role_id",
+}
+
+
+class ScenarioError(Exception):
+    pass
+
+
+# ⏱️ Virtual clock: whenever the loop would block, time jumps to the next timer
+class _InstantSelector(selectors.DefaultSelector):
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events:
+            return events
+        if timeout is None:
+            raise ScenarioError("Stalled: nothing scheduled and nothing to wait for")
+        self.loop.now += timeout
+        return []
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        selector = _InstantSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+def install_clock(loop):
+    time.time = lambda: EPOCH + loop.now
+    time.monotonic = lambda: loop.now
+
+
+def snowflake(counter):
+    ms = int(time.time() * 1000) - DISCORD_EPOCH_MS
+    return (ms << 22) | (next(counter) & 0x3FFFFF)
+
+
+def _template(path):
+    return re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", re.escape(path).replace(r"\{", "{").replace(r"\}", "}")) + "$")
+
+
+class FakeResponse:
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+class FakeDiscord:
+    """Answers discord.py's REST and webhook calls from an in-memory guild.
+
+    Every call is recorded by route (e.g. "POST /channels/{channel_id}/messages")
+    and anything that would arrive over the gateway afterwards (channel and
+    role creates, member updates, voice moves) is fed back into the client's
+    cache the same way the gateway would.
+    """
+
+    def __init__(self, bot, scenario):
+        self.bot = bot
+        self.state = bot._connection
+        self.ids = itertools.count(1)
+        self.calls = []
+        self.errors = []
+        self.channels = {}     # channel_id: payload
+        self.messages = {}     # message_id: payload
+        self.roles = {}        # role_id: payload
+        self.members = {}      # user_id: member payload
+        self.users = {}        # alias: user_id
+        self.names = {}        # user_id: alias
+        self.interactions = {}  # token: (user alias, channel_id)
+        self.modals = {}       # user alias: last modal payload shown to them
+        self.dms = {}          # user_id: DM channel_id
+        self.voice = {}        # user_id: voice channel_id
+        self.routes = []
+        for key, handler in self._handlers().items():
+            method, path = key.split(" ", 1)
+            self.routes.append((method, _template(path), key, handler))
+
+        self.me = {"id": str(APPLICATION_ID), "username": "draftbot", "discriminator": "0", "global_name": "Draft Bot", "avatar": None, "bot": True}
+        self.state.user = discord.ClientUser(state=self.state, data=self.me)
+        self.state.application_id = APPLICATION_ID
+        self.guild_id = self.new_id()
+        self._build_guild(scenario)
+
+    def new_id(self):
+        return snowflake(self.ids)
+
+    # 🏗️ Guild setup
+    def _build_guild(self, scenario):
+        role_ids = {"@everyone": self.guild_id}
+        self.roles[self.guild_id] = self._role(self.guild_id, "@everyone", 0)
+        for position, name in enumerate(ROLES, start=1):
+            rid = role_ids[name] = self.new_id()
+            self.roles[rid] = self._role(rid, name, position)
+        self.role_ids = role_ids
+
+        self.channel_ids = {}
+        for position, (name, kind, _) in enumerate(CHANNELS):
+            cid = self.channel_ids[name] = self.new_id()
+            parent = self.channel_ids["Voice"] if kind == 2 else self.channel_ids.get("Drafts") if kind == 0 else None
+            self.channels[cid] = self._channel(cid, name, kind, position, parent if kind != 4 else None, [])
+
+        for alias, roles in scenario.get("members", {}).items():
+            uid = self.new_id()
+            self.users[alias] = uid
+            self.names[uid] = alias
+            self.members[uid] = {
+                "user": self._user(uid, alias),
+                "roles": [str(role_ids[name]) for name in roles],
+                "joined_at": "2025-01-01T00:00:00+00:00",
+                "deaf": False, "mute": False, "flags": 0,
+            }
+        self.members[APPLICATION_ID] = {"user": self.me, "roles": [], "joined_at": "2025-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+
+        self.state._add_guild_from_data({
+            "id": str(self.guild_id), "name": "Replay", "owner_id": str(APPLICATION_ID),
+            "roles": list(self.roles.values()),
+            "channels": list(self.channels.values()),
+            "members": list(self.members.values()),
+            "member_count": len(self.members),
+            "features": [], "emojis": [], "stickers": [], "voice_states": [], "presences": [],
+            "threads": [], "stage_instances": [], "guild_scheduled_events": [],
+            "premium_tier": 0, "verification_level": 0, "explicit_content_filter": 0,
+            "default_message_notifications": 0, "mfa_level": 0, "nsfw_level": 0,
+            "system_channel_flags": 0, "preferred_locale": "en-US", "large": False,
+        })
+        self.guild = self.bot.get_guild(self.guild_id)
+
+    def config(self, overrides):
+        values = {key: self.channel_ids[name] for name, _, key in CHANNELS if key}
+        values.update({key: self.role_ids[name] for name, key in ROLE_CONFIG.items()})
+        values.update(overrides)
+        return values
+
+    def _user(self, uid, name):
+        return {"id": str(uid), "username": name, "discriminator": "0", "global_name": name, "avatar": None}
+
+    def _role(self, rid, name, position, permissions="0"):
+        return {"id": str(rid), "name": name, "permissions": str(permissions), "position": position, "color": 0,
+                "hoist": False, "managed": False, "mentionable": False, "flags": 0}
+
+    def _channel(self, cid, name, kind, position, parent_id, overwrites):
+        payload = {"id": str(cid), "type": kind, "guild_id": str(self.guild_id), "name": name, "position": position,
+                   "parent_id": str(parent_id) if parent_id else None, "permission_overwrites": overwrites,
+                   "nsfw": False, "flags": 0}
+        if kind == 0:
+            payload.update(topic=None, last_message_id=None, rate_limit_per_user=0)
+        elif kind == 2:
+            payload.update(bitrate=64000, user_limit=0, rtc_region=None)
+        return payload
+
+    def _message(self, channel_id, payload, author=None, flags=0):
+        mid = self.new_id()
+        message = {
+            "id": str(mid), "channel_id": str(channel_id), "author": author or self.me,
+            "content": payload.get("content") or "", "embeds": payload.get("embeds") or [],
+            "components": payload.get("components") or [], "attachments": [], "mentions": [],
+            "mention_roles": [], "mention_everyone": False, "pinned": False, "tts": False, "type": 0,
+            "timestamp": datetime.datetime.fromtimestamp(time.time(), datetime.timezone.utc).isoformat(),
+            "edited_timestamp": None, "flags": payload.get("flags") or flags,
+        }
+        if int(channel_id) in self.channels:
+            message["guild_id"] = str(self.guild_id)
+        self.messages[mid] = message
+        return message
+
+    def _not_found(self, what):
+        raise discord.NotFound(FakeResponse(404, "Not Found"), f"Unknown {what}")
+
+    # 🌐 REST
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        return self._dispatch(route, kwargs.get("json"), kwargs.get("params"), form)
+
+    async def webhook_request(self, route, session, *, payload=None, multipart=None, params=None, **kwargs):
+        if payload is None and multipart:
+            payload = json.loads(multipart[0]["value"])
+        return self._dispatch(route, payload, params, None)
+
+    def _dispatch(self, route, payload, params, form):
+        for method, pattern, key, handler in self.routes:
+            match = pattern.match(route.url[len(route.BASE):].split("?")[0])
+            if method == route.method and match:
+                self.calls.append(route.key)
+                if payload is None and form:
+                    payload = json.loads(next(f["value"] for f in form if f["name"] == "payload_json"))
+                return handler(payload or {}, params or {}, **{k: int(v) if v.isdigit() else v for k, v in match.groupdict().items()})
+        raise ScenarioError(f"The fake Discord doesn't handle {route.method} {route.path}")
+
+    def _handlers(self):
+        return {
+            "POST /guilds/{guild_id}/channels": self.create_channel,
+            "PATCH /channels/{channel_id}": self.edit_channel,
+            "DELETE /channels/{channel_id}": self.delete_channel,
+            "PUT /channels/{channel_id}/permissions/{target}": self.edit_overwrite,
+            "DELETE /channels/{channel_id}/permissions/{target}": self.delete_overwrite,
+            "PATCH /guilds/{guild_id}/channels": lambda payload, params, guild_id: None,
+            "POST /channels/{channel_id}/messages": self.send_message,
+            "GET /channels/{channel_id}/messages": self.history,
+            "POST /channels/{channel_id}/messages/bulk-delete": self.bulk_delete,
+            "GET /channels/{channel_id}/messages/{message_id}": self.get_message,
+            "PATCH /channels/{channel_id}/messages/{message_id}": self.edit_message,
+            "DELETE /channels/{channel_id}/messages/{message_id}": self.delete_message,
+            "POST /guilds/{guild_id}/roles": self.create_role,
+            "PATCH /guilds/{guild_id}/roles/{role_id}": self.edit_role,
+            "DELETE /guilds/{guild_id}/roles/{role_id}": self.delete_role,
+            "GET /guilds/{guild_id}/members/{user_id}": self.get_member,
+            "PATCH /guilds/{guild_id}/members/{user_id}": self.edit_member,
+            "PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}": self.add_role,
+            "DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}": self.remove_role,
+            "POST /users/@me/channels": self.create_dm,
+            "POST /interactions/{webhook_id}/{webhook_token}/callback": self.interaction_callback,
+            "POST /webhooks/{webhook_id}/{webhook_token}": self.followup,
+            "GET /webhooks/{webhook_id}/{webhook_token}/messages/{message_id}": self.get_followup,
+            "PATCH /webhooks/{webhook_id}/{webhook_token}/messages/{message_id}": self.edit_followup,
+            "DELETE /webhooks/{webhook_id}/{webhook_token}/messages/{message_id}": lambda payload, params, **_: None,
+        }
+
+    def create_channel(self, payload, params, guild_id):
+        cid = self.new_id()
+        channel = self._channel(cid, payload["name"], payload.get("type", 0), len(self.channels),
+                                payload.get("parent_id"), payload.get("permission_overwrites", []))
+        if "user_limit" in payload:
+            channel["user_limit"] = payload["user_limit"]
+        self.channels[cid] = channel
+        self.state.parse_channel_create(channel)
+        return channel
+
+    def _channel_or_404(self, channel_id):
+        if channel_id not in self.channels:
+            self._not_found("Channel")
+        return self.channels[channel_id]
+
+    def edit_channel(self, payload, params, channel_id):
+        channel = self._channel_or_404(channel_id)
+        channel.update({k: v for k, v in payload.items() if k in channel or k == "user_limit"})
+        self.state.parse_channel_update(channel)
+        return channel
+
+    def delete_channel(self, payload, params, channel_id):
+        channel = self.channels.pop(channel_id, None) or self._not_found("Channel")
+        self.state.parse_channel_delete(channel)
+        return channel
+
+    def edit_overwrite(self, payload, params, channel_id, target):
+        channel = self._channel_or_404(channel_id)
+        overwrites = [o for o in channel["permission_overwrites"] if o["id"] != str(target)]
+        overwrites.append({"id": str(target), **payload})
+        channel["permission_overwrites"] = overwrites
+        self.state.parse_channel_update(channel)
+
+    def delete_overwrite(self, payload, params, channel_id, target):
+        channel = self._channel_or_404(channel_id)
+        channel["permission_overwrites"] = [o for o in channel["permission_overwrites"] if o["id"] != str(target)]
+        self.state.parse_channel_update(channel)
+
+    def send_message(self, payload, params, channel_id):
+        if channel_id not in self.channels and channel_id not in self.dms.values():
+            self._not_found("Channel")
+        return self._message(channel_id, payload)
+
+    def history(self, payload, params, channel_id):
+        before = int(params.get("before", 1 << 63))
+        found = sorted((m for mid, m in self.messages.items() if m["channel_id"] == str(channel_id) and mid < before),
+                       key=lambda m: int(m["id"]), reverse=True)
+        return found[:int(params.get("limit", 50))]
+
+    def bulk_delete(self, payload, params, channel_id):
+        for mid in payload.get("messages", []):
+            self.messages.pop(int(mid), None)
+
+    def get_message(self, payload, params, channel_id, message_id):
+        return self.messages.get(message_id) or self._not_found("Message")
+
+    def edit_message(self, payload, params, channel_id, message_id):
+        message = self.messages.get(message_id) or self._not_found("Message")
+        message.update({k: v for k, v in payload.items() if k in ("content", "embeds", "components", "flags")})
+        return message
+
+    def delete_message(self, payload, params, channel_id, message_id):
+        self.messages.pop(message_id, None) or self._not_found("Message")
+
+    def create_role(self, payload, params, guild_id):
+        rid = self.new_id()
+        role = self.roles[rid] = self._role(rid, payload.get("name", "new role"), len(self.roles), payload.get("permissions", 0))
+        self.state.parse_guild_role_create({"guild_id": str(guild_id), "role": role})
+        return role
+
+    def edit_role(self, payload, params, guild_id, role_id):
+        role = self.roles.get(role_id) or self._not_found("Role")
+        role.update({k: v for k, v in payload.items() if k in role})
+        self.state.parse_guild_role_update({"guild_id": str(guild_id), "role": role})
+        return role
+
+    def delete_role(self, payload, params, guild_id, role_id):
+        self.roles.pop(role_id, None) or self._not_found("Role")
+        self.state.parse_guild_role_delete({"guild_id": str(guild_id), "role_id": str(role_id)})
+
+    def get_member(self, payload, params, guild_id, user_id):
+        return self.members.get(user_id) or self._not_found("Member")
+
+    def _member_update(self, user_id):
+        member = self.members[user_id]
+        self.state.parse_guild_member_update({"guild_id": str(self.guild_id), **member})
+        return member
+
+    def edit_member(self, payload, params, guild_id, user_id):
+        if user_id not in self.members:
+            self._not_found("Member")
+        if "channel_id" in payload:
+            self.set_voice(user_id, payload["channel_id"] and int(payload["channel_id"]))
+        if "roles" in payload:
+            self.members[user_id]["roles"] = [str(r) for r in payload["roles"]]
+        return self._member_update(user_id)
+
+    def add_role(self, payload, params, guild_id, user_id, role_id):
+        roles = self.members[user_id]["roles"]
+        if str(role_id) not in roles:
+            roles.append(str(role_id))
+        self._member_update(user_id)
+
+    def remove_role(self, payload, params, guild_id, user_id, role_id):
+        roles = self.members[user_id]["roles"]
+        if str(role_id) in roles:
+            roles.remove(str(role_id))
+        self._member_update(user_id)
+
+    def create_dm(self, payload, params):
+        uid = int(payload["recipient_id"])
+        cid = self.dms.setdefault(uid, self.new_id())
+        return {"id": str(cid), "type": 1, "recipients": [self.members[uid]["user"]]}
+
+    def interaction_callback(self, payload, params, webhook_id, webhook_token):
+        alias, channel_id = self.interactions[webhook_token]
+        kind = payload["type"]
+        data = payload.get("data") or {}
+        result = {"interaction": {"id": str(webhook_id), "type": 2,
+                                  "response_message_loading": kind == 5,
+                                  "response_message_ephemeral": bool((data.get("flags") or 0) & 64)}}
+        if kind == 9:
+            self.modals[alias] = data
+        elif kind == 4:
+            message = self._message(channel_id, data)
+            result["interaction"]["response_message_id"] = message["id"]
+            result["resource"] = {"type": 4, "message": message}
+        return result
+
+    def followup(self, payload, params, webhook_id, webhook_token):
+        _, channel_id = self.interactions[webhook_token]
+        return self._message(channel_id, payload)
+
+    def get_followup(self, payload, params, webhook_id, webhook_token, message_id):
+        _, channel_id = self.interactions[webhook_token]
+        return self.messages.get(message_id) or self._message(channel_id, {})
+
+    def edit_followup(self, payload, params, webhook_id, webhook_token, message_id):
+        _, channel_id = self.interactions[webhook_token]
+        message = self.messages.get(message_id) or self._message(channel_id, {})
+        message.update({k: v for k, v in payload.items() if k in ("content", "embeds", "components", "flags")})
+        return message
+
+    # 🔊 Gateway: voice
+    def set_voice(self, user_id, channel_id):
+        if channel_id is None:
+            self.voice.pop(user_id, None)
+        else:
+            self.voice[user_id] = channel_id
+        self.state.parse_voice_state_update({
+            "guild_id": str(self.guild_id), "channel_id": str(channel_id) if channel_id else None,
+            "user_id": str(user_id), "member": self.members[user_id], "session_id": "replay",
+            "deaf": False, "mute": False, "self_deaf": False, "self_mute": False,
+            "self_video": False, "suppress": False, "request_to_speak_timestamp": None,
+        })
+
+    # 🖱️ Interactions
+    def interact(self, kind, alias, channel_id, data, message=None, dm=False):
+        uid = self.users[alias]
+        token = f"replay-{self.new_id()}"
+        self.interactions[token] = (alias, channel_id)
+        payload = {
+            "id": str(self.new_id()), "application_id": str(APPLICATION_ID), "type": kind, "token": token,
+            "version": 1, "data": data, "locale": "en-US", "attachment_size_limit": 8 * 1024 * 1024,
+            "app_permissions": str((1 << 53) - 1), "entitlements": [], "authorizing_integration_owners": {},
+        }
+        if dm:
+            payload.update(channel={"id": str(channel_id), "type": 1}, user=self.members[uid]["user"], context=1)
+        else:
+            member = dict(self.members[uid], permissions=str((1 << 53) - 1))
+            payload.update(guild_id=str(self.guild_id), guild_locale="en-US", member=member, context=0,
+                           channel=self.channels[channel_id])
+        if message is not None:
+            payload["message"] = message
+        self.state.parse_interaction_create(payload)
+
+
+def _components(message):
+    for row in message.get("components", []):
+        yield from row.get("components", [])
+
+
+class Replay:
+    def __init__(self, scenario, verbose=False):
+        self.scenario = scenario
+        self.verbose = verbose
+        self.draft_channel = None
+
+    # ▶️ Loading the bot
+    async def load(self):
+        import executor as executor_module
+
+        async def run_inline(queue, func, *args):
+            return func(*args)
+
+        executor_module.executor.run = run_inline  # no worker threads: file writes happen in step order
+        commands.Bot.run = lambda *args, **kwargs: None  # the bot file calls bot.run() at the bottom
+        commands.AutoShardedBot.run = lambda *args, **kwargs: None
+        # Patched on the class before the bot loads, so the REST hooks it installs still run
+        discord.http.HTTPClient.request = lambda http, route, **kwargs: self.fake.request(route, **kwargs)
+        self.ns = runpy.run_path(BOT_FILE, run_name="draft_bot")
+        bot = self.ns["bot"]
+        await bot._async_setup_hook()  # binds bot.loop like login() would
+        self.fake = fake = FakeDiscord(bot, self.scenario)
+        discord.webhook.async_.AsyncWebhookAdapter.request = lambda adapter, *args, **kwargs: fake.webhook_request(*args, **kwargs)
+
+        def record_error(error):
+            error = getattr(error, "original", error)
+            fake.errors.append(f"{type(error).__name__}: {error}")
+            if self.verbose:
+                traceback.print_exception(error)
+
+        async def tree_error(interaction, error):
+            record_error(error)
+
+        async def item_error(self, interaction, error, *args):
+            record_error(error)
+
+        bot.tree.on_error = tree_error
+        discord.ui.View.on_error = item_error
+        discord.ui.Modal.on_error = item_error
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: record_error(context.get("exception") or RuntimeError(context["message"]))
+        )
+
+        update_config = self.ns["update_config"]
+        for key, value in fake.config(self.scenario.get("config", {})).items():
+            update_config(fake.guild_id, key, str(value))
+        self.ns["pick_timers"].start()
+
+    # 🎬 Steps
+    def drafts(self):
+        return self.ns["load_drafts"](self.fake.guild_id)
+
+    def channel(self, name):
+        if name == "draft":
+            if self.draft_channel is None:
+                raise ScenarioError("No draft channel yet")
+            return self.draft_channel
+        return self.fake.channel_ids[name]
+
+    def find_button(self, channel_id, wanted):
+        """Newest button in the channel whose custom_id or label is `wanted`."""
+        found = sorted((m for m in self.fake.messages.values() if m["channel_id"] == str(channel_id)),
+                       key=lambda m: int(m["id"]), reverse=True)
+        for message in found:
+            for item in _components(message):
+                if wanted in (item.get("custom_id"), item.get("label")) and not item.get("disabled"):
+                    return message, item
+        raise ScenarioError(f"No `{wanted}` button in channel {channel_id}")
+
+    def click(self, alias, channel_id, wanted, dm=False):
+        message, item = self.find_button(channel_id, wanted)
+        self.fake.interact(3, alias, channel_id, {"custom_id": item["custom_id"], "component_type": 2}, message, dm)
+
+    def command(self, alias, channel_id, name, options):
+        tree = self.ns["tree"]
+        parts = name.split()
+        command = tree.get_command(parts[0])
+        data = {"id": str(self.fake.new_id()), "name": parts[0], "type": 1, "options": [], "resolved": {}}
+        target = data["options"]
+        for part in parts[1:]:
+            command = command.get_command(part)
+            target.append({"name": part, "type": 1, "options": []})
+            target = target[-1]["options"]
+        for key, value in options.items():
+            kind = command.get_parameter(key).type.value
+            if kind == 6:  # member
+                uid = self.fake.users[value]
+                data["resolved"].setdefault("users", {})[str(uid)] = self.fake.members[uid]["user"]
+                data["resolved"].setdefault("members", {})[str(uid)] = {k: v for k, v in self.fake.members[uid].items() if k != "user"}
+                value = str(uid)
+            target.append({"name": key, "type": kind, "value": value})
+        self.fake.interact(2, alias, channel_id, data)
+
+    def submit_modal(self, alias, values, dm=False):
+        modal = self.fake.modals.pop(alias, None)
+        if modal is None:
+            raise ScenarioError(f"{alias} has no modal open")
+        rows = [{"type": 1, "components": [
+            {"type": 4, "custom_id": item["custom_id"], "value": values.get(item["label"], "")}
+            for item in row["components"]
+        ]} for row in modal["components"]]
+        channel_id = self.fake.dms[self.fake.users[alias]] if dm else self.draft_channel
+        self.fake.interact(5, alias, channel_id, {"custom_id": modal["custom_id"], "components": rows}, dm=dm)
+
+    def current_captain(self):
+        draft = self.drafts()[str(self.draft_channel)]
+        return self.fake.names[draft["captains"][draft["pick_turn"]]]
+
+    async def step(self, step):
+        fake = self.fake
+        settle = STEP_SECONDS
+        if "command" in step:
+            self.command(step["user"], self.channel(step.get("channel", "lobby")), step["command"], step.get("options", {}))
+        elif "button" in step:
+            self.click(step["user"], self.channel(step.get("channel", "draft")), step["button"])
+        elif "dm_button" in step:
+            uid = fake.users[step["user"]]
+            self.click(step["user"], fake.dms[uid], step["dm_button"], dm=True)
+        elif "pick" in step:
+            draft = self.drafts()[str(self.draft_channel)]
+            player = step["pick"] or fake.names[draft["available"][0]]
+            self.click(step.get("user") or self.current_captain(), self.draft_channel, player)
+        elif "modal" in step:
+            self.submit_modal(step["user"], step["modal"], dm=step.get("dm", False))
+        elif "voice" in step:
+            fake.set_voice(fake.users[step["user"]], fake.channel_ids.get(step["voice"]) if step["voice"] else None)
+        elif "payment" in step:
+            uid = fake.users[step["payment"]]
+            draft = self.drafts()[str(self.draft_channel)]
+            await self.ns["confirm_payment"](str(self.draft_channel), uid, draft["cash_tags"][str(uid)])
+        elif "advance" in step:
+            settle = step["advance"]
+        elif "check" in step:
+            self.compare("check", self.summary(), step["check"], partial=True)
+            return
+        else:
+            raise ScenarioError(f"Unknown step {step}")
+        await asyncio.sleep(settle)
+
+        drafts = self.drafts()
+        if drafts:
+            self.draft_channel = int(list(drafts)[-1])
+
+    async def play(self):
+        await self.load()
+        for number, step in enumerate(self.scenario["steps"], start=1):
+            try:
+                await self.step(step)
+            except ScenarioError as e:
+                raise ScenarioError(f"step {number} {json.dumps(step)}: {e}") from None
+        await self.ns["flush_writes"]()
+
+    # 📋 Results
+    def alias(self, value):
+        if isinstance(value, int):
+            return self.fake.names.get(value, value)
+        if isinstance(value, list):
+            return [self.alias(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.alias(v) for k, v in value.items()}
+        return value
+
+    def summary(self):
+        fake = self.fake
+        drafts = [
+            {
+                key: self.alias(draft.get(key))
+                for key in ("team_size", "players", "waitlist", "captains", "teams", "available", "pick_turn")
+                if draft.get(key) not in (None, [], {})
+            }
+            for draft in self.drafts().values()
+        ]
+        matches = self.ns["match_history"].recent_matches(fake.guild_id, limit=100)
+        return {
+            "drafts": drafts,
+            "matches": [{"format": fmt, "winner": winner} for _, fmt, winner, _, _ in reversed(matches)],
+            "text_channels": sum(1 for c in fake.channels.values() if c["type"] == 0),
+            "voice_channels": sum(1 for c in fake.channels.values() if c["type"] == 2),
+            "roles": len(fake.roles),
+            "voice": {fake.names[uid]: fake.channels[cid]["name"] for uid, cid in sorted(fake.voice.items()) if cid in fake.channels},
+        }
+
+    def result(self):
+        calls = self.fake.calls
+        counts = {}
+        for key in calls:
+            counts[key] = counts.get(key, 0) + 1
+        return {
+            "state": self.summary(),
+            "errors": self.fake.errors,
+            "api_calls": {"total": len(calls), "by_route": dict(sorted(counts.items())), "sequence": calls},
+        }
+
+    def compare(self, label, actual, expected, partial=False):
+        keys = expected if partial else set(expected) | set(actual)
+        for key in keys:
+            if actual.get(key) != expected.get(key):
+                raise AssertionError(f"{label}.{key}: expected {json.dumps(expected.get(key))}, got {json.dumps(actual.get(key))}")
+
+
+def run_one(path, record=False, verbose=False):
+    with open(path) as f:
+        scenario = json.load(f)
+
+    random.seed(scenario.get("seed", 0))
+    loop = VirtualClockLoop()
+    asyncio.set_event_loop(loop)
+    install_clock(loop)
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    os.chdir(workdir)
+    sys.path.insert(0, HERE)
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    replay = Replay(scenario, verbose)
+    try:
+        loop.run_until_complete(replay.play())
+        result = replay.result()
+    finally:
+        sys.stdout = sys.__stdout__
+
+    expected = scenario.get("expect")
+    budget = scenario.get("max_api_calls")
+    if record or expected is None:
+        scenario["expect"] = result
+        with open(path, "w") as f:
+            json.dump(scenario, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"📝 {os.path.basename(path)}: recorded {result['api_calls']['total']} API calls")
+    else:
+        replay.compare("state", result["state"], expected["state"])
+        replay.compare("errors", {"errors": result["errors"]}, {"errors": expected.get("errors", [])})
+        got, wanted = result["api_calls"]["by_route"], expected["api_calls"]["by_route"]
+        changed = {key: f"{wanted.get(key, 0)} -> {got.get(key, 0)}" for key in sorted(set(got) | set(wanted)) if got.get(key) != wanted.get(key)}
+        if changed:
+            raise AssertionError("API calls changed: " + ", ".join(f"{key} {diff}" for key, diff in changed.items()))
+        sequence, wanted = result["api_calls"]["sequence"], expected["api_calls"]["sequence"]
+        if sequence != wanted:
+            at = next((i for i, (a, b) in enumerate(zip(sequence, wanted)) if a != b), min(len(sequence), len(wanted)))
+            raise AssertionError(f"api call #{at + 1}: expected {wanted[at] if at < len(wanted) else 'nothing'}, got {sequence[at] if at < len(sequence) else 'nothing'}")
+    if budget is not None and result["api_calls"]["total"] > budget:
+        raise AssertionError(f"{result['api_calls']['total']} API calls is over this scenario's budget of {budget}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay scripted drafts against the bot and check state and API calls")
+    parser.add_argument("scenarios", nargs="+")
+    parser.add_argument("--record", action="store_true", help="overwrite each scenario's expectations with this run")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the bot's output and tracebacks")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        try:
+            run_one(os.path.abspath(args.scenarios[0]), args.record, args.verbose)
+        except (AssertionError, ScenarioError) as e:
+            print(f"❌ {os.path.basename(args.scenarios[0])}: {e}")
+            sys.exit(1)
+        if not args.record:
+            print(f"✅ {os.path.basename(args.scenarios[0])}")
+        return
+
+    # One interpreter per scenario: the bot keeps module-level state
+    env = dict(os.environ, PYTHONHASHSEED="0")
+    failed = 0
+    for path in args.scenarios:
+        cmd = [sys.executable, os.path.abspath(__file__), os.path.abspath(path), "--child"]
+        cmd += ["--record"] * args.record + ["--verbose"] * args.verbose
+        failed += subprocess.run(cmd, env=env).returncode != 0
+    if failed:
+        print(f"{failed} of {len(args.scenarios)} scenarios failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
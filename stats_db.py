@@ -0,0 +1,44 @@
+import os
+import sqlite3
+
+
+# Ratings and match history share one SQLite file. WAL mode lets several
+# worker processes read while one of them writes.
+STATS_DB = os.getenv("STATS_DB", "stats.db")
+
+_conn = None
+_schemas = []
+
+
+def register_schema(sql):
+    _schemas.append(sql)
+    if _conn is not None:
+        _conn.executescript(sql)
+
+
+def connect():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(STATS_DB, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        for sql in _schemas:
+            _conn.executescript(sql)
+    return _conn
+
+
+def open_reader():
+    """A separate read-only connection for long reads off the event loop thread."""
+    connect()  # make sure the schema exists
+    conn = sqlite3.connect(f"file:{STATS_DB}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def close():
+    """Fold the WAL back into the database file and close (used on shutdown)."""
+    global _conn
+    if _conn is not None:
+        _conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        _conn.close()
+        _conn = None
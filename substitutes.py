@@ -0,0 +1,37 @@
+import time
+
+import match_history
+
+
+class SubstitutePool:
+    """Per-guild players who are happy to fill any vacated draft slot.
+
+    Candidates are ranked by when they last played (most recent first), then
+    by how long they've been waiting, so active regulars get the call first.
+    """
+
+    def __init__(self):
+        self.pools = {}  # guild_id: {user_id: joined_at}
+
+    def join(self, guild_id, user_id):
+        pool = self.pools.setdefault(guild_id, {})
+        if user_id in pool:
+            return False
+        pool[user_id] = time.time()
+        return True
+
+    def leave(self, guild_id, user_id):
+        return self.pools.get(guild_id, {}).pop(user_id, None) is not None
+
+    def ranked(self, guild_id):
+        pool = self.pools.get(guild_id, {})
+        last_played = match_history.last_played(guild_id, list(pool))
+        return sorted(pool, key=lambda uid: (-last_played.get(uid, 0), pool[uid]))
+
+    def take(self, guild_id, usable):
+        """Remove and return the best-ranked substitute for whom usable(uid) is true."""
+        for uid in self.ranked(guild_id):
+            if usable(uid):
+                self.leave(guild_id, uid)
+                return uid
+        return None
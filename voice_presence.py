@@ -0,0 +1,82 @@
+import asyncio
+
+
+class VoicePresence:
+    """Who is in which voice channel, kept current from on_voice_state_update.
+
+    Moves are planned against this index instead of walking `vc.members` or
+    `member.voice`, so each member is moved at most once and only if they're
+    actually connected somewhere else.
+    """
+
+    def __init__(self):
+        self._channel = {}   # (guild_id, user_id): channel_id
+        self._members = {}   # channel_id: {user_id}
+        self._team_vc = {}   # (guild_id, user_id): team VC id for players of a running draft
+
+    def _set(self, guild_id, user_id, channel_id):
+        old = self._channel.pop((guild_id, user_id), None)
+        if old is not None:
+            members = self._members.get(old)
+            if members:
+                members.discard(user_id)
+                if not members:
+                    del self._members[old]
+        if channel_id is not None:
+            self._channel[(guild_id, user_id)] = channel_id
+            self._members.setdefault(channel_id, set()).add(user_id)
+
+    def seed(self, guild):
+        """Fill the index for a guild from the gateway cache (on ready)."""
+        # Forget what we knew; events may have been missed while disconnected
+        for guild_id, user_id in [key for key in self._channel if key[0] == guild.id]:
+            self._set(guild_id, user_id, None)
+        for vc in guild.voice_channels + guild.stage_channels:
+            for member in vc.members:
+                self._set(guild.id, member.id, vc.id)
+
+    def update(self, member, before, after):
+        self._set(member.guild.id, member.id, after.channel.id if after.channel else None)
+
+    def channel_of(self, guild_id, user_id):
+        return self._channel.get((guild_id, user_id))
+
+    def members_in(self, channel_id):
+        return set(self._members.get(channel_id, ()))
+
+    def register_draft(self, guild_id, draft):
+        """Remember each player's team VC so late joiners can be sent there."""
+        for team, vc_id in draft.get("voice_channels", {}).items():
+            for uid in draft.get(team, []) + [draft["captains"].get(team)]:
+                if uid:
+                    self._team_vc[(guild_id, uid)] = vc_id
+
+    def unregister_draft(self, guild_id, draft):
+        for team in draft.get("voice_channels", {}):
+            for uid in draft.get(team, []) + [draft["captains"].get(team)]:
+                self._team_vc.pop((guild_id, uid), None)
+
+    def team_vc_of(self, guild_id, user_id):
+        return self._team_vc.get((guild_id, user_id))
+
+    async def move_members(self, guild, targets):
+        """Move {user_id: channel} in parallel, skipping anyone not connected or already there.
+
+        Returns how many moves were sent.
+        """
+        async def move(member, channel):
+            try:
+                await member.move_to(channel)
+            except Exception as e:
+                print(f"Error moving {member.display_name}: {e}")
+
+        moves = []
+        for uid, channel in targets.items():
+            current = self.channel_of(guild.id, uid)
+            if channel is None or current is None or current == channel.id:
+                continue
+            member = guild.get_member(uid)
+            if member:
+                moves.append(move(member, channel))
+        await asyncio.gather(*moves)
+        return len(moves)